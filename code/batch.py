@@ -0,0 +1,196 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+from legislative_processor import LegislativeProcessor
+
+# Batch mode: run the whole pipeline on many bills at once. Every bill gets
+# its own workspace (cleaned file, chunks, JSON chunks, output) under the
+# batch directory, and bills run in parallel on a bounded process pool.
+DEFAULT_BATCH_DIR = "batch_output"
+SUMMARY_FILE = "batch_summary.json"
+LOG_FILE = "pipeline.log"
+BILL_EXTENSIONS = (".txt",)
+
+# Every bill reconstructs both outputs without prompting
+RECONSTRUCTION_OPTIONS = {
+    "create_text": True,
+    "create_json": True,
+    "include_chunks": False,
+    "include_original_text": False
+}
+
+
+def find_bills(sources: List[str]) -> List[str]:
+    """Expand directories and glob patterns into a sorted list of bill files."""
+    bills = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for name in os.listdir(source):
+                path = os.path.join(source, name)
+                if name.endswith(BILL_EXTENSIONS) and os.path.isfile(path):
+                    bills.add(path)
+        else:
+            bills.update(path for path in glob.glob(source) if os.path.isfile(path))
+    return sorted(bills)
+
+
+def workspace_names(bills: List[str]) -> Dict[str, str]:
+    """Name each bill's workspace after its file, numbering any repeated names."""
+    names = {}
+    used = set()
+    for bill in bills:
+        base = os.path.splitext(os.path.basename(bill))[0]
+        name = base
+        count = 1
+        while name in used:
+            count += 1
+            name = f"{base}_{count}"
+        used.add(name)
+        names[bill] = name
+    return names
+
+
+def workspace_config(base_config: Dict[str, Any], bill: str, workspace: str) -> Dict[str, Any]:
+    """Return a copy of the config that reads bill and writes only inside workspace."""
+    config = dict(base_config)
+    config.update({
+        "input_file": os.path.abspath(bill),
+        "cleaned_file": os.path.join(workspace, "cleaned_output.txt"),
+        "chunks_dir": os.path.join(workspace, "chunks"),
+        "json_chunks_dir": os.path.join(workspace, "json_chunks"),
+        "output_dir": os.path.join(workspace, "output"),
+        # Bills are the unit of parallelism; nested extraction pools would oversubscribe
+        "clean_workers": 1,
+        "extract_workers": 1,
+        "write_intermediate_files": True
+    })
+    return config
+
+
+def process_bill(bill: str, workspace: str, base_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the pipeline on one bill in its workspace and report how it went.
+
+    Runs in a worker process. Errors are caught and reported, so one bill
+    failing never affects the others. The stages' output goes to the
+    workspace's pipeline.log.
+    """
+    status = {"bill": bill, "workspace": workspace, "status": "failed",
+              "seconds": 0.0, "chunks": None, "error": None}
+    start = time.perf_counter()
+    try:
+        os.makedirs(workspace, exist_ok=True)
+        with open(os.path.join(workspace, LOG_FILE), "w", encoding="utf-8") as log, \
+                contextlib.redirect_stdout(log):
+            config = workspace_config(base_config, bill, workspace)
+            processor = LegislativeProcessor(config=config)
+            chunking_options = {
+                "strategy": config["chunking_strategy"],
+                "max_chars": config["max_chars"],
+                "max_tokens": config["max_tokens"],
+                "token_estimator": config["token_estimator"],
+                "token_cache_dir": config["token_cache_dir"],
+                "storage": config["chunk_storage"],
+                "structure_index": config["structure_index"]
+            }
+            status["chunks"] = processor.run_pipeline(chunking_options, RECONSTRUCTION_OPTIONS)
+
+        expected = [os.path.join(config["output_dir"], "combined_document.json"),
+                    os.path.join(config["output_dir"], "reconstructed_document.txt")]
+        missing = [path for path in expected if not os.path.exists(path)]
+        if status["chunks"] is None or missing:
+            status["error"] = f"no output produced; see {os.path.join(workspace, LOG_FILE)}"
+        else:
+            status["status"] = "ok"
+    except Exception as e:
+        status["error"] = f"{type(e).__name__}: {e}"
+        status["traceback"] = traceback.format_exc()
+    status["seconds"] = round(time.perf_counter() - start, 3)
+    return status
+
+
+def run_batch(sources: List[str], batch_dir: str = DEFAULT_BATCH_DIR,
+              workers: Optional[int] = None,
+              base_config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Process every bill matched by sources, up to `workers` at a time.
+
+    Writes <batch_dir>/batch_summary.json and returns the per-bill statuses in
+    bill order.
+    """
+    bills = find_bills(sources)
+    if not bills:
+        print("No bills found.")
+        return []
+    if base_config is None:
+        base_config = LegislativeProcessor().config
+    if not workers or workers < 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(bills))
+
+    names = workspace_names(bills)
+    os.makedirs(batch_dir, exist_ok=True)
+    print(f"Processing {len(bills)} bills with {workers} workers into '{batch_dir}'...")
+
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_bill, bill, os.path.join(batch_dir, names[bill]), base_config): bill
+            for bill in bills
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            bill = futures[future]
+            try:
+                status = future.result()
+            except Exception as e:
+                # The worker process itself died
+                status = {"bill": bill, "workspace": os.path.join(batch_dir, names[bill]),
+                          "status": "failed", "seconds": None, "chunks": None,
+                          "error": f"{type(e).__name__}: {e}"}
+            results[bill] = status
+            if status["status"] == "ok":
+                print(f"[{done}/{len(bills)}] {bill}: ok in {status['seconds']:.2f}s "
+                      f"({status['chunks']} chunks)")
+            else:
+                print(f"[{done}/{len(bills)}] {bill}: FAILED - {status['error']}")
+    elapsed = time.perf_counter() - start
+
+    statuses = [results[bill] for bill in bills]
+    failed = sum(1 for status in statuses if status["status"] != "ok")
+    summary = {
+        "bills": len(bills),
+        "succeeded": len(bills) - failed,
+        "failed": failed,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "results": statuses
+    }
+    with open(os.path.join(batch_dir, SUMMARY_FILE), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\nBatch complete: {len(bills) - failed} succeeded, {failed} failed in {elapsed:.2f}s")
+    print(f"Summary written to {os.path.join(batch_dir, SUMMARY_FILE)}")
+    return statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the processing pipeline on many bills in parallel.")
+    parser.add_argument("sources", nargs="+", help="bill files, directories of .txt bills, or glob patterns")
+    parser.add_argument("--output", default=DEFAULT_BATCH_DIR, help="directory for the per-bill workspaces")
+    parser.add_argument("--workers", type=int, default=0, help="bills processed at once (0 = one per CPU core)")
+    args = parser.parse_args()
+
+    statuses = run_batch(args.sources, args.output, args.workers)
+    if not statuses or any(status["status"] != "ok" for status in statuses):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+import gc
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import cleanText
+import chunk_legislation
+import extract_legislative_facts
+import fact_store
+from combined_document import CombinedDocumentWriter, FACT_LIST_TYPES, REFERENCE_TYPES
+from cleanText import clean
+from chunk_legislation import chunk, DEFAULT_MAX_CHARS
+from extract_legislative_facts import extract_facts, extract_facts_reference
+from legislative_processor import LegislativeProcessor
+
+BILL_FILE = "bill.txt"
+RAW_FILE = "raw_input.txt"
+DEFAULT_REPEAT = 5
+DEFAULT_SCALES = [1, 10]
+DEFAULT_MEMORY_SCALE = 20
+RESULTS_DIR = "benchmark_results"
+REGRESSION_THRESHOLD = 0.10  # slowdowns above 10% are flagged by compare
+
+# File names inside a suite's working directory; they match the defaults the
+# stage scripts and LegislativeProcessor use, so each stage runs unmodified
+WORK_RAW = "raw_input.txt"
+WORK_CLEANED = "cleaned_output.txt"
+WORK_CHUNKS = "chunks"
+WORK_JSON = "json_chunks"
+WORK_OUTPUT = "output"
+
+# Patterns mutated in each replica of the synthetic bill
+division_marker = re.compile(r'^(DIVISION\s+)([A-Z]+)\b')
+dollar_amount = re.compile(r'\$(\d{1,3}(?:,\d{3})+|\d+)')
+usc_citation = re.compile(r'\b(\d+) U\.S\.C\. (\d+)')
+verdate_jkt = re.compile(r'Jkt \d+')
+verdate_frame = re.compile(r'Frm (\d+)')
+
+
+def best_time(func: Callable[[], Any], repeat: int) -> float:
+    """Return the fastest of `repeat` wall-clock timings of func()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_fact_scanner(path: str = BILL_FILE, repeat: int = DEFAULT_REPEAT,
+                       strategy: str = "size") -> Dict[str, Any]:
+    """Compare the single-pass fact scanner against the per-pattern reference."""
+    with open(path, "r", encoding="utf-8") as f:
+        cleaned = clean(f.read())
+    chunks = list(chunk(cleaned, {"strategy": strategy, "max_chars": DEFAULT_MAX_CHARS}))
+    megabytes = len(cleaned.encode("utf-8")) / (1024 * 1024)
+
+    def run(extractor):
+        return [extractor(text, chunk_id) for chunk_id, text in chunks]
+
+    if run(extract_facts) != run(extract_facts_reference):
+        raise AssertionError("Scanner output differs from the reference extractor")
+
+    reference_time = best_time(lambda: run(extract_facts_reference), repeat)
+    scanner_time = best_time(lambda: run(extract_facts), repeat)
+
+    results = {
+        "input": path,
+        "strategy": strategy,
+        "chunks": len(chunks),
+        "megabytes": round(megabytes, 3),
+        "reference_seconds": round(reference_time, 4),
+        "scanner_seconds": round(scanner_time, 4),
+        "speedup": round(reference_time / scanner_time, 2)
+    }
+
+    print(f"Fact extraction on {path} ({len(chunks)} chunks, {megabytes:.2f} MB, {strategy} chunking)")
+    print(f"  reference: {reference_time:.3f}s  ({megabytes / reference_time:.1f} MB/s)")
+    print(f"  scanner:   {scanner_time:.3f}s  ({megabytes / scanner_time:.1f} MB/s)")
+    print(f"  speedup:   {results['speedup']}x (outputs identical)")
+    return results
+
+
+def combine_with_dicts(json_dir: str, path: str, metadata: Dict[str, Any], include_chunks: bool) -> None:
+    """Reference combine step: every fact and chunk kept as plain dicts, the document encoded whole."""
+    references = {ref_type: {} for ref_type in REFERENCE_TYPES}
+    facts = {data_type: [] for data_type in FACT_LIST_TYPES}
+    entities = {}
+    chunks = []
+    for record in fact_store.iter_records(json_dir, "json"):
+        record.pop("original_text", None)
+        for ref_type in REFERENCE_TYPES:
+            references[ref_type].update(dict.fromkeys(record.get("references", {}).get(ref_type, [])))
+        for data_type in FACT_LIST_TYPES:
+            facts[data_type].extend(record.get(data_type, []))
+        entities.update(dict.fromkeys(record.get("programs_and_entities", [])))
+        if include_chunks:
+            chunks.append(record)
+    document = {
+        "document_metadata": metadata,
+        "aggregated_data": {
+            "references": {ref_type: list(values) for ref_type, values in references.items()},
+            "funding": facts["funding"],
+            "deadlines": facts["deadlines"],
+            "duties_and_requirements": facts["duties_and_requirements"],
+            "programs_and_entities": list(entities),
+            "dates": facts["dates"],
+            "other_facts": facts["other_facts"]
+        }
+    }
+    if include_chunks:
+        document["chunks"] = chunks
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(document, indent=2, ensure_ascii=False))
+
+
+def combine_with_model(json_dir: str, path: str, metadata: Dict[str, Any], include_chunks: bool) -> None:
+    """The pipeline's combine step: compact fact model, chunks spooled, document streamed."""
+    with CombinedDocumentWriter(path, None, metadata, include_chunks, False) as writer:
+        for record in fact_store.iter_records(json_dir, "json"):
+            writer.add(record)
+
+
+def traced_peak(func: Callable[[], Any]) -> Dict[str, float]:
+    """Run func under tracemalloc and return its peak traced memory in MB and its time."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_mb": round(peak / (1024 * 1024), 2), "seconds": round(time.perf_counter() - start, 3)}
+
+
+def bench_combine_memory(scale: int = DEFAULT_MEMORY_SCALE, source: str = RAW_FILE, seed: int = 0,
+                         workdir: Optional[str] = None) -> Dict[str, Any]:
+    """Compare the peak memory of combining a synthetic bill's facts, dicts vs. the compact model."""
+    base = os.path.abspath(tempfile.mkdtemp(prefix="bench_", dir=workdir))
+    cwd = os.getcwd()
+    results = {"scale": scale, "runs": []}
+    try:
+        raw_bytes = generate_bill(os.path.join(base, WORK_RAW), scale, source, seed)
+        os.chdir(base)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_clean({})
+            stage_chunk({"strategy": "size", "max_chars": DEFAULT_MAX_CHARS})
+            stage_extract({"workers": 0})
+        chunks = len(os.listdir(WORK_JSON))
+        metadata = {"total_chunks": chunks, "chunking_strategy": "size"}
+        print(f"Combining {chunks} chunks of a {raw_bytes / (1024 * 1024):.1f} MB synthetic bill (tracemalloc peaks)")
+        for include_chunks in (False, True):
+            outputs = {}
+            run = {"include_chunks": include_chunks}
+            for name, combine in (("dicts", combine_with_dicts), ("model", combine_with_model)):
+                outputs[name] = os.path.join(base, f"combined_{name}.json")
+                run[name] = traced_peak(lambda: combine(WORK_JSON, outputs[name], metadata, include_chunks))
+            with open(outputs["dicts"], "rb") as a, open(outputs["model"], "rb") as b:
+                if a.read() != b.read():
+                    raise AssertionError("Compact model output differs from the dict-based combine")
+            run["reduction"] = round(run["dicts"]["peak_mb"] / run["model"]["peak_mb"], 1)
+            results["runs"].append(run)
+            print(f"  include_chunks={include_chunks}:")
+            for name in ("dicts", "model"):
+                print(f"    {name:<6} peak {run[name]['peak_mb']:>8.1f} MB  {run[name]['seconds']:.2f}s")
+            print(f"    {run['reduction']}x less memory (outputs identical)")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(base, ignore_errors=True)
+    return results
+
+
+def replica_suffix(replica: int) -> str:
+    """Return the letters appended to DIVISION markers in a replica (A, B, ..., Z, AA, ...)."""
+    suffix = ""
+    while replica > 0:
+        replica -= 1
+        suffix = chr(ord("A") + replica % 26) + suffix
+        replica //= 26
+    return suffix
+
+
+def mutate_line(line: str, replica: int, rng: random.Random, frame_offset: int) -> str:
+    """Vary one line of the source bill for a given replica."""
+    if "VerDate" in line:
+        line = verdate_jkt.sub(f"Jkt {replica:06d}", line)
+        return verdate_frame.sub(lambda m: f"Frm {int(m.group(1)) + frame_offset:05d}", line)
+    if line.startswith("DIVISION"):
+        line = division_marker.sub(lambda m: m.group(1) + m.group(2) + replica_suffix(replica), line)
+    if "$" in line:
+        line = dollar_amount.sub(
+            lambda m: f"${int(int(m.group(1).replace(',', '')) * rng.uniform(0.5, 2.0)):,}", line)
+    if "U.S.C." in line:
+        line = usc_citation.sub(lambda m: f"{m.group(1)} U.S.C. {int(m.group(2)) + rng.randint(0, 500)}", line)
+    return line
+
+
+def generate_bill(target: str, scale: int, source: str = RAW_FILE, seed: int = 0) -> int:
+    """Write `scale` mutated copies of source to target and return its size in bytes.
+
+    The first copy is the source itself; later ones get renamed DIVISION
+    markers, rescaled dollar amounts, shifted U.S.C. sections and fresh
+    VerDate/Jkt page noise, so repeated text doesn't flatter any stage.
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    frames = sum(1 for line in lines if "VerDate" in line)
+
+    with open(target, "w", encoding="utf-8") as out:
+        for replica in range(scale):
+            if replica == 0:
+                out.writelines(lines)
+                continue
+            rng = random.Random(seed * 1000003 + replica)
+            out.write("\n")
+            out.writelines(mutate_line(line, replica, rng, replica * frames) for line in lines)
+    return os.path.getsize(target)
+
+
+def stage_clean(params: Dict[str, Any]) -> Optional[int]:
+    cleanText.process_with_options({"input_file": WORK_RAW, "output_file": WORK_CLEANED,
+                                    "workers": params.get("workers", 1)})
+    return None
+
+
+def stage_chunk(params: Dict[str, Any]) -> Optional[int]:
+    chunk_legislation.process_with_options({"strategy": params["strategy"],
+                                            "max_chars": params["max_chars"]})
+    return len(os.listdir(WORK_CHUNKS))
+
+
+def stage_extract(params: Dict[str, Any]) -> Optional[int]:
+    extract_legislative_facts.process_with_options({"workers": params["workers"], "cache": False})
+    return len(os.listdir(WORK_JSON))
+
+
+def stage_reconstruct(params: Dict[str, Any]) -> Optional[int]:
+    processor = LegislativeProcessor()
+    processor.reconstruct_document(options={
+        "create_text": True,
+        "create_json": True,
+        "include_chunks": False,
+        "include_original_text": False
+    })
+    return len(os.listdir(WORK_JSON))
+
+
+STAGES = {
+    "clean": stage_clean,
+    "chunk": stage_chunk,
+    "extract": stage_extract,
+    "reconstruct": stage_reconstruct
+}
+
+
+def run_stage(stage: str, workdir: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one stage in workdir (in a fresh process) and measure it."""
+    os.chdir(workdir)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunks = STAGES[stage](params)
+    result = {
+        "seconds": time.perf_counter() - wall_start,
+        "cpu_seconds": time.process_time() - cpu_start,
+        "chunks": chunks,
+        "peak_rss_mb": None
+    }
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["peak_rss_mb"] = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return result
+
+
+def measure_stage(stage: str, workdir: str, params: Dict[str, Any], input_bytes: int) -> Dict[str, Any]:
+    """Run a stage in its own process, so its peak RSS is its own, and add rates."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        result = executor.submit(run_stage, stage, os.path.abspath(workdir), params).result()
+    megabytes = input_bytes / (1024 * 1024)
+    result["input_mb"] = round(megabytes, 3)
+    result["mb_per_second"] = round(megabytes / result["seconds"], 2)
+    result["chunks_per_second"] = None
+    if result["chunks"]:
+        result["chunks_per_second"] = round(result["chunks"] / result["seconds"], 1)
+    result["seconds"] = round(result["seconds"], 4)
+    result["cpu_seconds"] = round(result["cpu_seconds"], 4)
+    return result
+
+
+def bench_scale(scale: int, workdir: str, source: str, seed: int, workers: int,
+                max_chars: int, clean_workers: int = 1) -> Dict[str, Any]:
+    """Generate a bill `scale` times the size of source and time every stage on it."""
+    raw_path = os.path.join(workdir, WORK_RAW)
+    raw_bytes = generate_bill(raw_path, scale, source, seed)
+    print(f"\nScale {scale}x: {raw_bytes / (1024 * 1024):.1f} MB of synthetic input")
+
+    stages = {}
+    if clean_workers != 1:
+        stages["clean_parallel"] = measure_stage("clean", workdir, {"workers": clean_workers}, raw_bytes)
+    stages["clean"] = measure_stage("clean", workdir, {}, raw_bytes)
+    cleaned_bytes = os.path.getsize(os.path.join(workdir, WORK_CLEANED))
+
+    chunks_dir = os.path.join(workdir, WORK_CHUNKS)
+    # Structure first, so extraction and reconstruction run on the size chunks
+    for strategy in ("structure", "size"):
+        shutil.rmtree(chunks_dir, ignore_errors=True)
+        stages[f"chunk_{strategy}"] = measure_stage(
+            "chunk", workdir, {"strategy": strategy, "max_chars": max_chars}, cleaned_bytes)
+
+    stages["extract"] = measure_stage("extract", workdir, {"workers": workers}, cleaned_bytes)
+    stages["reconstruct"] = measure_stage("reconstruct", workdir, {}, cleaned_bytes)
+
+    print(f"  {'stage':<16}{'seconds':>9}{'MB/s':>9}{'chunks/s':>10}{'peak RSS MB':>13}")
+    for name, result in stages.items():
+        chunks_rate = "-" if result["chunks_per_second"] is None else f"{result['chunks_per_second']:.0f}"
+        peak = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f}"
+        print(f"  {name:<16}{result['seconds']:>9.3f}{result['mb_per_second']:>9.1f}{chunks_rate:>10}{peak:>13}")
+
+    return {"scale": scale, "input_mb": round(raw_bytes / (1024 * 1024), 3), "stages": stages}
+
+
+def current_commit() -> Optional[str]:
+    """Return the short hash of the checked-out commit, if this is a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scales: List[int], source: str = RAW_FILE, seed: int = 0, workers: int = 1,
+              max_chars: int = DEFAULT_MAX_CHARS, output: Optional[str] = None,
+              workdir: Optional[str] = None, clean_workers: int = 1) -> Dict[str, Any]:
+    """Time every pipeline stage at each scale and save the results as JSON."""
+    commit = current_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "source": source,
+        "seed": seed,
+        "workers": workers,
+        "clean_workers": clean_workers,
+        "max_chars": max_chars,
+        "runs": []
+    }
+
+    base = tempfile.mkdtemp(prefix="bench_", dir=workdir)
+    try:
+        for scale in scales:
+            scale_dir = os.path.join(base, f"{scale}x")
+            os.makedirs(scale_dir)
+            results["runs"].append(bench_scale(scale, scale_dir, source, seed, workers, max_chars,
+                                                   clean_workers))
+            shutil.rmtree(scale_dir)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{commit or 'results'}_{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+    return results
+
+
+def compare_results(old_path: str, new_path: str,
+                    threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Print stage timings of two saved suites side by side; return the regressed stages."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    old_runs = {run["scale"]: run for run in old["runs"]}
+
+    print(f"Comparing {old.get('commit') or old_path} -> {new.get('commit') or new_path}")
+    regressions = []
+    for run in new["runs"]:
+        old_run = old_runs.get(run["scale"])
+        if old_run is None:
+            continue
+        print(f"\nScale {run['scale']}x")
+        for name, result in run["stages"].items():
+            if name not in old_run["stages"]:
+                continue
+            before = old_run["stages"][name]["seconds"]
+            after = result["seconds"]
+            change = (after - before) / before if before else 0.0
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{run['scale']}x {name}")
+            print(f"  {name:<16}{before:>9.3f}s -> {after:>9.3f}s  {change:+.1%}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Throughput benchmarks for the processing pipeline.")
+    commands = parser.add_subparsers(dest="command")
+
+    suite = commands.add_parser("suite", help="time every stage on synthetic bills (default)")
+    suite.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                       help="sizes as multiples of the source bill, e.g. 1 10 100 1000")
+    suite.add_argument("--source", default=RAW_FILE, help="bill text to replicate")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--workers", type=int, default=1, help="extraction worker processes")
+    suite.add_argument("--clean-workers", type=int, default=1,
+                       help="also time parallel cleaning with this many processes (0 = all cores)")
+    suite.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS)
+    suite.add_argument("--output", help="results file (default: benchmark_results/<commit>_<time>.json)")
+    suite.add_argument("--workdir", help="where to put the generated files (default: system temp)")
+
+    scanner = commands.add_parser("scanner", help="fact scanner against the reference extractor")
+    scanner.add_argument("path", nargs="?", default=BILL_FILE)
+
+    memory = commands.add_parser("memory", help="peak memory of the combine step, dicts vs. the compact model")
+    memory.add_argument("--scale", type=int, default=DEFAULT_MEMORY_SCALE)
+    memory.add_argument("--source", default=RAW_FILE, help="bill text to replicate")
+    memory.add_argument("--workdir", help="where to put the generated files (default: system temp)")
+
+    compare = commands.add_parser("compare", help="compare two saved suite results")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.command == "scanner":
+        bench_fact_scanner(args.path)
+    elif args.command == "memory":
+        bench_combine_memory(args.scale, args.source, workdir=args.workdir)
+    elif args.command == "compare":
+        if compare_results(args.old, args.new, args.threshold):
+            sys.exit(1)
+    elif args.command == "suite":
+        run_suite(args.scales, args.source, args.seed, args.workers, args.max_chars,
+                  args.output, args.workdir, args.clean_workers)
+    else:
+        run_suite(DEFAULT_SCALES)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from cleanText import iter_cleaned_lines
+from chunk_legislation import division_pattern, title_pattern, section_pattern
+from extract_legislative_facts import extract_chunks, extractor_fingerprint, split_facts
+from fact_db import parse_dollars
+from legislative_processor import LegislativeProcessor
+
+# Version-aware reprocessing: a bill is split into DIVISION/TITLE/SEC. units,
+# each unit is fingerprinted, and only units whose text is new since the
+# previous version are sent to extraction. Every version's units and facts are
+# kept in <versions_dir>/<version>.json, and each update writes a report of
+# the facts added and removed to the output directory.
+DEFAULT_VERSIONS_DIR = "versions"
+LATEST_FILE = "latest.json"
+PREAMBLE_KEY = "preamble"
+
+REFERENCE_TYPES = ("us_code", "public_laws", "other_legislative_refs")
+FACT_LIST_TYPES = ("funding", "deadlines", "duties_and_requirements", "programs_and_entities",
+                   "dates", "other_facts")
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_units(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Yield (key, text) for each structural unit of the cleaned lines.
+
+    A unit starts at every DIVISION, TITLE and SEC. heading line and runs up
+    to the next one. Keys are paths such as "division_a/title_ii/sec_201";
+    repeated paths get "#2", "#3", ... in order of appearance.
+    """
+    div = tit = None
+    key = PREAMBLE_KEY
+    current: List[str] = []
+    seen: Counter = Counter()
+
+    def unit_key(path: str) -> str:
+        seen[path] += 1
+        return path if seen[path] == 1 else f"{path}#{seen[path]}"
+
+    for line in lines:
+        stripped = line.strip()
+        div_match = division_pattern.match(stripped)
+        tit_match = title_pattern.match(stripped)
+        sec_match = section_pattern.match(stripped)
+        if not (div_match or tit_match or sec_match):
+            current.append(line)
+            continue
+
+        if current:
+            yield unit_key(key), "\n".join(current)
+        current = [line]
+        if div_match:
+            div, tit = div_match.group(1).lower(), None
+            parts = [f"division_{div}"]
+        elif tit_match:
+            tit = tit_match.group(1).lower()
+            parts = [f"division_{div}"] if div else []
+            parts.append(f"title_{tit}")
+        else:
+            parts = [f"division_{div}"] if div else []
+            if tit:
+                parts.append(f"title_{tit}")
+            parts.append(f"sec_{sec_match.group(1).lower()}")
+        key = "/".join(parts)
+
+    if current:
+        yield unit_key(key), "\n".join(current)
+
+
+def read_units(bill: str) -> List[Dict[str, Any]]:
+    """Clean a raw bill and split it into fingerprinted units."""
+    with open(bill, "r", encoding="utf-8") as f:
+        return [{"key": key, "fingerprint": fingerprint(text), "text": text}
+                for key, text in iter_units(iter_cleaned_lines(f))]
+
+
+def manifest_path(versions_dir: str, version: str) -> str:
+    return os.path.join(versions_dir, version + ".json")
+
+
+def latest_version(versions_dir: str) -> Optional[str]:
+    path = os.path.join(versions_dir, LATEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["version"]
+
+
+def load_manifest(versions_dir: str, version: str) -> Dict[str, Any]:
+    with open(manifest_path(versions_dir, version), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(versions_dir: str, manifest: Dict[str, Any]) -> str:
+    os.makedirs(versions_dir, exist_ok=True)
+    path = manifest_path(versions_dir, manifest["version"])
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    with open(os.path.join(versions_dir, LATEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"version": manifest["version"]}, f)
+    return path
+
+
+def fact_items(facts: Dict[str, Any]) -> Counter:
+    """Return a unit's facts as a multiset of (category, canonical JSON value)."""
+    items = Counter()
+    references = facts.get("references", {})
+    for ref_type in REFERENCE_TYPES:
+        items.update((ref_type, json.dumps(ref, ensure_ascii=False)) for ref in references.get(ref_type, []))
+    for fact_type in FACT_LIST_TYPES:
+        items.update((fact_type, json.dumps(fact, ensure_ascii=False, sort_keys=True))
+                     for fact in facts.get(fact_type, []))
+    return items
+
+
+def group_items(items: Counter) -> Dict[str, List[Any]]:
+    grouped: Dict[str, List[Any]] = {}
+    for (category, value), count in sorted(items.items()):
+        grouped.setdefault(category, []).extend([json.loads(value)] * count)
+    return grouped
+
+
+def funding_dollars(facts: List[Any]) -> int:
+    return sum(parse_dollars(item.get("amount")) or 0 for item in facts)
+
+
+def diff_facts(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the facts only in new ("added") and only in old ("removed")."""
+    old_items = fact_items(old or {})
+    new_items = fact_items(new or {})
+    return {"added": group_items(new_items - old_items), "removed": group_items(old_items - new_items)}
+
+
+def delta_report(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare two version manifests unit by unit."""
+    old_units = {unit["key"]: unit for unit in previous["units"]} if previous else {}
+    new_keys = set()
+    changes = []
+    counts = Counter()
+    for unit in current["units"]:
+        key = unit["key"]
+        new_keys.add(key)
+        old = old_units.get(key)
+        if old is None:
+            status = "added"
+        elif old["fingerprint"] == unit["fingerprint"]:
+            counts["unchanged"] += 1
+            continue
+        else:
+            status = "changed"
+        counts[status] += 1
+        change = {"section": key, "status": status}
+        change.update(diff_facts(old["facts"] if old else None, unit["facts"]))
+        changes.append(change)
+    for key, old in old_units.items():
+        if key not in new_keys:
+            counts["removed"] += 1
+            change = {"section": key, "status": "removed"}
+            change.update(diff_facts(old["facts"], None))
+            changes.append(change)
+
+    added_dollars = sum(funding_dollars(c["added"].get("funding", [])) for c in changes)
+    removed_dollars = sum(funding_dollars(c["removed"].get("funding", [])) for c in changes)
+    return {
+        "from_version": previous["version"] if previous else None,
+        "to_version": current["version"],
+        "sections": {status: counts[status] for status in ("added", "removed", "changed", "unchanged")},
+        "funding": {
+            "added_dollars": added_dollars,
+            "removed_dollars": removed_dollars,
+            "net_dollars": added_dollars - removed_dollars
+        },
+        "changes": changes
+    }
+
+
+def update(bill: str, config: Dict[str, Any], version: Optional[str] = None,
+           against: Optional[str] = None) -> Dict[str, Any]:
+    """Process a new version of a bill against a previous one and return the delta report.
+
+    Units whose fingerprint appears anywhere in the previous version reuse its
+    facts; only new text is extracted. The previous version defaults to the
+    latest one recorded in the versions directory.
+    """
+    start = time.perf_counter()
+    versions_dir = config.get("versions_dir", DEFAULT_VERSIONS_DIR)
+    if version is None:
+        stem = os.path.splitext(os.path.basename(bill))[0]
+        version = f"{stem}_{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    if against is None:
+        against = latest_version(versions_dir)
+    previous = load_manifest(versions_dir, against) if against else None
+
+    units = read_units(bill)
+    known = {}
+    if previous and previous.get("extractor") == extractor_fingerprint():
+        known = {unit["fingerprint"]: unit["facts"] for unit in previous["units"]}
+    elif previous:
+        print("Extraction logic changed since the previous version; extracting every section.")
+    pending = [unit for unit in units if unit["fingerprint"] not in known]
+
+    print(f"{len(units)} sections, {len(pending)} new or changed; extracting...")
+    options = {
+        "workers": config.get("extract_workers", 1),
+        "cache": config.get("extract_cache", False),
+        "cache_dir": config.get("extract_cache_dir"),
+        "cache_max_bytes": config.get("extract_cache_max_mb", 256) * 1024 * 1024
+    }
+    extracted = extract_chunks([(unit["key"], unit["text"]) for unit in pending], options)
+    for unit, data in zip(pending, extracted):
+        known[unit["fingerprint"]] = split_facts(data)
+
+    manifest = {
+        "version": version,
+        "source": os.path.abspath(bill),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "extractor": extractor_fingerprint(),
+        "units": [{"key": unit["key"], "fingerprint": unit["fingerprint"],
+                   "facts": known[unit["fingerprint"]]} for unit in units]
+    }
+    report = delta_report(previous, manifest)
+    report["extracted_sections"] = len(pending)
+
+    path = save_manifest(versions_dir, manifest)
+    print(f"Version '{version}' recorded in {path}")
+    output_dir = config.get("output_dir", "output")
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, f"delta_{against or 'none'}_to_{version}.json")
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Delta report written to {report_path}")
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    sections = report["sections"]
+    print(f"\n{report['from_version'] or '(no previous version)'} -> {report['to_version']}")
+    print(f"Sections: {sections['added']} added, {sections['removed']} removed, "
+          f"{sections['changed']} changed, {sections['unchanged']} unchanged "
+          f"({report['extracted_sections']} extracted in {report['seconds']:.2f}s)")
+    funding = report["funding"]
+    print(f"Funding: +${funding['added_dollars']:,} -${funding['removed_dollars']:,} "
+          f"(net {'+' if funding['net_dollars'] >= 0 else '-'}${abs(funding['net_dollars']):,})")
+    if report["from_version"] is None:
+        return
+    for change in report["changes"]:
+        added = sum(len(v) for v in change["added"].values())
+        removed = sum(len(v) for v in change["removed"].values())
+        print(f"  {change['status']:<8} {change['section']}: +{added} / -{removed} facts")
+        for sign, key in (("+", "added"), ("-", "removed")):
+            for item in change[key].get("funding", []):
+                print(f"      {sign} {item.get('amount')} {item.get('purpose')}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Reprocess only the sections of a bill that changed since its previous version.")
+    parser.add_argument("bill", help="raw text of the new version")
+    parser.add_argument("--version", help="name for this version (default: file name and time)")
+    parser.add_argument("--against", help="version to compare with (default: the latest one)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.bill):
+        print(f"Error: {args.bill} not found!")
+        sys.exit(1)
+    config = LegislativeProcessor().config
+    print_report(update(args.bill, config, args.version, args.against))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+from typing import Iterable, Iterator, List, Tuple
+
+from fact_store import RecordReader, RecordWriter
+
+# Packed chunk storage: every chunk of a document in one chunks/chunks.bin of
+# length-prefixed UTF-8 records, with an offset index (chunks.bin.idx) for
+# random access by chunk id. Two files replace one .txt per chunk, so large
+# batches no longer pay an open/close per chunk or a listing of the directory.
+ARCHIVE_FILE = "chunks.bin"
+
+
+def archive_path(directory: str) -> str:
+    return os.path.join(directory, ARCHIVE_FILE)
+
+
+def archive_exists(directory: str) -> bool:
+    return os.path.exists(archive_path(directory) + ".idx")
+
+
+def write_archive(chunks: Iterable[Tuple[str, str]], directory: str) -> int:
+    """Write every (chunk_id, content) chunk to <directory>/chunks.bin and return how many were written."""
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    with RecordWriter(archive_path(directory)) as writer:
+        for chunk_id, content in chunks:
+            writer.append(chunk_id, content.encode("utf-8"))
+            count += 1
+    return count
+
+
+def archive_ids(directory: str) -> List[str]:
+    """Return the chunk ids of the archive, in chunk order."""
+    with RecordReader(archive_path(directory)) as reader:
+        return reader.keys()
+
+
+def iter_archive(directory: str) -> Iterator[Tuple[str, str]]:
+    """Yield (chunk_id, content) for every chunk of the archive, in order."""
+    with RecordReader(archive_path(directory)) as reader:
+        for chunk_id, payload in reader:
+            yield chunk_id, payload.decode("utf-8")
+
+
+def read_chunk(directory: str, chunk_id: str) -> str:
+    """Return the content of one chunk, read straight from its offset."""
+    with RecordReader(archive_path(directory)) as reader:
+        return reader.get(chunk_id).decode("utf-8")
@@ -1,25 +1,42 @@
 import os
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from chunk_archive import ARCHIVE_FILE, write_archive
+from chunk_spans import SPANS_FILE, ChunkSpan, locate_spans, open_source, span_text, write_spans
+from token_budget import (DEFAULT_MAX_TOKENS, DEFAULT_ESTIMATOR, DEFAULT_CACHE_DIR as TOKEN_CACHE_DIR,
+                          get_estimator, iter_chunks_by_tokens)
 
 # Configuration
 INPUT_FILE = "cleaned_output.txt"
 OUTPUT_DIR = "chunks"
 DEFAULT_MAX_CHARS = 20000  # Default maximum characters per chunk file
 
-# Create output directory if it doesn't exist
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
 # Regex patterns to identify division and title lines
 division_pattern = re.compile(r'^DIVISION\s+([A-Z]+)\b', re.IGNORECASE)
 title_pattern = re.compile(r'^TITLE\s+([IVXLC]+)\b', re.IGNORECASE)
+# Section headings are capitalized ("SEC. 101."); the table of contents uses
+# "Sec." and quoted amendments start with quotes, so neither counts
+section_pattern = re.compile(r'^SEC\.\s+(\d+[A-Z]*)\.')
 
-def write_chunk(lines_list: list, div: str, tit: str, chunk_num: int, max_chars: int) -> None:
-    """Write out the current chunk to one or more files without exceeding max_chars."""
-    if not lines_list:
-        return
+# Chunking straight from a memory map of the file. Byte-level candidates for
+# DIVISION/TITLE/SEC. lines; they also accept the non-ASCII letters
+# re.IGNORECASE folds onto i and s (İ, ı, ſ), and each one is confirmed with
+# the patterns above.
+_I = rb'(?:i|\xc4[\xb0\xb1])'
+_S = rb'(?:s|\xc5\xbf)'
+marker_candidate = re.compile(rb'^(?:d' + _I + rb'v' + _I + _S + _I + rb'on|t' + _I + rb'tle|(?-i:SEC\.))',
+                              re.IGNORECASE | re.MULTILINE)
+# Characters str.strip() removes, other than the newline itself
+_EDGE_SPACE = rb'(?:[\t\x0b\x0c\x1c-\x1f ]|\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)'
+# Spans can only stand in for the line-based chunkers when no line would be
+# changed by their rstrip()/strip(), and "\r" (a line break in text mode) is absent
+trailing_space = re.compile(rb'\r|' + _EDGE_SPACE + rb'$', re.MULTILINE)
+edge_space = re.compile(rb'\r|^' + _EDGE_SPACE + rb'|' + _EDGE_SPACE + rb'$', re.MULTILINE)
+UTF8_CONTINUATION = bytes(range(0x80, 0xC0))
 
-    # Determine filename base parts
+def chunk_base_id(div: Optional[str], tit: Optional[str], chunk_num: int) -> str:
+    """Return the file name base of a chunk, e.g. 004_division_a_title_ii."""
     filename_parts = [f"{chunk_num:03d}"]
     if div:
         filename_parts.append("division")
@@ -27,32 +44,45 @@ def write_chunk(lines_list: list, div: str, tit: str, chunk_num: int, max_chars:
     if tit:
         filename_parts.append("title")
         filename_parts.append(tit.lower())
-    base_filename = "_".join(filename_parts)
+    return "_".join(filename_parts)
+
+def split_chunk(lines_list: list, div: Optional[str], tit: Optional[str], chunk_num: int,
+                max_chars: int) -> Iterator[Tuple[str, str]]:
+    """Yield (chunk_id, content) pieces of one chunk, none longer than max_chars."""
+    if not lines_list:
+        return
+
+    base_filename = chunk_base_id(div, tit, chunk_num)
 
     # Join lines into a single string
     content = "\n".join(lines_list)
 
     # If it fits in one file
     if len(content) <= max_chars:
-        filepath = os.path.join(OUTPUT_DIR, base_filename + ".txt")
-        with open(filepath, "w", encoding="utf-8") as outfile:
-            outfile.write(content)
+        yield base_filename, content
     else:
         # Split into multiple parts
         part_number = 1
         start = 0
         while start < len(content):
             end = start + max_chars
-            chunk_content = content[start:end]
-            part_filename = f"{base_filename}_part{part_number}.txt"
-            filepath = os.path.join(OUTPUT_DIR, part_filename)
-            with open(filepath, "w", encoding="utf-8") as outfile:
-                outfile.write(chunk_content)
+            yield f"{base_filename}_part{part_number}", content[start:end]
             start = end
             part_number += 1
 
-def chunk_by_size(lines: list, max_chars: int) -> None:
-    """Split text into chunks based on size while respecting structure."""
+def write_chunk_file(chunk_id: str, content: str, output_dir: str = OUTPUT_DIR) -> None:
+    """Write one chunk to output_dir as <chunk_id>.txt."""
+    filepath = os.path.join(output_dir, chunk_id + ".txt")
+    with open(filepath, "w", encoding="utf-8") as outfile:
+        outfile.write(content)
+
+def write_chunk(lines_list: list, div: str, tit: str, chunk_num: int, max_chars: int) -> None:
+    """Write out the current chunk to one or more files without exceeding max_chars."""
+    for chunk_id, content in split_chunk(lines_list, div, tit, chunk_num, max_chars):
+        write_chunk_file(chunk_id, content)
+
+def iter_chunks_by_size(lines: Iterable[str], max_chars: int) -> Iterator[Tuple[str, str]]:
+    """Yield (chunk_id, content) chunks based on size while respecting structure."""
     current_chunk_lines = []
     chunk_count = 0
     current_size = 0
@@ -61,75 +91,313 @@ def chunk_by_size(lines: list, max_chars: int) -> None:
         line_size = len(line) + 1  # +1 for newline
         if current_size + line_size > max_chars and current_chunk_lines:
             chunk_count += 1
-            write_chunk(current_chunk_lines, None, None, chunk_count, max_chars)
+            yield from split_chunk(current_chunk_lines, None, None, chunk_count, max_chars)
             current_chunk_lines = []
             current_size = 0
 
         current_chunk_lines.append(line)
         current_size += line_size
 
-    # Write final chunk if any
+    # Emit final chunk if any
     if current_chunk_lines:
         chunk_count += 1
-        write_chunk(current_chunk_lines, None, None, chunk_count, max_chars)
+        yield from split_chunk(current_chunk_lines, None, None, chunk_count, max_chars)
 
-def chunk_by_structure(lines: list) -> None:
-    """Split text into chunks based on DIVISION and TITLE markers."""
+def iter_chunks_by_structure(lines: Iterable[str], max_chars: int = DEFAULT_MAX_CHARS) -> Iterator[Tuple[str, str]]:
+    """Yield (chunk_id, content) chunks based on DIVISION, TITLE and SEC. markers.
+
+    Every DIVISION and TITLE line starts a new chunk. Within one, whole
+    sections (from a SEC. line to the next marker) are packed into a chunk
+    while it stays within max_chars; a longer section is split into parts.
+    """
     current_chunk_lines = []
+    current_chunk_size = 0  # len("\n".join(current_chunk_lines))
+    section_lines = []
     chunk_count = 0
     current_division = None
     current_title = None
 
     def start_new_chunk():
-        nonlocal current_chunk_lines, chunk_count
+        nonlocal current_chunk_lines, current_chunk_size, chunk_count
         if current_chunk_lines:
             chunk_count += 1
-            write_chunk(current_chunk_lines, current_division, current_title, 
-                       chunk_count, DEFAULT_MAX_CHARS)
+            yield from split_chunk(current_chunk_lines, current_division, current_title,
+                                   chunk_count, max_chars)
             current_chunk_lines = []
+            current_chunk_size = 0
+
+    def end_section():
+        nonlocal section_lines, current_chunk_size
+        if not section_lines:
+            return
+        section_size = sum(len(line) for line in section_lines) + len(section_lines) - 1
+        if current_chunk_lines and current_chunk_size + 1 + section_size > max_chars:
+            yield from start_new_chunk()
+        if current_chunk_lines:
+            current_chunk_size += 1 + section_size
+        else:
+            current_chunk_size = section_size
+        current_chunk_lines.extend(section_lines)
+        section_lines = []
 
     for line in lines:
         stripped = line.strip()
         if not stripped:
-            if current_chunk_lines:
-                current_chunk_lines.append("")
+            if current_chunk_lines or section_lines:
+                section_lines.append("")
             continue
 
         div_match = division_pattern.match(stripped)
         title_match = title_pattern.match(stripped)
 
         if div_match:
-            start_new_chunk()
+            yield from end_section()
+            yield from start_new_chunk()
             current_division = div_match.group(1)
             current_title = None
-            current_chunk_lines.append(stripped)
         elif title_match:
-            start_new_chunk()
+            yield from end_section()
+            yield from start_new_chunk()
             current_title = title_match.group(1)
-            current_chunk_lines.append(stripped)
+        elif section_pattern.match(stripped):
+            yield from end_section()
+        section_lines.append(stripped)
+
+    yield from end_section()
+    yield from start_new_chunk()
+
+def advance_chars(mm, start: int, count: int) -> int:
+    """Return the byte offset just past `count` UTF-8 characters from start (or the end)."""
+    end = len(mm)
+    pos = start
+    while count > 0 and pos < end:
+        # A block of `count` bytes holds at most `count` characters
+        block = mm[pos:pos + count]
+        count -= len(block.translate(None, UTF8_CONTINUATION))
+        pos += len(block)
+    # Finish a character cut off by the block boundary
+    while pos < end and 0x80 <= mm[pos] < 0xC0:
+        pos += 1
+    return pos
+
+def text_end(mm) -> int:
+    """Return where the last line ends, ignoring the file's final newline."""
+    if len(mm) and mm[-1] == 0x0A:
+        return len(mm) - 1
+    return len(mm)
+
+def split_span(mm, source: str, base_id: str, start: int, end: int,
+               max_chars: int) -> Iterator[ChunkSpan]:
+    """Yield the span as one chunk, or as max_chars-character parts like split_chunk."""
+    cut = advance_chars(mm, start, max_chars)
+    if cut >= end:
+        yield ChunkSpan(base_id, source, start, end)
+        return
+    part_number = 1
+    while start < end:
+        cut = min(advance_chars(mm, start, max_chars), end)
+        yield ChunkSpan(f"{base_id}_part{part_number}", source, start, cut)
+        start = cut
+        part_number += 1
+
+def can_map_chunks(source: str, strategy: str) -> bool:
+    """Return True if mapped chunking of source matches the line-based chunkers."""
+    if strategy not in ("size", "structure"):
+        return False  # token counts need the decoded lines
+    if os.path.getsize(source) == 0:
+        return True
+    pattern = edge_space if strategy == "structure" else trailing_space
+    return pattern.search(open_source(source)) is None
+
+def iter_mapped_chunks_by_size(source: str, max_chars: int) -> Iterator[ChunkSpan]:
+    """Yield the chunks of iter_chunks_by_size as spans, reading only the mapped file.
+
+    Each chunk ends at the last newline within max_chars characters of its
+    start, so boundaries are found without splitting the file into lines.
+    """
+    if os.path.getsize(source) == 0:
+        return
+    mm = open_source(source)
+    end = text_end(mm)
+    chunk_count = 0
+    start = 0
+    while True:
+        # A line fits if its newline is within the first max_chars characters
+        limit = advance_chars(mm, start, max_chars - 1)
+        if end <= limit:
+            stop = end
         else:
-            current_chunk_lines.append(stripped)
+            stop = mm.rfind(b"\n", start, limit + 1)
+            if stop == -1:
+                # A single line longer than max_chars is a chunk on its own
+                stop = mm.find(b"\n", start, end)
+                if stop == -1:
+                    stop = end
+        chunk_count += 1
+        yield from split_span(mm, source, f"{chunk_count:03d}", start, stop, max_chars)
+        if stop >= end:
+            return
+        start = stop + 1
 
-    start_new_chunk()
+def iter_mapped_chunks_by_structure(source: str, max_chars: int = DEFAULT_MAX_CHARS) -> Iterator[ChunkSpan]:
+    """Yield the chunks of iter_chunks_by_structure as spans, reading only the mapped file.
 
-def process_with_options(options: Dict[str, Any]) -> None:
-    """Process the text file according to specified chunking strategy."""
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+    Sections run from one marker line to the line break before the next, so
+    only the marker lines are decoded; section lengths are counted in UTF-8
+    characters to pack them.
+    """
+    if os.path.getsize(source) == 0:
+        return
+    mm = open_source(source)
+    end = text_end(mm)
 
-    # Clean up lines
-    lines = [line.rstrip() for line in lines]
+    # Leading blank lines are dropped
+    start = 0
+    while start < end and mm[start] == 0x0A:
+        start += 1
+    if start >= end:
+        return
 
-    # Choose chunking strategy
+    chunk_count = 0
+    current_division = None
+    current_title = None
+    chunk_start = chunk_end = None  # the packed sections, if any
+    chunk_chars = 0
+
+    def start_new_chunk():
+        nonlocal chunk_start, chunk_end, chunk_count
+        if chunk_end is not None:
+            chunk_count += 1
+            yield from split_span(mm, source, chunk_base_id(current_division, current_title, chunk_count),
+                                  chunk_start, chunk_end, max_chars)
+            chunk_start = chunk_end = None
+
+    def end_section(section_start: int, section_end: int):
+        nonlocal chunk_start, chunk_end, chunk_chars
+        section_chars = len(mm[section_start:section_end].translate(None, UTF8_CONTINUATION))
+        if chunk_end is not None and chunk_chars + 1 + section_chars > max_chars:
+            yield from start_new_chunk()
+        if chunk_end is None:
+            chunk_start = section_start
+            chunk_chars = section_chars
+        else:
+            chunk_chars += 1 + section_chars
+        chunk_end = section_end
+
+    for match in marker_candidate.finditer(mm, start, end):
+        line_start = match.start()
+        line_end = mm.find(b"\n", line_start, end)
+        line = str(mm[line_start:end if line_end == -1 else line_end], "utf-8")
+        div_match = division_pattern.match(line)
+        title_match = None if div_match else title_pattern.match(line)
+        if not (div_match or title_match or section_pattern.match(line)):
+            continue
+
+        if line_start > start:
+            yield from end_section(start, line_start - 1)
+        start = line_start
+        if div_match:
+            yield from start_new_chunk()
+            current_division = div_match.group(1)
+            current_title = None
+        elif title_match:
+            yield from start_new_chunk()
+            current_title = title_match.group(1)
+
+    yield from end_section(start, end)
+    yield from start_new_chunk()
+
+def iter_mapped_chunks(source: str, options: Dict[str, Any]) -> Iterator[ChunkSpan]:
+    """Chunk a cleaned file as spans found directly in its memory map."""
     if options.get("strategy", "size") == "structure":
+        return iter_mapped_chunks_by_structure(source, options.get('max_chars', DEFAULT_MAX_CHARS))
+    return iter_mapped_chunks_by_size(source, options.get('max_chars', DEFAULT_MAX_CHARS))
+
+def chunk_file_spans(source: str, options: Dict[str, Any]) -> Iterator[ChunkSpan]:
+    """Chunk a cleaned file into spans, from its memory map whenever that is exact."""
+    if can_map_chunks(source, options.get("strategy", "size")):
+        return iter_mapped_chunks(source, options)
+    with open(source, "r", encoding="utf-8") as f:
+        text = f.read()
+    return locate_spans(list(chunk(text, options)), source)
+
+def write_chunks(chunks: Iterable[Tuple[str, str]], output_dir: str = OUTPUT_DIR) -> int:
+    """Write every (chunk_id, content) chunk to output_dir and return how many were written."""
+    os.makedirs(output_dir, exist_ok=True)
+    count = 0
+    for chunk_id, content in chunks:
+        write_chunk_file(chunk_id, content, output_dir)
+        count += 1
+    return count
+
+def chunk_by_size(lines: list, max_chars: int) -> None:
+    """Split text into chunks based on size while respecting structure."""
+    write_chunks(iter_chunks_by_size(lines, max_chars))
+
+def chunk_by_structure(lines: list, max_chars: int = DEFAULT_MAX_CHARS) -> None:
+    """Split text into chunks based on DIVISION, TITLE and SEC. markers."""
+    write_chunks(iter_chunks_by_structure(lines, max_chars))
+
+def split_lines(text: str) -> List[str]:
+    """Split text into lines the way readlines() + rstrip() does for a file."""
+    lines = text.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    return [line.rstrip() for line in lines]
+
+def iter_line_chunks(lines: List[str], options: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """Chunk cleaned lines with the strategy and limits in options."""
+    strategy = options.get("strategy", "size")
+    if strategy == "tokens":
+        return iter_chunks_by_tokens(lines, options.get("max_tokens", DEFAULT_MAX_TOKENS),
+                                     get_estimator(options.get("token_estimator", DEFAULT_ESTIMATOR)),
+                                     options.get("token_cache_dir", TOKEN_CACHE_DIR))
+    if strategy == "structure":
+        return iter_chunks_by_structure(lines, options.get('max_chars', DEFAULT_MAX_CHARS))
+    return iter_chunks_by_size(lines, options.get('max_chars', DEFAULT_MAX_CHARS))
+
+def chunk(text: str, options: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """Split cleaned text held in memory into (chunk_id, content) chunks."""
+    return iter_line_chunks(split_lines(text), options)
+
+def process_with_options(options: Dict[str, Any]) -> None:
+    """Process the text file according to specified chunking strategy."""
+    strategy = options.get("strategy", "size")
+    if strategy == "structure":
         print("Using structure-based chunking strategy...")
-        chunk_by_structure(lines)
+    elif strategy == "tokens":
+        print(f"Using token-budget chunking strategy (max {options.get('max_tokens', DEFAULT_MAX_TOKENS)} "
+              f"tokens, {options.get('token_estimator', DEFAULT_ESTIMATOR)} estimator)...")
     else:
         print(f"Using size-based chunking strategy (max {options.get('max_chars', DEFAULT_MAX_CHARS)} chars)...")
-        chunk_by_size(lines, options.get('max_chars', DEFAULT_MAX_CHARS))
+
+    storage = options.get("storage", "files")
+    if storage == "spans":
+        # Record byte ranges of the cleaned file instead of copying each chunk
+        count = write_spans(chunk_file_spans(INPUT_FILE, options), OUTPUT_DIR)
+        print(f"Recorded {count} chunk spans in '{os.path.join(OUTPUT_DIR, SPANS_FILE)}'.")
+    else:
+        write = write_archive if storage == "packed" else write_chunks
+        if can_map_chunks(INPUT_FILE, strategy):
+            # Boundaries come from the memory map; only one chunk is decoded at a time
+            spans = iter_mapped_chunks(INPUT_FILE, options)
+            count = write(((span.chunk_id, span_text(span)) for span in spans), OUTPUT_DIR)
+        else:
+            with open(INPUT_FILE, "r", encoding="utf-8") as f:
+                lines = [line.rstrip() for line in f]
+            count = write(iter_line_chunks(lines, options), OUTPUT_DIR)
+        if storage == "packed":
+            print(f"Packed {count} chunks into '{os.path.join(OUTPUT_DIR, ARCHIVE_FILE)}'.")
+
+    if options.get("structure_index", False):
+        # Imported here: structure_index uses this module's patterns
+        from structure_index import index_file, save_index
+        index = index_file(INPUT_FILE)
+        print(f"Indexed {len(index.nodes)} divisions, titles and sections in "
+              f"'{save_index(index, OUTPUT_DIR)}'.")
 
     print("Chunking complete. Check the 'chunks' directory for output files.")
 
 # Default behavior when run directly
 if __name__ == "__main__":
-    process_with_options({"strategy": "size", "max_chars": DEFAULT_MAX_CHARS})
\ No newline at end of file
+    process_with_options({"strategy": "size", "max_chars": DEFAULT_MAX_CHARS, "structure_index": True})
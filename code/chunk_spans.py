@@ -0,0 +1,152 @@
+import os
+import json
+import mmap
+import shutil
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# In "spans" chunk storage a chunk is not copied into its own file: it is a
+# (start, end) byte range of the cleaned file, which is memory-mapped and sliced
+# only when a stage actually needs the text. The span index and every span
+# record also hold the (size, mtime) of the cleaned file they were taken from,
+# so offsets are never applied to a file that has been cleaned again since.
+SPANS_FILE = "spans.json"
+SKIPPABLE_BYTES = b" \t\r\n"
+
+
+class ChunkSpan(NamedTuple):
+    chunk_id: str
+    source: str
+    start: int
+    end: int
+
+
+# One read-only map per source file and process, with the (size, mtime) it was
+# opened at; worker processes open their own
+_source_maps: Dict[str, Tuple[mmap.mmap, Tuple[int, int]]] = {}
+
+
+def open_source(path: str) -> mmap.mmap:
+    """Return a read-only memory map of path, reusing one if the file is unchanged."""
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    entry = _source_maps.get(path)
+    if entry is not None:
+        mm, opened_version = entry
+        if not mm.closed and opened_version == version:
+            return mm
+        # The file was rewritten since it was mapped; a view still in use
+        # keeps the old map open until it is released
+        try:
+            mm.close()
+        except BufferError:
+            pass
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _source_maps[path] = (mm, version)
+    return mm
+
+
+def close_sources() -> None:
+    """Close every memory map opened by this process."""
+    for mm, _ in _source_maps.values():
+        mm.close()
+    _source_maps.clear()
+
+
+def span_bytes(span: ChunkSpan) -> memoryview:
+    """Return the span's bytes as a zero-copy view into the mapped source."""
+    return memoryview(open_source(span.source))[span.start:span.end]
+
+
+def span_text(span: ChunkSpan) -> str:
+    """Decode the span's text; this is the only copy made of it."""
+    view = span_bytes(span)
+    try:
+        return str(view, "utf-8")
+    finally:
+        view.release()
+
+
+def locate_offsets(chunks: Iterable[Tuple[str, str]], buffer: Any,
+                   name: str = "the document") -> Iterator[Tuple[str, int, int]]:
+    """Find the (chunk_id, start, end) byte range of each chunk in buffer, in order.
+
+    Chunks are consecutive pieces of the cleaned text, separated by at most the
+    line breaks the chunkers dropped, so each one is matched at the current
+    position rather than searched for.
+    """
+    cursor = 0
+    for chunk_id, content in chunks:
+        data = content.encode("utf-8")
+        while buffer.find(data, cursor, cursor + len(data)) != cursor:
+            if cursor >= len(buffer) or buffer[cursor] not in SKIPPABLE_BYTES:
+                raise ValueError(f"Chunk {chunk_id} does not match {name} at byte {cursor}")
+            cursor += 1
+        yield chunk_id, cursor, cursor + len(data)
+        cursor += len(data)
+
+
+def locate_spans(chunks: Iterable[Tuple[str, str]], source: str) -> Iterator[ChunkSpan]:
+    """Find where each (chunk_id, content) chunk lies in source, in order."""
+    if os.path.getsize(source) == 0:
+        return
+    for chunk_id, start, end in locate_offsets(chunks, open_source(source), source):
+        yield ChunkSpan(chunk_id, source, start, end)
+
+
+def source_version(path: str) -> List[int]:
+    """Return the [size, mtime_ns] identifying the current contents of a source file."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def check_source(path: str, version: Optional[List[int]]) -> None:
+    """Raise ValueError if path is not the file version the spans were taken from."""
+    if version is not None and (not os.path.exists(path) or source_version(path) != list(version)):
+        raise ValueError(f"'{path}' has changed since it was chunked into spans; "
+                         "re-run chunking (and extraction) on it")
+
+
+def write_spans(spans: Iterable[ChunkSpan], directory: str) -> int:
+    """Write the span index to <directory>/spans.json and return the chunk count."""
+    os.makedirs(directory, exist_ok=True)
+    spans = list(spans)
+    index = {
+        "source": spans[0].source if spans else None,
+        "version": source_version(spans[0].source) if spans else None,
+        "spans": [[s.chunk_id, s.start, s.end] for s in spans]
+    }
+    with open(os.path.join(directory, SPANS_FILE), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return len(spans)
+
+
+def spans_exist(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, SPANS_FILE))
+
+
+def read_spans(directory: str) -> List[ChunkSpan]:
+    """Load the span index written by write_spans, checking its source is unchanged."""
+    with open(os.path.join(directory, SPANS_FILE), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    if index["source"] is not None:
+        check_source(index["source"], index.get("version"))
+    return [ChunkSpan(chunk_id, index["source"], start, end)
+            for chunk_id, start, end in index["spans"]]
+
+
+def span_record(span: ChunkSpan) -> Dict[str, Any]:
+    """Return the reference stored in place of original_text for a span chunk."""
+    return {"file": span.source, "start": span.start, "end": span.end, "version": source_version(span.source)}
+
+
+def record_span(record: Dict[str, Any]) -> ChunkSpan:
+    """Rebuild the ChunkSpan referenced by a chunk record's "source_span", checking its source is unchanged."""
+    ref = record["source_span"]
+    check_source(ref["file"], ref.get("version"))
+    return ChunkSpan(record["chunk_id"], ref["file"], ref["start"], ref["end"])
+
+
+def copy_source(source: str, target: str) -> None:
+    """Reconstruct a span-chunked document: one copy of the cleaned file."""
+    shutil.copyfile(source, target)
@@ -2,6 +2,8 @@ import os
 import json
 import re
 
+from fact_store import detect_format, iter_fact_payloads, list_json_chunk_files
+
 JSON_DIR = "json_chunks"
 
 # Basic expectations:
@@ -60,41 +62,54 @@ def has_meaningful_data(data):
 
     return True, None
 
-for filename in os.listdir(JSON_DIR):
-    if filename.endswith(".json"):
-        filepath = os.path.join(JSON_DIR, filename)
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
-            # Basic structural keys check
-            required_keys = {
-                "chunk_id",
-                "references",
-                "funding",
-                "deadlines",
-                "duties_and_requirements",
-                "programs_and_entities",
-                "dates",
-                "other_facts"
-            }
-            if not required_keys.issubset(data.keys()):
-                missing = required_keys - data.keys()
-                failures.append((filename, f"Missing expected keys: {missing}"))
-                continue
-            
-            # Check for presence of some data
-            valid, msg = has_meaningful_data(data)
-            if not valid:
-                failures.append((filename, msg))
-                continue
-
-            success_count += 1
-        
-        except json.JSONDecodeError as e:
-            failures.append((filename, f"JSON decode error: {str(e)}"))
-        except Exception as e:
-            failures.append((filename, f"Unexpected error: {str(e)}"))
+def load_json(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def iter_chunk_records():
+    # Yield (name, loader) for every chunk, whatever the fact store layout.
+    # Decoding happens in the loader, so a broken .json file or a corrupt
+    # jsonl/binary/sqlite record is reported on its own and the rest still run.
+    fmt = detect_format(JSON_DIR)
+    if fmt == "json":
+        for filename in list_json_chunk_files(JSON_DIR):
+            yield filename, lambda path=os.path.join(JSON_DIR, filename): load_json(path)
+    else:
+        for name, payload in iter_fact_payloads(JSON_DIR, fmt):
+            yield name, lambda payload=payload: json.loads(payload)
+
+for filename, load in iter_chunk_records():
+    try:
+        data = load()
+
+        # Basic structural keys check
+        required_keys = {
+            "chunk_id",
+            "references",
+            "funding",
+            "deadlines",
+            "duties_and_requirements",
+            "programs_and_entities",
+            "dates",
+            "other_facts"
+        }
+        if not required_keys.issubset(data.keys()):
+            missing = required_keys - data.keys()
+            failures.append((filename, f"Missing expected keys: {missing}"))
+            continue
+
+        # Check for presence of some data
+        valid, msg = has_meaningful_data(data)
+        if not valid:
+            failures.append((filename, msg))
+            continue
+
+        success_count += 1
+
+    except json.JSONDecodeError as e:
+        failures.append((filename, f"JSON decode error: {str(e)}"))
+    except Exception as e:
+        failures.append((filename, f"Unexpected error: {str(e)}"))
 
 # Report
 print(f"Tested {success_count + len(failures)} files.")
@@ -0,0 +1,309 @@
+import os
+import re
+import sys
+import bisect
+import argparse
+from array import array
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import fact_store
+from fact_store import read_columns, write_columns
+
+# Citation graph: which chunks cite which U.S. Code sections and Public Laws.
+# References are canonicalized to (title, section, subsection), e.g.
+# "42\nU.S.C. 5121(a)(2))." -> ("42", "5121", "(a)(2)") -> "42 U.S.C. 5121(a)(2)",
+# and numbered in sorted order, so every subsection of a section, and every
+# section of a title, has ids in one contiguous range.
+#
+# Edges are kept both ways as compressed adjacency arrays: chunk_cites[
+# chunk_start[c]:chunk_start[c + 1]] are the citations of chunk c, and
+# cite_chunks[cite_start[k]:cite_start[k + 1]] the chunks citing citation k.
+# Graphs of several bills merge into one, with each chunk labelled by its bill.
+GRAPH_FILE = "citation_graph.bin"
+MAGIC = b"CITEGRF1"
+
+us_code_citation = re.compile(
+    r'^(\d+)\s*U\.?\s*S\.?\s*C\.?\s*(?:§+\s*)?(\d+[A-Za-z]*(?:[-–]\d+[A-Za-z]*)*)((?:\([A-Za-z0-9]+\))*)',
+    re.IGNORECASE)
+us_code_title = re.compile(r'^(\d+)\s*U\.?\s*S\.?\s*C\.?$', re.IGNORECASE)
+public_law_citation = re.compile(r'^(?:Public Law|Pub\.?\s*L\.?|P\.?\s*L\.?)\s*(\d+)\s*[-–]\s*(\d+)', re.IGNORECASE)
+whitespace = re.compile(r'\s+')
+
+
+def parse_citation(ref: str) -> Optional[Tuple[str, str, str]]:
+    """Return (title, section, subsection) for a U.S.C. or Public Law reference, None if it is neither.
+
+    A Public Law is ("Public Law", "<congress>-<number>", "").
+    """
+    ref = whitespace.sub(" ", ref).strip()
+    m = us_code_citation.match(ref)
+    if m:
+        return m.group(1), m.group(2).replace("–", "-"), m.group(3)
+    m = public_law_citation.match(ref)
+    if m:
+        return "Public Law", f"{m.group(1)}-{m.group(2)}", ""
+    return None
+
+
+def citation_key(parts: Tuple[str, str, str]) -> str:
+    title, section, subsection = parts
+    if title == "Public Law":
+        return f"Public Law {section}"
+    return f"{title} U.S.C. {section}{subsection}"
+
+
+def section_key(key: str) -> str:
+    """Return the section a citation key belongs to ("42 U.S.C. 5121(a)" -> "42 U.S.C. 5121")."""
+    return key.split("(", 1)[0]
+
+
+def query_prefixes(query: str) -> Tuple[str, List[str]]:
+    """Return the canonical form of a query and the key prefixes that fall under it.
+
+    A section or subsection also matches its subsections; a bare title
+    ("42 U.S.C.") matches all of its sections.
+    """
+    query = whitespace.sub(" ", query).strip()
+    m = us_code_title.match(query)
+    if m:
+        key = f"{m.group(1)} U.S.C."
+        return key, [key + " "]
+    parts = parse_citation(query)
+    if parts is None:
+        raise ValueError(f"'{query}' is not a U.S. Code or Public Law citation")
+    key = citation_key(parts)
+    return key, [key + "("] if parts[0] != "Public Law" else []
+
+
+def chunk_citation_keys(data: Dict[str, Any]) -> List[str]:
+    """Return the canonical citations of one chunk's record, in first-seen order."""
+    references = data.get("references", {})
+    keys = {}
+    for ref in list(references.get("us_code", [])) + list(references.get("public_laws", [])):
+        parts = parse_citation(ref)
+        if parts is not None:
+            keys[citation_key(parts)] = None
+    return list(keys)
+
+
+class CitationGraphWriter:
+    """Collect the citations of chunk records and write them as a citation graph."""
+
+    def __init__(self):
+        self.bills: List[str] = []
+        self.bill_ids: Dict[str, int] = {}
+        self.chunks: List[str] = []
+        self.chunk_bill = array("i")
+        self.chunk_keys: List[List[str]] = []
+
+    def add_chunk(self, label: str, keys: Iterable[str], bill: str = "") -> None:
+        if bill not in self.bill_ids:
+            self.bill_ids[bill] = len(self.bills)
+            self.bills.append(bill)
+        self.chunks.append(label)
+        self.chunk_bill.append(self.bill_ids[bill])
+        self.chunk_keys.append(list(keys))
+
+    def add(self, data: Dict[str, Any], bill: str = "") -> None:
+        """Add one chunk's record."""
+        self.add_chunk(data["chunk_id"], chunk_citation_keys(data), bill)
+
+    def build(self) -> "CitationGraph":
+        """Number the citations in sorted order and build both adjacency arrays."""
+        citations = sorted({key for keys in self.chunk_keys for key in keys})
+        ids = {key: i for i, key in enumerate(citations)}
+        chunk_start = array("I", [0])
+        chunk_cites = array("I")
+        for keys in self.chunk_keys:
+            chunk_cites.extend(sorted(ids[key] for key in keys))
+            chunk_start.append(len(chunk_cites))
+
+        # Transpose: count the chunks of every citation, then fill them in chunk order
+        cite_start = array("I", [0]) * (len(citations) + 1)
+        for cite in chunk_cites:
+            cite_start[cite + 1] += 1
+        for i in range(len(citations)):
+            cite_start[i + 1] += cite_start[i]
+        cite_chunks = array("I", [0]) * len(chunk_cites)
+        fill = cite_start[:-1]
+        for chunk in range(len(self.chunks)):
+            for cite in chunk_cites[chunk_start[chunk]:chunk_start[chunk + 1]]:
+                cite_chunks[fill[cite]] = chunk
+                fill[cite] += 1
+
+        return CitationGraph(self.bills, self.chunks, citations, {
+            "chunk_bill": self.chunk_bill, "chunk_start": chunk_start, "chunk_cites": chunk_cites,
+            "cite_start": cite_start, "cite_chunks": cite_chunks})
+
+    def write(self, directory: str) -> str:
+        """Write the graph to <directory>/citation_graph.bin and return its path."""
+        return self.build().save(directory)
+
+
+class CitationGraph:
+    """Chunk <-> citation adjacency with lookups by citation, section or title."""
+
+    def __init__(self, bills: List[str], chunks: List[str], citations: List[str],
+                 columns: Dict[str, array]):
+        self.bills = bills
+        self.chunks = chunks
+        self.citations = citations
+        self.chunk_bill = columns["chunk_bill"]
+        self.chunk_start = columns["chunk_start"]
+        self.chunk_cites = columns["chunk_cites"]
+        self.cite_start = columns["cite_start"]
+        self.cite_chunks = columns["cite_chunks"]
+
+    def save(self, directory: str) -> str:
+        path = os.path.join(directory, GRAPH_FILE)
+        write_columns(path, MAGIC, {"bills": self.bills, "chunks": self.chunks, "citations": self.citations},
+                      {"chunk_bill": self.chunk_bill, "chunk_start": self.chunk_start,
+                       "chunk_cites": self.chunk_cites, "cite_start": self.cite_start,
+                       "cite_chunks": self.cite_chunks})
+        return path
+
+    def chunk_label(self, chunk: int) -> str:
+        bill = self.bills[self.chunk_bill[chunk]]
+        return f"{bill}:{self.chunks[chunk]}" if bill else self.chunks[chunk]
+
+    def citations_of(self, chunk: int) -> List[int]:
+        return list(self.chunk_cites[self.chunk_start[chunk]:self.chunk_start[chunk + 1]])
+
+    def chunks_of(self, cite: int) -> List[int]:
+        return list(self.cite_chunks[self.cite_start[cite]:self.cite_start[cite + 1]])
+
+    def matching(self, query: str) -> List[int]:
+        """Return the ids of the citations a query covers (see query_prefixes)."""
+        key, prefixes = query_prefixes(query)
+        found = []
+        i = bisect.bisect_left(self.citations, key)
+        if i < len(self.citations) and self.citations[i] == key:
+            found.append(i)
+        for prefix in prefixes:
+            start = bisect.bisect_left(self.citations, prefix)
+            found.extend(range(start, bisect.bisect_left(self.citations, prefix + "\uffff", start)))
+        return found
+
+    def touches(self, query: str) -> List[Tuple[int, List[int]]]:
+        """Return (chunk, citations it has under the query) for every chunk citing the query."""
+        by_chunk: Dict[int, List[int]] = {}
+        for cite in self.matching(query):
+            for chunk in self.chunks_of(cite):
+                by_chunk.setdefault(chunk, []).append(cite)
+        return sorted(by_chunk.items())
+
+    def cocited(self, query: str, by_section: bool = True) -> List[Tuple[str, int]]:
+        """Return (citation, chunks) for citations that share chunks with the query, most shared first.
+
+        With by_section, subsections are counted as their section.
+        """
+        matched = set(self.matching(query))
+        counts: Counter = Counter()
+        for chunk in sorted({chunk for cite in matched for chunk in self.chunks_of(cite)}):
+            keys = {self.citations[cite] for cite in self.citations_of(chunk) if cite not in matched}
+            if by_section:
+                keys = {section_key(key) for key in keys}
+            counts.update(keys)
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def most_cited(self, by_section: bool = True) -> List[Tuple[str, int]]:
+        """Return (citation, chunks citing it) for every citation, most cited first."""
+        chunks: Dict[str, set] = {}
+        for cite, key in enumerate(self.citations):
+            chunks.setdefault(section_key(key) if by_section else key, set()).update(self.chunks_of(cite))
+        return sorted(((key, len(c)) for key, c in chunks.items()), key=lambda item: (-item[1], item[0]))
+
+
+def graph_exists(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, GRAPH_FILE))
+
+
+def load_graph(directory: str) -> CitationGraph:
+    header, columns = read_columns(os.path.join(directory, GRAPH_FILE), MAGIC)
+    return CitationGraph(header["bills"], header["chunks"], header["citations"], columns)
+
+
+def bill_name(directory: str) -> str:
+    """Name a bill after its workspace: batch_output/<bill>/json_chunks -> <bill>."""
+    path = os.path.abspath(directory)
+    if os.path.basename(path) == fact_store.DEFAULT_JSON_DIR:
+        path = os.path.dirname(path)
+    return os.path.basename(path)
+
+
+def merge_graphs(directories: List[str]) -> CitationGraph:
+    """Combine the graphs saved in several directories; unnamed bills are named after their directory."""
+    if len(directories) == 1:
+        return load_graph(directories[0])
+    writer = CitationGraphWriter()
+    for directory in directories:
+        graph = load_graph(directory)
+        for chunk, label in enumerate(graph.chunks):
+            bill = graph.bills[graph.chunk_bill[chunk]] or bill_name(directory)
+            writer.add_chunk(label, (graph.citations[cite] for cite in graph.citations_of(chunk)), bill)
+    return writer.build()
+
+
+def build_from_store(directory: str) -> str:
+    """Build the graph of an existing fact store (no text is read) and save it next to it."""
+    writer = CitationGraphWriter()
+    fmt = fact_store.detect_format(directory)
+    for record in fact_store.iter_records(directory, fmt, include_text=False):
+        writer.add(record)
+    return writer.write(directory)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the citation graph of U.S. Code and Public Law references.")
+    parser.add_argument("command", choices=("touches", "cocited", "top", "build", "merge"))
+    parser.add_argument("citation", nargs="?", help='e.g. "42 U.S.C. 5121", "42 U.S.C.", "Public Law 118-83"')
+    parser.add_argument("--dir", action="append",
+                        help="directory holding citation_graph.bin (repeat to query several bills together)")
+    parser.add_argument("--output", help="directory to write the merged graph to (merge)")
+    parser.add_argument("--subsections", action="store_true",
+                        help="count subsections separately instead of rolling them up to their section")
+    parser.add_argument("--limit", type=int, default=20, help="rows to print")
+    args = parser.parse_args()
+    directories = args.dir or [fact_store.DEFAULT_JSON_DIR]
+
+    if args.command == "build":
+        for directory in directories:
+            print(f"Wrote {build_from_store(directory)}")
+        return
+    missing = [d for d in directories if not graph_exists(d)]
+    if missing:
+        print(f"No citation graph in {', '.join(missing)}. Run fact extraction with citation_graph "
+              f"enabled, or 'python citation_graph.py build --dir <dir>'.")
+        sys.exit(1)
+    graph = merge_graphs(directories)
+
+    if args.command == "merge":
+        if not args.output:
+            parser.error("merge needs --output")
+        os.makedirs(args.output, exist_ok=True)
+        print(f"Merged {len(graph.bills)} bills, {len(graph.chunks)} chunks and "
+              f"{len(graph.citations)} citations into {graph.save(args.output)}")
+        return
+    if args.command == "top":
+        for key, chunks in graph.most_cited(not args.subsections)[:args.limit]:
+            print(f"  {chunks:>5} chunks  {key}")
+        return
+    if not args.citation:
+        parser.error(f"{args.command} needs a citation")
+    try:
+        if args.command == "touches":
+            found = graph.touches(args.citation)
+            print(f"{len(found)} chunks cite {query_prefixes(args.citation)[0]}")
+            for chunk, cites in found[:args.limit]:
+                print(f"  {graph.chunk_label(chunk):<30} {', '.join(graph.citations[c] for c in cites)}")
+        else:
+            for key, chunks in graph.cocited(args.citation, not args.subsections)[:args.limit]:
+                print(f"  {chunks:>5} chunks  {key}")
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
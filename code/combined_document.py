@@ -0,0 +1,375 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import itertools
+from typing import Dict, Any, Iterator, List, Optional
+
+import fact_store
+from fact_model import FactTable, ValuePool
+
+REFERENCE_TYPES = ("us_code", "public_laws", "other_legislative_refs")
+FACT_LIST_TYPES = ("funding", "deadlines", "duties_and_requirements", "dates", "other_facts")
+COPY_BLOCK_CHARS = 1024 * 1024
+COPY_BLOCK_BYTES = 1024 * 1024
+WRITE_BATCH = 256  # list elements encoded per json.dumps call by write_json
+END = object()
+INDEX_SUFFIX = ".idx"  # sidecar index: combined_document.json.idx
+
+
+def indent_json(value: Any, level: int) -> str:
+    """Encode value as json.dump(..., indent=2) would when nested `level` deep."""
+    return json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n" + "  " * level)
+
+
+def byte_position(out) -> int:
+    """Return the byte offset of a text file being written (flushing it first)."""
+    out.flush()
+    return out.buffer.tell()
+
+
+def write_json(out, value: Any, level: int = 0, index: Optional[Dict[str, List[int]]] = None,
+               path: str = "") -> None:
+    """Write value to out as indent_json(value, level) would, without encoding it whole.
+
+    Dicts are written key by key, and lists and other iterables (FactTables,
+    dict views) a batch of elements at a time. If index is given, the byte
+    range of every dict value is recorded in it under its key path ("a/b").
+    """
+    if isinstance(value, dict):
+        if not value:
+            out.write("{}")
+            return
+        pad = "\n" + "  " * (level + 1)
+        for i, (key, item) in enumerate(value.items()):
+            out.write(("{" if i == 0 else ",") + pad + json.dumps(key, ensure_ascii=False) + ": ")
+            if index is None:
+                write_json(out, item, level + 1)
+                continue
+            index[path + key] = start = byte_position(out)  # parent sections before their children
+            write_json(out, item, level + 1, index, f"{path}{key}/")
+            index[path + key] = [start, byte_position(out)]
+        out.write("\n" + "  " * level + "}")
+    elif isinstance(value, (str, int, float, bool)) or value is None:
+        out.write(json.dumps(value, ensure_ascii=False))
+    else:
+        # Elements are encoded WRITE_BATCH at a time, as a list whose brackets are cut off
+        close = "\n" + "  " * level + "]"
+        empty = True
+        batch = []
+        for item in itertools.chain(value, [END]):
+            if item is not END:
+                batch.append(item)
+                if len(batch) < WRITE_BATCH:
+                    continue
+            if batch:
+                out.write(("[" if empty else ",") + indent_json(batch, level)[1:-len(close)])
+                empty = False
+                batch = []
+        out.write("[]" if empty else close)
+
+
+class FactAggregator:
+    """Collect the facts of every chunk in one pass, in chunk order.
+
+    References and programs/entities are kept in ordered sets (dicts), so each
+    chunk costs time proportional to its own facts and the first occurrence of
+    a value decides its position. Fact lists are kept in FactTables over one
+    shared ValuePool (see fact_model), so repeated values are stored once.
+    """
+
+    def __init__(self):
+        self.pool = ValuePool()
+        self.references = {ref_type: {} for ref_type in REFERENCE_TYPES}
+        self.facts = {data_type: FactTable(self.pool) for data_type in FACT_LIST_TYPES}
+        self.entities: Dict[Any, None] = {}
+
+    def add(self, chunk_data: Dict[str, Any]) -> None:
+        references = chunk_data.get("references", {})
+        for ref_type in REFERENCE_TYPES:
+            self.references[ref_type].update(dict.fromkeys(references.get(ref_type, [])))
+        for data_type in FACT_LIST_TYPES:
+            self.facts[data_type].extend(chunk_data.get(data_type, []))
+        self.entities.update(dict.fromkeys(chunk_data.get("programs_and_entities", [])))
+
+    def aggregated_view(self) -> Dict[str, Any]:
+        """Return the aggregated data with its lists left as iterables (for write_json)."""
+        return {
+            "references": {ref_type: values.keys() for ref_type, values in self.references.items()},
+            "funding": self.facts["funding"],
+            "deadlines": self.facts["deadlines"],
+            "duties_and_requirements": self.facts["duties_and_requirements"],
+            "programs_and_entities": self.entities.keys(),
+            "dates": self.facts["dates"],
+            "other_facts": self.facts["other_facts"]
+        }
+
+    def aggregated_data(self) -> Dict[str, Any]:
+        view = self.aggregated_view()
+        view["references"] = {ref_type: list(values) for ref_type, values in view["references"].items()}
+        return {key: value if key == "references" else list(value) for key, value in view.items()}
+
+
+class CombinedDocumentWriter:
+    """Write the combined JSON document and/or reconstructed text while chunks are read.
+
+    Chunk entries and text are spooled to disk as each chunk arrives; closing
+    the writer splices them in after the aggregated data, giving the same file
+    as json.dump(..., indent=2) of the whole document held in memory.
+    An aggregator whose facts are already collected (such as the SQLite
+    store's queries) can be passed in place of the default FactAggregator.
+    """
+
+    def __init__(self, json_path: Optional[str], text_path: Optional[str],
+                 metadata: Dict[str, Any], include_chunks: bool, include_text: bool,
+                 aggregator: Optional[Any] = None):
+        self.json_path = json_path
+        self.text_path = text_path
+        self.metadata = metadata
+        self.include_chunks = bool(json_path) and include_chunks
+        self.include_text = bool(json_path) and include_text
+        # Anything with add() and aggregated_data(), e.g. fact_db.DatabaseAggregator
+        self.aggregator = aggregator if aggregator is not None else FactAggregator()
+        self.chunk_count = 0
+        self.text_count = 0
+
+        # Chunk entries are spooled as UTF-8 bytes, so each one's byte range is known
+        self.chunks_spool = None
+        self.spool_bytes = 0
+        self.chunk_ranges: List[List[Any]] = []  # chunk_id, start, end (in the spool), sections
+        if self.include_chunks:
+            self.chunks_spool = open(json_path + ".chunks.tmp", "wb")
+
+        # Text goes straight to the text file; the JSON's full_text is read back from it
+        self.text_file = None
+        self.text_spool_path = text_path
+        if self.include_text and not text_path:
+            self.text_spool_path = json_path + ".text.tmp"
+        if self.text_spool_path:
+            self.text_file = open(self.text_spool_path, "w", encoding="utf-8", newline="")
+
+    def add(self, chunk_data: Dict[str, Any]) -> None:
+        """Add one chunk's data, in document order."""
+        if self.include_text:
+            # Span chunks keep their text in the cleaned file
+            chunk_data = fact_store.with_text(chunk_data)
+
+        if self.text_file is not None and "original_text" in chunk_data:
+            if self.text_count:
+                self.text_file.write("\n")
+            self.text_file.write(chunk_data["original_text"])
+            self.text_count += 1
+
+        if self.include_chunks:
+            if not self.include_text:
+                # Leave out original text to save space if not needed
+                chunk_data = {k: v for k, v in chunk_data.items() if k != "original_text"}
+            entry = indent_json(chunk_data, 2).encode("utf-8")
+            if self.chunk_count:
+                self.spool_bytes += self.chunks_spool.write(b",\n")
+            self.spool_bytes += self.chunks_spool.write(b"    ")
+            sections = chunk_data.get("sections", {}).get("chunk", [])
+            self.chunk_ranges.append([chunk_data.get("chunk_id"), self.spool_bytes,
+                                      self.spool_bytes + len(entry), sections])
+            self.spool_bytes += self.chunks_spool.write(entry)
+            self.chunk_count += 1
+
+        self.aggregator.add(chunk_data)
+
+    def write_full_text(self, out) -> None:
+        """Copy the spooled text into out as a JSON string body, a block at a time."""
+        with open(self.text_spool_path, "r", encoding="utf-8", newline="") as f:
+            while True:
+                block = f.read(COPY_BLOCK_CHARS)
+                if not block:
+                    break
+                out.write(json.dumps(block, ensure_ascii=False)[1:-1])
+
+    def close(self) -> None:
+        """Finish the output files and remove the spools."""
+        if self.text_file is not None:
+            self.text_file.close()
+        if self.chunks_spool is not None:
+            self.chunks_spool.close()
+
+        if self.json_path:
+            index = {"metadata": None, "sections": {}, "full_text": None, "chunks": []}
+            with open(self.json_path, "w", encoding="utf-8") as out:
+                out.write('{\n  "document_metadata": ')
+                start = byte_position(out)
+                out.write(indent_json(self.metadata, 1))
+                index["metadata"] = [start, byte_position(out)]
+                out.write(',\n  "aggregated_data": ')
+                # Stream the aggregator's own model when it has one
+                view = getattr(self.aggregator, "aggregated_view", self.aggregator.aggregated_data)
+                write_json(out, view(), 1, index["sections"])
+                if self.include_text:
+                    out.write(',\n  "full_text": ')
+                    start = byte_position(out)
+                    out.write('"')
+                    self.write_full_text(out)
+                    out.write('"')
+                    index["full_text"] = [start, byte_position(out)]
+                if self.include_chunks:
+                    out.write(',\n  "chunks": ')
+                    if self.chunk_count:
+                        out.write("[\n")
+                        # Both files are UTF-8, so the spool is copied as bytes
+                        base = byte_position(out)
+                        with open(self.chunks_spool.name, "rb") as spool:
+                            shutil.copyfileobj(spool, out.buffer, COPY_BLOCK_BYTES)
+                        out.write("\n  ]")
+                        index["chunks"] = [[chunk_id, base + start, base + end, sections]
+                                           for chunk_id, start, end, sections in self.chunk_ranges]
+                    else:
+                        out.write("[]")
+                out.write("\n}")
+            write_index(self.json_path, index)
+        self.remove_spools()
+
+    def remove_spools(self) -> None:
+        if self.chunks_spool is not None and os.path.exists(self.chunks_spool.name):
+            os.remove(self.chunks_spool.name)
+        if self.text_spool_path and self.text_spool_path != self.text_path \
+                and os.path.exists(self.text_spool_path):
+            os.remove(self.text_spool_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            for f in (self.text_file, self.chunks_spool):
+                if f is not None:
+                    f.close()
+            self.remove_spools()
+
+
+# Sidecar index: the byte range of the metadata, of every aggregated_data
+# section ("funding", "references/us_code", ...), of full_text and of every
+# chunk entry, with each chunk's sections, so a reader can parse just the
+# part it needs. It records the size of the document it describes.
+def write_index(json_path: str, index: Dict[str, Any]) -> str:
+    """Write the sidecar index of a combined document written by CombinedDocumentWriter."""
+    index = dict(index, size=os.path.getsize(json_path))
+    path = json_path + INDEX_SUFFIX
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, path)
+    return path
+
+
+def index_exists(json_path: str) -> bool:
+    return os.path.exists(json_path + INDEX_SUFFIX)
+
+
+class CombinedDocumentReader:
+    """Lazy, random access to a combined document through its sidecar index.
+
+    Only the requested part of the file is read and parsed. Indexing by chunk
+    id works like a dict of the chunk entries (reader["042"]); sections of the
+    aggregated data are read with section("funding").
+    """
+
+    def __init__(self, json_path: str):
+        with open(json_path + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        if os.path.getsize(json_path) != self.index["size"]:
+            raise ValueError(f"{json_path} has changed since its index was written; reconstruct it again")
+        self.file = open(json_path, "rb")
+        self.chunk_ranges = {chunk_id: (start, end) for chunk_id, start, end, _ in self.index["chunks"]}
+
+    def read(self, byte_range: List[int]) -> Any:
+        start, end = byte_range
+        self.file.seek(start)
+        return json.loads(self.file.read(end - start))
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.read(self.index["metadata"])
+
+    def section_names(self) -> List[str]:
+        return list(self.index["sections"])
+
+    def section(self, name: str) -> Any:
+        """Return one aggregated_data section, e.g. "funding" or "references/us_code"."""
+        if name not in self.index["sections"]:
+            raise KeyError(name)
+        return self.read(self.index["sections"][name])
+
+    def full_text(self) -> Optional[str]:
+        return self.read(self.index["full_text"]) if self.index["full_text"] else None
+
+    def keys(self) -> List[str]:
+        """Return the chunk ids, in document order."""
+        return [entry[0] for entry in self.index["chunks"]]
+
+    def __len__(self) -> int:
+        return len(self.index["chunks"])
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self.chunk_ranges
+
+    def __getitem__(self, chunk_id: str) -> Dict[str, Any]:
+        return self.read(self.chunk_ranges[chunk_id])
+
+    def get(self, chunk_id: str, default: Any = None) -> Any:
+        return self[chunk_id] if chunk_id in self else default
+
+    def chunks_in(self, path: str) -> Iterator[Dict[str, Any]]:
+        """Yield the chunks covering a division, title or section path, e.g. "division_b/title_vii"."""
+        for chunk_id, start, end, sections in self.index["chunks"]:
+            if any(section == path or section.startswith(path + "/") for section in sections):
+                yield self.read([start, end])
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Read parts of a combined document through its sidecar index.")
+    parser.add_argument("query", choices=("sections", "section", "chunks", "chunk", "in"))
+    parser.add_argument("name", nargs="?", help="section name, chunk id or division/title/section path")
+    parser.add_argument("--file", default=os.path.join("output", "combined_document.json"))
+    args = parser.parse_args()
+
+    if not index_exists(args.file):
+        print(f"No index for '{args.file}'. Reconstruct the document to write one.")
+        sys.exit(1)
+    start = time.perf_counter()
+    with CombinedDocumentReader(args.file) as reader:
+        if args.query == "sections":
+            result = reader.section_names()
+        elif args.query == "chunks":
+            result = reader.keys()
+        elif not args.name:
+            parser.error(f"'{args.query}' needs a name")
+        elif args.query == "section" and args.name not in reader.section_names():
+            print(f"No section '{args.name}'. Sections: {', '.join(reader.section_names())}")
+            sys.exit(1)
+        elif args.query == "section":
+            result = reader.section(args.name)
+        elif args.query == "chunk" and args.name not in reader:
+            print(f"No chunk '{args.name}' in the document's chunks ({len(reader)} chunks)")
+            sys.exit(1)
+        elif args.query == "chunk":
+            result = reader[args.name]
+        else:
+            result = list(reader.chunks_in(args.name))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"Read in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
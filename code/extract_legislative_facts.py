@@ -1,17 +1,36 @@
 import os
 import re
 import json
+import hashlib
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+from extraction_cache import ExtractionCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from fact_store import FactStoreWriter, DEFAULT_FORMAT, chunk_sort_key, remove_other_stores
+from citation_graph import CitationGraphWriter
+from fact_index import FactIndexWriter
+from funding_ledger import LedgerWriter
+from structure_index import index_exists, load_index, tag_facts
+from chunk_archive import archive_exists, iter_archive
+from chunk_spans import ChunkSpan, read_spans, span_record, span_text, spans_exist
 
 CHUNKS_DIR = "chunks"
 OUTPUT_DIR = "json_chunks"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+DEFAULT_WORKERS = 1  # 1 = extract in this process; 0 = one worker per CPU core
+
+# Bump this whenever the extraction logic changes in a way the patterns alone
+# don't capture, so cached results from the old logic are not reused
+EXTRACTOR_VERSION = "1"
 
 # Regex patterns (heuristic examples, adjust as needed)
+# These are compiled once when the module is imported, so every worker process
+# in the pool compiles them exactly once and reuses them for all its chunks.
 us_code_pattern = re.compile(r'\b\d+\s*U\.S\.C\.?\s*[\w\(\)\.\-]*', re.IGNORECASE)
 public_law_pattern = re.compile(r'Public Law \d+–\d+', re.IGNORECASE)
 
 # Funding pattern: lines with $, try to capture amount and purpose if on the same line
-funding_pattern = re.compile(r'\$(?P<amount>[0-9,]+)(.*?)(?:until|to remain|for fiscal year|for FY|\n|$)', 
+funding_pattern = re.compile(r'\$(?P<amount>[0-9,]+)(.*?)(?:until|to remain|for fiscal year|for FY|\n|$)',
                            re.IGNORECASE)
 
 # Dates & Deadlines: capture dates like "January 15, 2025" or "not later than January 15, 2025"
@@ -27,73 +46,239 @@ entity_pattern = re.compile(r'\b(Department of [A-Za-z\&\s]+|Office of [A-Za-z\&
 # Extract other legislative refs (Acts, e.g. "Robert T. Stafford Disaster Relief and Emergency Assistance Act")
 other_legislative_ref_pattern = re.compile(r'\b([A-Z][a-zA-Z\.]* [A-Z][a-zA-Z\.]* [A-Z][a-zA-Z\.]* (Act|Code))\b')
 
-for filename in os.listdir(CHUNKS_DIR):
-    if filename.endswith(".txt"):
-        filepath = os.path.join(CHUNKS_DIR, filename)
-        with open(filepath, "r", encoding="utf-8") as f:
-            text = f.read()
-
-        # Initialize the data structure
-        data = {
-            "chunk_id": filename.replace(".txt",""),
-            "original_text": text,  # Store the original text content
-            "references": {
-                "us_code": [],
-                "public_laws": [],
-                "other_legislative_refs": []
-            },
-            "funding": [],
-            "deadlines": [],
-            "duties_and_requirements": [],
-            "programs_and_entities": [],
-            "dates": [],
-            "other_facts": []
-        }
-
-        # Extract references
-        us_codes = us_code_pattern.findall(text)
-        if us_codes:
-            data["references"]["us_code"].extend(list(set(us_codes)))
-
-        pls = public_law_pattern.findall(text)
-        if pls:
-            data["references"]["public_laws"].extend(list(set(pls)))
-
-        other_refs = other_legislative_ref_pattern.findall(text)
-        # other_legislative_ref_pattern returns tuples due to the group (Act|Code), so extract first group only
-        if other_refs:
-            unique_other_refs = list(set([r[0] for r in other_refs]))
-            data["references"]["other_legislative_refs"].extend(unique_other_refs)
-
-        # Funding
-        # We'll split by lines and try to parse funding line-by-line
-        lines = text.split("\n")
-        for line in lines:
-            line_stripped = line.strip()
-            if not line_stripped:
-                continue
+# Purpose: look for "for <program name>" after a funding amount
+purpose_pattern = re.compile(r'for\s+([A-Za-z0-9,\-\s]+)', re.IGNORECASE)
+
+FACT_PATTERNS = [
+    us_code_pattern, public_law_pattern, funding_pattern, date_pattern,
+    not_later_than_pattern, duty_pattern, entity_pattern,
+    other_legislative_ref_pattern, purpose_pattern
+]
+
+
+def extractor_fingerprint() -> str:
+    """Hash the extractor version and pattern set; part of every cache key."""
+    h = hashlib.sha256(EXTRACTOR_VERSION.encode("utf-8"))
+    for pattern in FACT_PATTERNS:
+        h.update(f"\0{pattern.pattern}\0{pattern.flags}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def new_chunk_data(chunk_id: str, text: str) -> Dict[str, Any]:
+    """Return an empty data structure for one chunk."""
+    return {
+        "chunk_id": chunk_id,
+        "original_text": text,  # Store the original text content
+        "references": {
+            "us_code": [],
+            "public_laws": [],
+            "other_legislative_refs": []
+        },
+        "funding": [],
+        "deadlines": [],
+        "duties_and_requirements": [],
+        "programs_and_entities": [],
+        "dates": [],
+        "other_facts": []
+    }
+
+
+def extract_facts_reference(text: str, chunk_id: str) -> Dict[str, Any]:
+    """Extract facts by running every pattern over every line.
+
+    This is the straightforward reference implementation: extract_facts must
+    produce exactly the same data, and the benchmark checks that it does.
+    """
+    # Initialize the data structure
+    data = new_chunk_data(chunk_id, text)
+
+    # Extract references
+    # dict.fromkeys drops duplicates but keeps first-seen order, so the output
+    # is the same no matter which process (or hash seed) produced it
+    us_codes = us_code_pattern.findall(text)
+    if us_codes:
+        data["references"]["us_code"].extend(dict.fromkeys(us_codes))
+
+    pls = public_law_pattern.findall(text)
+    if pls:
+        data["references"]["public_laws"].extend(dict.fromkeys(pls))
+
+    other_refs = other_legislative_ref_pattern.findall(text)
+    # other_legislative_ref_pattern returns tuples due to the group (Act|Code), so extract first group only
+    if other_refs:
+        unique_other_refs = dict.fromkeys(r[0] for r in other_refs)
+        data["references"]["other_legislative_refs"].extend(unique_other_refs)
+
+    # Funding
+    # We'll split by lines and try to parse funding line-by-line
+    lines = text.split("\n")
+    for line in lines:
+        line_stripped = line.strip()
+        if not line_stripped:
+            continue
+
+        fund_match = funding_pattern.search(line_stripped)
+        if fund_match:
+            amount = fund_match.group("amount")
+            # Attempt to parse purpose from remainder of line after amount
+            remainder = line_stripped[fund_match.end("amount"):]
+            # Quick heuristic: look for "for XYZ" or mention of a program
+            purpose = None
+            availability = None
+
+            # Check if line mentions "available until"
+            if "until" in remainder.lower():
+                # Extract availability date if any
+                date_match = date_pattern.search(remainder)
+                if date_match:
+                    availability = date_match.group(0)
+                else:
+                    # If no specific date, just say "until" something else
+                    availability = "unspecified extended availability"
+
+            # Purpose: look for "for <program name>"
+            purpose_match = purpose_pattern.search(remainder)
+            if purpose_match:
+                purpose = purpose_match.group(1).strip()
+
+            data["funding"].append({
+                "amount": "$" + amount,
+                "purpose": purpose or "unspecified",
+                "availability": availability or "not specified",
+                "fiscal_years": []  # This would require extra logic if FY references appear
+            })
+
+        # Dates & Deadlines
+        # Direct dates
+        for m in date_pattern.finditer(line_stripped):
+            date_full = m.group(0)
+            if date_full not in data["dates"]:
+                data["dates"].append(date_full)
+
+        # Deadlines (not later than)
+        nl_match = not_later_than_pattern.search(line_stripped)
+        if nl_match:
+            deadline_date = nl_match.group(0).replace("not later than ", "").strip()
+            data["deadlines"].append({
+                "action": "unknown action",  # Without deeper parsing, we don't know what action is due
+                "date": deadline_date
+            })
+
+        # Duties/Requirements
+        duty_match = duty_pattern.search(line_stripped)
+        if duty_match:
+            entity = duty_match.group(1).strip()
+            modal = duty_match.group(2).strip()
+            action = duty_match.group(3).strip()
+            data["duties_and_requirements"].append({
+                "entity": entity,
+                "action": action
+            })
+
+        # Programs/Entities
+        entity_matches = entity_pattern.findall(line_stripped)
+        if entity_matches:
+            # Normalize casing and collect unique entities
+            for e in entity_matches:
+                e_norm = e.strip()
+                if e_norm not in data["programs_and_entities"]:
+                    data["programs_and_entities"].append(e_norm)
+
+    return data
+
+
+# Literal triggers for the single-pass scanner. Every pattern can only match a
+# line that contains one of its triggers, so lines without any are never handed
+# to the heavier regexes. Triggers are tested against the lower-cased line to
+# mirror re.IGNORECASE.
+MONTH_NAMES = ("january", "february", "march", "april", "may", "june", "july",
+               "august", "september", "october", "november", "december")
+DUTY_SUBJECTS = ("the secretary", "the administrator", "the comptroller general", "the director")
+DUTY_MODALS = ("shall", "may", "must")
+ENTITY_TRIGGERS = ("department of", "office of", "administration", "agency", "commission",
+                   "authority", "bureau", "inspector general")
+
+# re.IGNORECASE also equates these with ASCII letters (i, s, i), but str.lower()
+# does not, so chunks containing them skip the prefilters to stay exact
+case_alias_chars = re.compile('[\u0130\u0131\u017f]')
+
+
+def find_us_code_refs(text: str, folded: str) -> List[str]:
+    """Return us_code_pattern.findall(text) without scanning the whole chunk.
+
+    A match is a digit run, optional whitespace and "U.S.C", so the regex only
+    needs to be tried where "u.s.c" occurs, starting from the digits before it.
+    Matches can run across line breaks, which is why this works on the chunk.
+    """
+    refs = []
+    last_end = 0
+    pos = folded.find("u.s.c")
+    while pos != -1:
+        start = pos
+        while start > last_end and text[start - 1].isspace():
+            start -= 1
+        digits_end = start
+        while start > last_end and text[start - 1].isdecimal():
+            start -= 1
+        if start < digits_end:
+            m = us_code_pattern.match(text, start)
+            if m:
+                refs.append(m.group(0))
+                last_end = m.end()
+        pos = folded.find("u.s.c", max(pos + 1, last_end))
+    return refs
+
+
+def extract_facts(text: str, chunk_id: str) -> Dict[str, Any]:
+    """Extract references, funding, dates, duties and entities from one chunk of text.
+
+    Makes a single pass over the chunk's lines and only runs a pattern on lines
+    that contain its literal trigger ("$", a month name, "shall"/"may", ...).
+    The result is identical to extract_facts_reference.
+    """
+    if case_alias_chars.search(text):
+        return extract_facts_reference(text, chunk_id)
+
+    data = new_chunk_data(chunk_id, text)
+    folded = text.lower()
+
+    us_codes = find_us_code_refs(text, folded)
+    public_laws = []
+    other_refs = []
+    dates = data["dates"]
+    seen_dates = set()
+    entities = data["programs_and_entities"]
+    seen_entities = set()
+
+    for line, folded_line in zip(text.split("\n"), folded.split("\n")):
+        line_stripped = line.strip()
+        if not line_stripped:
+            continue
+        lower = folded_line.strip()
+
+        if "public law" in lower:
+            public_laws.extend(public_law_pattern.findall(line_stripped))
 
+        # The "(Act|Code)" pattern is case-sensitive
+        if "Act" in line_stripped or "Code" in line_stripped:
+            other_refs.extend(r[0] for r in other_legislative_ref_pattern.findall(line_stripped))
+
+        if "$" in line_stripped:
             fund_match = funding_pattern.search(line_stripped)
             if fund_match:
                 amount = fund_match.group("amount")
-                # Attempt to parse purpose from remainder of line after amount
                 remainder = line_stripped[fund_match.end("amount"):]
-                # Quick heuristic: look for "for XYZ" or mention of a program
                 purpose = None
                 availability = None
-                
-                # Check if line mentions "available until"
+
                 if "until" in remainder.lower():
-                    # Extract availability date if any
                     date_match = date_pattern.search(remainder)
                     if date_match:
                         availability = date_match.group(0)
                     else:
-                        # If no specific date, just say "until" something else
                         availability = "unspecified extended availability"
 
-                # Purpose: look for "for <program name>"
-                purpose_match = re.search(r'for\s+([A-Za-z0-9,\-\s]+)', remainder, re.IGNORECASE)
+                purpose_match = purpose_pattern.search(remainder)
                 if purpose_match:
                     purpose = purpose_match.group(1).strip()
 
@@ -101,53 +286,247 @@ for filename in os.listdir(CHUNKS_DIR):
                     "amount": "$" + amount,
                     "purpose": purpose or "unspecified",
                     "availability": availability or "not specified",
-                    "fiscal_years": []  # This would require extra logic if FY references appear
+                    "fiscal_years": []
                 })
 
-            # Dates & Deadlines
-            # Direct dates
-            date_matches = date_pattern.findall(line_stripped)
-            if date_matches:
-                # date_pattern finds month in group(1), but we need full match
-                # Use finditer for full matches:
-                for m in date_pattern.finditer(line_stripped):
-                    date_full = m.group(0)
-                    if date_full not in data["dates"]:
-                        data["dates"].append(date_full)
-
-            # Deadlines (not later than)
-            nl_match = not_later_than_pattern.search(line_stripped)
-            if nl_match:
-                deadline_date = nl_match.group(0).replace("not later than ", "").strip()
-                data["deadlines"].append({
-                    "action": "unknown action",  # Without deeper parsing, we don't know what action is due
-                    "date": deadline_date
-                })
+        # A date needs "<month> <day>, <year>", so a comma comes before any month test
+        if "," in lower and any(month in lower for month in MONTH_NAMES):
+            for m in date_pattern.finditer(line_stripped):
+                date_full = m.group(0)
+                if date_full not in seen_dates:
+                    seen_dates.add(date_full)
+                    dates.append(date_full)
 
-            # Duties/Requirements
+            if "not later than" in lower:
+                nl_match = not_later_than_pattern.search(line_stripped)
+                if nl_match:
+                    deadline_date = nl_match.group(0).replace("not later than ", "").strip()
+                    data["deadlines"].append({
+                        "action": "unknown action",
+                        "date": deadline_date
+                    })
+
+        if (any(modal in lower for modal in DUTY_MODALS)
+                and any(subject in lower for subject in DUTY_SUBJECTS)):
             duty_match = duty_pattern.search(line_stripped)
             if duty_match:
-                entity = duty_match.group(1).strip()
-                modal = duty_match.group(2).strip()
-                action = duty_match.group(3).strip()
                 data["duties_and_requirements"].append({
-                    "entity": entity,
-                    "action": action
+                    "entity": duty_match.group(1).strip(),
+                    "action": duty_match.group(3).strip()
                 })
 
-            # Programs/Entities
-            entity_matches = entity_pattern.findall(line_stripped)
-            if entity_matches:
-                # Normalize casing and collect unique entities
-                for e in entity_matches:
-                    e_norm = e.strip()
-                    if e_norm not in data["programs_and_entities"]:
-                        data["programs_and_entities"].append(e_norm)
-
-        # Write out JSON
-        out_name = filename.replace(".txt", ".json")
-        out_path = os.path.join(OUTPUT_DIR, out_name)
-        with open(out_path, "w", encoding="utf-8") as json_file:
-            json.dump(data, json_file, indent=2, ensure_ascii=False)
-
-print("Parsing complete. Check the 'json_chunks' directory for the JSON output files.")
\ No newline at end of file
+        if any(trigger in lower for trigger in ENTITY_TRIGGERS):
+            for e in entity_pattern.findall(line_stripped):
+                e_norm = e.strip()
+                if e_norm not in seen_entities:
+                    seen_entities.add(e_norm)
+                    entities.append(e_norm)
+
+    # dict.fromkeys drops duplicates but keeps first-seen order, so the output
+    # is the same no matter which process (or hash seed) produced it
+    data["references"]["us_code"].extend(dict.fromkeys(us_codes))
+    data["references"]["public_laws"].extend(dict.fromkeys(public_laws))
+    data["references"]["other_legislative_refs"].extend(dict.fromkeys(other_refs))
+    return data
+
+
+def split_facts(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the extracted facts without the chunk_id and original_text fields."""
+    return {k: v for k, v in data.items() if k not in ("chunk_id", "original_text")}
+
+
+def write_chunk_json(data: Dict[str, Any], out_path: str) -> None:
+    """Write one chunk's extracted data as pretty-printed JSON."""
+    with open(out_path, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file, indent=2, ensure_ascii=False)
+
+
+def load_chunk(chunk: Union[Tuple[str, str], ChunkSpan]) -> Tuple[str, str]:
+    """Return (chunk_id, text) for a (chunk_id, text) pair or a ChunkSpan."""
+    if isinstance(chunk, ChunkSpan):
+        return chunk.chunk_id, span_text(chunk)
+    return chunk
+
+
+def extract(chunk: Union[Tuple[str, str], ChunkSpan]) -> Dict[str, Any]:
+    """Extract facts from one (chunk_id, text) chunk or ChunkSpan."""
+    chunk_id, text = load_chunk(chunk)
+    return extract_facts(text, chunk_id)
+
+
+def output_record(data: Dict[str, Any], chunk: Union[Tuple[str, str], ChunkSpan]) -> Dict[str, Any]:
+    """Return the record to store for a chunk.
+
+    Span chunks point back into the cleaned file ("source_span") instead of
+    carrying another copy of their text.
+    """
+    if not isinstance(chunk, ChunkSpan):
+        return data
+    record = {"chunk_id": data["chunk_id"], "source_span": span_record(chunk)}
+    record.update(split_facts(data))
+    return record
+
+
+def list_chunk_files() -> List[str]:
+    """Return the chunk filenames in chunk order (099, 100, 1000; part2 before part10)."""
+    return sorted((f for f in os.listdir(CHUNKS_DIR) if f.endswith(".txt")), key=chunk_sort_key)
+
+
+def iter_chunk_files() -> Iterator[Tuple[str, str]]:
+    """Yield (chunk_id, text) for every chunk file in CHUNKS_DIR, in order."""
+    for filename in list_chunk_files():
+        with open(os.path.join(CHUNKS_DIR, filename), "r", encoding="utf-8") as f:
+            yield filename.replace(".txt", ""), f.read()
+
+
+def iter_extracted(chunks: List[Tuple[str, str]], workers: int) -> Iterator[Dict[str, Any]]:
+    """Yield extract() results in order, serially or across a process pool."""
+    if workers == 1:
+        yield from map(extract, chunks)
+        return
+
+    print(f"Extracting {len(chunks)} chunks with {workers} worker processes...")
+    # map() yields results in submission order, so the run is deterministic
+    # regardless of which worker finishes first
+    chunksize = max(1, len(chunks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(extract, chunks, chunksize=chunksize)
+
+
+def open_cache(options: Dict[str, Any]) -> Optional[ExtractionCache]:
+    """Open the extraction cache if the options enable it."""
+    if not options.get("cache", False):
+        return None
+    return ExtractionCache(options.get("cache_dir", DEFAULT_CACHE_DIR),
+                           extractor_fingerprint(),
+                           options.get("cache_max_bytes", DEFAULT_MAX_BYTES))
+
+
+def extract_chunks(chunks: Iterable[Union[Tuple[str, str], ChunkSpan]], options: Dict[str, Any],
+                   output_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Extract facts from chunks and yield each chunk's record in order.
+
+    Chunks are (chunk_id, text) pairs or ChunkSpans. Unchanged chunks are served
+    from the extraction cache when it is enabled, and the rest go to a pool of
+    options["workers"] processes. If output_dir is given, the records are also
+    written there in options["output_format"] (see fact_store), along with a
+    fact index (see fact_index) if options["index"] is set, a funding
+    ledger (see funding_ledger) if options["ledger"] is set and a citation
+    graph (see citation_graph) if options["citation_graph"] is set. Records for
+    ChunkSpans reference the cleaned file instead of holding the text.
+    With a StructureIndex of the cleaned document in options["structure"],
+    every record gets the section paths of its facts (see tag_facts).
+    """
+    chunks = list(chunks)
+    structure = options.get("structure")
+    starts = [None] * len(chunks)
+    if structure is not None:
+        try:
+            starts = structure.chunk_starts(chunks)
+        except ValueError as e:
+            print(f"Warning: {e}; facts will not be tagged with their sections")
+            structure = None
+    output_format = options.get("output_format", DEFAULT_FORMAT)
+    # Closed by the with block below, or aborted if extraction fails or stops early
+    store_writer = contextlib.nullcontext()  # as store: None, for per-chunk .json files
+    if output_dir is not None and output_format != "json":
+        store_writer = FactStoreWriter(output_dir, output_format)
+    elif output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        remove_other_stores(output_dir, output_format)
+    index = None
+    if output_dir is not None and options.get("index", False):
+        index = FactIndexWriter()
+    ledger = None
+    if output_dir is not None and options.get("ledger", False):
+        ledger = LedgerWriter()
+    citations = None
+    if output_dir is not None and options.get("citation_graph", False):
+        citations = CitationGraphWriter()
+    cache = open_cache(options)
+    if cache is not None:
+        keys = [cache.key_for(load_chunk(c)[1]) for c in chunks]
+        cached = [cache.get(key) for key in keys]
+    else:
+        keys = [None] * len(chunks)
+        cached = [None] * len(chunks)
+    pending = [c for c, facts in zip(chunks, cached) if facts is None]
+
+    workers = options.get("workers", DEFAULT_WORKERS)
+    if not workers or workers < 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(pending)) or 1
+    fresh = iter_extracted(pending, workers)
+
+    with store_writer as store:
+        for chunk, key, facts, start in zip(chunks, keys, cached, starts):
+            if facts is None:
+                data = next(fresh)
+                if cache is not None:
+                    cache.put(key, split_facts(data))
+            else:
+                chunk_id, text = load_chunk(chunk)
+                data = {"chunk_id": chunk_id, "original_text": text, **facts}
+            if structure is not None:
+                tag_facts(data, structure, start)
+            if index is not None:
+                index.add(data)
+            if ledger is not None:
+                ledger.add(data)
+            if citations is not None:
+                citations.add(data)
+            data = output_record(data, chunk)
+
+            if store is not None:
+                store.write(data)
+            elif output_dir is not None:
+                out_path = os.path.join(output_dir, data["chunk_id"] + ".json")
+                # A span record also depends on where the chunk sits in the file
+                tag = key
+                if isinstance(chunk, ChunkSpan):
+                    tag = f"{key}:{chunk.source}:{chunk.start}:{chunk.end}"
+                # and so do the section tags
+                if "sections" in data:
+                    sections = json.dumps(data["sections"], sort_keys=True).encode("utf-8")
+                    tag = f"{tag}:{hashlib.sha256(sections).hexdigest()[:16]}"
+                if cache is None or not cache.output_is_current(out_path, tag):
+                    write_chunk_json(data, out_path)
+                    if cache is not None:
+                        cache.mark_output(out_path, tag)
+            yield data
+
+    if index is not None:
+        index.write(output_dir)
+    if ledger is not None:
+        ledger.write(output_dir)
+    if citations is not None:
+        citations.write(output_dir)
+    if cache is not None:
+        cache.save()
+        stats = cache.stats()
+        print(f"Extraction cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['evictions']} evicted ({stats['entries']} entries, "
+              f"{stats['bytes'] / (1024 * 1024):.1f} MB)")
+
+
+def process_with_options(options: Dict[str, Any]) -> None:
+    """Extract facts from every chunk file and write them to OUTPUT_DIR."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    storage = options.get("chunk_storage", "files")
+    if storage == "spans" and spans_exist(CHUNKS_DIR):
+        chunks = read_spans(CHUNKS_DIR)
+    elif storage == "packed" and archive_exists(CHUNKS_DIR):
+        chunks = iter_archive(CHUNKS_DIR)
+    else:
+        chunks = iter_chunk_files()
+    if options.get("structure_index", False) and index_exists(CHUNKS_DIR):
+        options = dict(options, structure=load_index(CHUNKS_DIR))
+    for _ in extract_chunks(chunks, options, OUTPUT_DIR):
+        pass
+
+    print("Parsing complete. Check the 'json_chunks' directory for the JSON output files.")
+
+# Default behavior when run directly
+if __name__ == "__main__":
+    process_with_options({"workers": DEFAULT_WORKERS, "cache": True, "index": True, "ledger": True,
+                          "citation_graph": True, "structure_index": True})
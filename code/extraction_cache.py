@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from concurrent processes are not serialized
+    fcntl = None
+
+DEFAULT_CACHE_DIR = ".extract_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+ENTRIES_DIR = "entries"
+
+
+def content_hash(text: str) -> str:
+    """Return the SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """Persistent store of extracted facts keyed by (chunk content, extractor version).
+
+    Entries are small JSON files under <cache_dir>/entries. The index records each
+    entry's size and last use so the least recently used entries can be evicted
+    once the cache grows past max_bytes. It also remembers which cache key each
+    json_chunks file was last written from, so unchanged outputs are not rewritten.
+
+    Several processes (e.g. batch runs) may share one cache: entries are written
+    atomically, and save() merges this process's index into the one on disk.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, extractor_version: str = "",
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, ENTRIES_DIR)
+        self.extractor_version = extractor_version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.removed: Set[str] = set()  # keys this process evicted or found broken
+        os.makedirs(self.entries_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Any]:
+        """Load the cache index, starting fresh if it is missing or unreadable."""
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                index.setdefault("entries", {})
+                index.setdefault("outputs", {})
+                return index
+            except (json.JSONDecodeError, OSError):
+                print("Warning: extraction cache index is unreadable, starting fresh.")
+        return {"entries": {}, "outputs": {}}
+
+    def key_for(self, text: str) -> str:
+        """Build the cache key for a chunk from its content and the extractor version."""
+        return f"{self.extractor_version[:16]}_{content_hash(text)}"
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.entries_dir, key + ".json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached facts for key, or None on a miss."""
+        entry = self.index["entries"].get(key)
+        if entry is not None:
+            try:
+                with open(self._entry_path(key), "r", encoding="utf-8") as f:
+                    facts = json.load(f)
+                entry["last_used"] = time.time()
+                self.hits += 1
+                return facts
+            except (json.JSONDecodeError, OSError):
+                # Entry file vanished or is corrupt; treat it as a miss
+                del self.index["entries"][key]
+                self.removed.add(key)
+        self.misses += 1
+        return None
+
+    def put(self, key: str, facts: Dict[str, Any]) -> None:
+        """Store facts under key."""
+        payload = json.dumps(facts, ensure_ascii=False, separators=(",", ":"))
+        entry_path = self._entry_path(key)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, entry_path)
+        self.removed.discard(key)
+        self.index["entries"][key] = {
+            "size": len(payload.encode("utf-8")),
+            "last_used": time.time()
+        }
+
+    def output_is_current(self, out_path: str, key: str) -> bool:
+        """Return True if out_path exists and was last written from this cache key."""
+        return self.index["outputs"].get(out_path) == key and os.path.exists(out_path)
+
+    def mark_output(self, out_path: str, key: str) -> None:
+        """Record that out_path now holds the facts for key."""
+        self.index["outputs"][out_path] = key
+
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.index["entries"].values())
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(self.index["entries"].items(), key=lambda item: item[1]["last_used"])
+        for key, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+            del self.index["entries"][key]
+            self.removed.add(key)
+            total -= entry["size"]
+            self.evictions += 1
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold an exclusive lock on the index while it is read, merged and written."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, LOCK_FILE), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _merge_saved_index(self) -> None:
+        """Fold in what other processes saved since this index was loaded."""
+        saved = self._load_index()
+        for key, entry in saved["entries"].items():
+            if key in self.removed:
+                continue
+            mine = self.index["entries"].get(key)
+            if mine is None or entry["last_used"] > mine["last_used"]:
+                self.index["entries"][key] = entry
+        for out_path, tag in saved["outputs"].items():
+            self.index["outputs"].setdefault(out_path, tag)
+
+    def save(self) -> None:
+        """Merge with the index on disk, evict if needed and write it back."""
+        with self._locked():
+            self._merge_saved_index()
+            self.evict()
+            index_path = os.path.join(self.cache_dir, INDEX_FILE)
+            tmp_path = f"{index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, index_path)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters for this run and the current cache size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.index["entries"]),
+            "bytes": self.total_bytes()
+        }
@@ -0,0 +1,377 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+from contextlib import closing
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# SQLite backend for extracted facts (fact_store_format "sqlite").
+#
+# Every chunk's record is kept whole in `chunks` (so it reads back exactly as
+# written), and its references, funding, deadlines, duties, entities, dates
+# and other facts are also written as indexed rows of their own tables. Rows
+# are inserted in document order, so rowid order is document order.
+#
+# The database runs in WAL mode and a bill is ingested in one transaction
+# (rows are sent in batches): readers can query while it is written, and
+# see the previous bill until the new one is committed.
+DB_FILE = "facts.db"
+BATCH_CHUNKS = 256
+REFERENCE_TYPES = ("us_code", "public_laws", "other_legislative_refs")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    seq INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL UNIQUE,
+    facts TEXT NOT NULL,
+    text TEXT
+);
+CREATE TABLE IF NOT EXISTS refs (
+    chunk_seq INTEGER NOT NULL REFERENCES chunks(seq),
+    type TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS funding (
+    chunk_seq INTEGER NOT NULL REFERENCES chunks(seq),
+    amount TEXT,
+    dollars INTEGER,
+    purpose TEXT,
+    availability TEXT,
+    fiscal_years TEXT
+);
+CREATE TABLE IF NOT EXISTS deadlines (
+    chunk_seq INTEGER NOT NULL REFERENCES chunks(seq),
+    action TEXT,
+    date TEXT
+);
+CREATE TABLE IF NOT EXISTS duties (
+    chunk_seq INTEGER NOT NULL REFERENCES chunks(seq),
+    entity TEXT,
+    action TEXT
+);
+CREATE TABLE IF NOT EXISTS entities (
+    chunk_seq INTEGER NOT NULL REFERENCES chunks(seq),
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dates (
+    chunk_seq INTEGER NOT NULL REFERENCES chunks(seq),
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS other_facts (
+    chunk_seq INTEGER NOT NULL REFERENCES chunks(seq),
+    fact TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_value ON refs(type, value);
+CREATE INDEX IF NOT EXISTS refs_chunk ON refs(chunk_seq);
+CREATE INDEX IF NOT EXISTS funding_chunk ON funding(chunk_seq);
+CREATE INDEX IF NOT EXISTS funding_purpose ON funding(purpose);
+CREATE INDEX IF NOT EXISTS deadlines_date ON deadlines(date);
+CREATE INDEX IF NOT EXISTS duties_entity ON duties(entity);
+CREATE INDEX IF NOT EXISTS entities_name ON entities(name);
+CREATE INDEX IF NOT EXISTS entities_chunk ON entities(chunk_seq);
+CREATE INDEX IF NOT EXISTS dates_value ON dates(value);
+"""
+
+# Child tables first, so a bill can be cleared without breaking references
+TABLES = ("refs", "funding", "deadlines", "duties", "entities", "dates", "other_facts", "chunks")
+
+INSERTS = {
+    "chunks": "INSERT INTO chunks (seq, chunk_id, facts, text) VALUES (?, ?, ?, ?)",
+    "refs": "INSERT INTO refs (chunk_seq, type, value) VALUES (?, ?, ?)",
+    "funding": "INSERT INTO funding (chunk_seq, amount, dollars, purpose, availability, fiscal_years) "
+               "VALUES (?, ?, ?, ?, ?, ?)",
+    "deadlines": "INSERT INTO deadlines (chunk_seq, action, date) VALUES (?, ?, ?)",
+    "duties": "INSERT INTO duties (chunk_seq, entity, action) VALUES (?, ?, ?)",
+    "entities": "INSERT INTO entities (chunk_seq, name) VALUES (?, ?)",
+    "dates": "INSERT INTO dates (chunk_seq, value) VALUES (?, ?)",
+    "other_facts": "INSERT INTO other_facts (chunk_seq, fact) VALUES (?, ?)",
+}
+
+non_digits = re.compile(r'[^0-9]')
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def db_path(directory: str) -> str:
+    return os.path.join(directory, DB_FILE)
+
+
+def db_exists(directory: str) -> bool:
+    return os.path.exists(db_path(directory))
+
+
+def parse_dollars(amount: Optional[str]) -> Optional[int]:
+    """Return "$1,250,000," as 1250000 (None if there are no digits)."""
+    digits = non_digits.sub("", amount or "")
+    return int(digits) if digits else None
+
+
+def connect(directory: str, readonly: bool = True) -> sqlite3.Connection:
+    """Open the fact database in directory.
+
+    Read-only connections never block the writer, nor are they blocked by it.
+    """
+    path = db_path(directory)
+    if readonly:
+        uri = "file:" + os.path.abspath(path).replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+        return sqlite3.connect(uri, uri=True)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class FactDBWriter:
+    """Ingest one bill's chunk records into the fact database, replacing the previous bill."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.conn = connect(directory, readonly=False)
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("BEGIN IMMEDIATE")
+        for table in TABLES:
+            self.conn.execute(f"DELETE FROM {table}")
+        self.rows: Dict[str, List[tuple]] = {table: [] for table in INSERTS}
+        self.seq = 0
+        self.pending = 0
+
+    def write(self, facts: Dict[str, Any], text: Optional[str]) -> None:
+        """Queue one chunk's facts (without its text) and text for insertion."""
+        self.seq += 1
+        seq = self.seq
+        rows = self.rows
+        rows["chunks"].append((seq, facts["chunk_id"], compact_json(facts), text))
+        references = facts.get("references", {})
+        for ref_type in REFERENCE_TYPES:
+            rows["refs"].extend((seq, ref_type, value) for value in references.get(ref_type, []))
+        for item in facts.get("funding", []):
+            rows["funding"].append((seq, item.get("amount"), parse_dollars(item.get("amount")),
+                                    item.get("purpose"), item.get("availability"),
+                                    compact_json(item.get("fiscal_years", []))))
+        rows["deadlines"].extend((seq, item.get("action"), item.get("date"))
+                                 for item in facts.get("deadlines", []))
+        rows["duties"].extend((seq, item.get("entity"), item.get("action"))
+                              for item in facts.get("duties_and_requirements", []))
+        rows["entities"].extend((seq, name) for name in facts.get("programs_and_entities", []))
+        rows["dates"].extend((seq, value) for value in facts.get("dates", []))
+        rows["other_facts"].extend((seq, compact_json(fact)) for fact in facts.get("other_facts", []))
+
+        self.pending += 1
+        if self.pending >= BATCH_CHUNKS:
+            self.flush()
+
+    def flush(self) -> None:
+        for table, rows in self.rows.items():
+            if rows:
+                self.conn.executemany(INSERTS[table], rows)
+                rows.clear()
+        self.pending = 0
+
+    def close(self) -> None:
+        """Insert what is left and commit the bill."""
+        self.flush()
+        self.conn.execute("COMMIT")
+        self.conn.close()
+
+    def abort(self) -> None:
+        """Drop everything written since the writer was opened."""
+        self.conn.execute("ROLLBACK")
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def count_records(directory: str) -> int:
+    with closing(connect(directory)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+def iter_rows(directory: str, include_text: bool = True) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+    """Stream (facts, text) for each chunk in order; text is None when not requested."""
+    conn = connect(directory)
+    try:
+        columns = "facts, text" if include_text else "facts, NULL"
+        for facts, text in conn.execute(f"SELECT {columns} FROM chunks ORDER BY seq"):
+            yield json.loads(facts), text
+    finally:
+        conn.close()
+
+
+def iter_fact_payloads(directory: str) -> Iterator[Tuple[str, str]]:
+    """Stream (chunk_id, facts JSON) for each chunk in order, without decoding the JSON."""
+    conn = connect(directory)
+    try:
+        for chunk_id, facts in conn.execute("SELECT chunk_id, facts FROM chunks ORDER BY seq"):
+            yield chunk_id, facts
+    finally:
+        conn.close()
+
+
+def iter_texts(directory: str) -> Iterator[str]:
+    conn = connect(directory)
+    try:
+        for (text,) in conn.execute("SELECT text FROM chunks ORDER BY seq"):
+            yield text or ""
+    finally:
+        conn.close()
+
+
+def read_row(directory: str, chunk_id: str, include_text: bool = True) -> Tuple[Dict[str, Any], Optional[str]]:
+    with closing(connect(directory)) as conn:
+        row = conn.execute("SELECT facts, text FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+    if row is None:
+        raise KeyError(chunk_id)
+    return json.loads(row[0]), (row[1] if include_text else None)
+
+
+def distinct_in_order(conn: sqlite3.Connection, query: str, params: tuple = ()) -> List[str]:
+    return [value for (value,) in conn.execute(query, params)]
+
+
+def aggregated_data(directory: str) -> Dict[str, Any]:
+    """Return the combined document's aggregated_data, computed by queries.
+
+    Values keep the order of their first occurrence and duplicates are
+    dropped, as combined_document.FactAggregator does.
+    """
+    conn = connect(directory)
+    try:
+        references = {
+            ref_type: distinct_in_order(
+                conn, "SELECT value FROM refs WHERE type = ? GROUP BY value ORDER BY MIN(rowid)", (ref_type,))
+            for ref_type in REFERENCE_TYPES
+        }
+        funding = [
+            {"amount": amount, "purpose": purpose, "availability": availability,
+             "fiscal_years": json.loads(fiscal_years)}
+            for amount, purpose, availability, fiscal_years in conn.execute(
+                "SELECT amount, purpose, availability, fiscal_years FROM funding ORDER BY rowid")
+        ]
+        deadlines = [{"action": action, "date": date} for action, date in conn.execute(
+            "SELECT action, date FROM deadlines ORDER BY rowid")]
+        duties = [{"entity": entity, "action": action} for entity, action in conn.execute(
+            "SELECT entity, action FROM duties ORDER BY rowid")]
+        entities = distinct_in_order(conn, "SELECT name FROM entities GROUP BY name ORDER BY MIN(rowid)")
+        dates = distinct_in_order(conn, "SELECT value FROM dates ORDER BY rowid")
+        other_facts = [json.loads(fact) for (fact,) in conn.execute(
+            "SELECT fact FROM other_facts ORDER BY rowid")]
+    finally:
+        conn.close()
+    return {
+        "references": references,
+        "funding": funding,
+        "deadlines": deadlines,
+        "duties_and_requirements": duties,
+        "programs_and_entities": entities,
+        "dates": dates,
+        "other_facts": other_facts
+    }
+
+
+class DatabaseAggregator:
+    """Stands in for FactAggregator when the facts are already in the database."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def add(self, chunk_data: Dict[str, Any]) -> None:
+        pass
+
+    def aggregated_data(self) -> Dict[str, Any]:
+        return aggregated_data(self.directory)
+
+
+# Reports
+
+def funding_summary(conn: sqlite3.Connection) -> Dict[str, Any]:
+    total, items, parsed = conn.execute(
+        "SELECT COALESCE(SUM(dollars), 0), COUNT(*), COUNT(dollars) FROM funding").fetchone()
+    return {"total_dollars": total, "items": items, "items_with_amount": parsed}
+
+
+def funding_by_purpose(conn: sqlite3.Connection, limit: int = 20) -> List[Tuple[str, int, int]]:
+    """Return (purpose, total dollars, items) for the best-funded purposes."""
+    return conn.execute(
+        "SELECT purpose, COALESCE(SUM(dollars), 0) AS total, COUNT(*) FROM funding "
+        "GROUP BY purpose ORDER BY total DESC LIMIT ?", (limit,)).fetchall()
+
+
+def funding_by_chunk(conn: sqlite3.Connection, limit: int = 20) -> List[Tuple[str, int, int]]:
+    """Return (chunk_id, total dollars, items) for the chunks with the most funding."""
+    return conn.execute(
+        "SELECT chunks.chunk_id, COALESCE(SUM(funding.dollars), 0) AS total, COUNT(*) "
+        "FROM funding JOIN chunks ON chunks.seq = funding.chunk_seq "
+        "GROUP BY funding.chunk_seq ORDER BY total DESC LIMIT ?", (limit,)).fetchall()
+
+
+def entity_counts(conn: sqlite3.Connection, limit: int = 20) -> List[Tuple[str, int, int]]:
+    """Return (entity, mentions, chunks) for the most mentioned programs and entities."""
+    return conn.execute(
+        "SELECT name, COUNT(*) AS mentions, COUNT(DISTINCT chunk_seq) FROM entities "
+        "GROUP BY name ORDER BY mentions DESC, name LIMIT ?", (limit,)).fetchall()
+
+
+def reference_counts(conn: sqlite3.Connection, ref_type: str, limit: int = 20) -> List[Tuple[str, int]]:
+    """Return (reference, chunks) for the references of ref_type cited in the most chunks."""
+    return conn.execute(
+        "SELECT value, COUNT(DISTINCT chunk_seq) AS chunks FROM refs WHERE type = ? "
+        "GROUP BY value ORDER BY chunks DESC, value LIMIT ?", (ref_type, limit)).fetchall()
+
+
+def one_line(value: Optional[str]) -> str:
+    return " ".join((value or "").split())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query facts stored with fact_store_format \"sqlite\".")
+    parser.add_argument("report", choices=("summary", "funding", "entities", "references"))
+    parser.add_argument("--dir", default="json_chunks", help="directory holding facts.db")
+    parser.add_argument("--limit", type=int, default=20, help="rows per table")
+    args = parser.parse_args()
+
+    if not db_exists(args.dir):
+        print(f"No fact database in '{args.dir}'. Run fact extraction with fact_store_format \"sqlite\" first.")
+        sys.exit(1)
+
+    with closing(connect(args.dir)) as conn:
+        if args.report == "summary":
+            chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            funding = funding_summary(conn)
+            print(f"Chunks: {chunks}")
+            print(f"Funding: ${funding['total_dollars']:,} in {funding['items']} items")
+            for table in ("deadlines", "duties", "entities", "dates"):
+                print(f"{table.capitalize()}: {conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]}")
+            for ref_type in REFERENCE_TYPES:
+                count = conn.execute("SELECT COUNT(DISTINCT value) FROM refs WHERE type = ?",
+                                     (ref_type,)).fetchone()[0]
+                print(f"Distinct {ref_type} references: {count}")
+        elif args.report == "funding":
+            print("By purpose:")
+            for purpose, total, items in funding_by_purpose(conn, args.limit):
+                print(f"  ${total:>18,}  {items:>5} items  {one_line(purpose)}")
+            print("\nBy chunk:")
+            for chunk_id, total, items in funding_by_chunk(conn, args.limit):
+                print(f"  ${total:>18,}  {items:>5} items  {chunk_id}")
+        elif args.report == "entities":
+            for name, mentions, chunks in entity_counts(conn, args.limit):
+                print(f"  {mentions:>5} mentions  {chunks:>4} chunks  {one_line(name)}")
+        else:
+            for ref_type in REFERENCE_TYPES:
+                print(f"{ref_type}:")
+                for value, chunks in reference_counts(conn, ref_type, args.limit):
+                    print(f"  {chunks:>4} chunks  {one_line(value)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import time
+import json
+import bisect
+import argparse
+from typing import Dict, Any, Iterable, List, Optional
+
+import fact_store
+from fact_store import RecordWriter, RecordReader, compact_json
+
+# Inverted index over extracted facts, written next to them at extraction time.
+# Each record maps one "<field>:<normalized key>" to {chunk_id: [character
+# offsets of the value in the chunk's original_text]}. Records are stored in
+# key order in a RecordWriter file, so a query reads the small key index and
+# then only the records it needs.
+INDEX_FILE = "fact_index.bin"
+FACT_FIELDS = ("us_code", "public_laws", "other_legislative_refs", "entities")
+FIELDS = FACT_FIELDS + ("terms",)
+
+term_pattern = re.compile(r'[A-Za-z0-9]+')
+whitespace = re.compile(r'\s+')
+us_code_base = re.compile(r'^(\d+)\s*u\.s\.c\.?\s*([\w\.\-]*)')
+
+# Terms too common to be worth indexing
+STOPWORDS = frozenset("""
+a an and any are as at be by for from has in is it its not of on or such that the
+this to under was which with shall may
+""".split())
+
+
+def normalize(value: str) -> str:
+    """Case-fold a value and collapse its whitespace."""
+    return whitespace.sub(" ", value).strip().casefold()
+
+
+def us_code_keys(ref: str) -> List[str]:
+    """Return the keys a U.S.C. reference is indexed under: itself and its section.
+
+    "42 U.S.C. 5121(a)(2)" is also filed under "42 u.s.c. 5121", so a query for
+    the section finds references to any of its subsections.
+    """
+    full = normalize(ref)
+    keys = [full]
+    m = us_code_base.match(full)
+    if m:
+        base = f"{m.group(1)} u.s.c. {m.group(2).rstrip('.')}".rstrip()
+        if base != full:
+            keys.append(base)
+    return keys
+
+
+def iter_terms(text: str) -> Iterable[tuple]:
+    """Yield (term, offset) for every indexable word of text."""
+    for m in term_pattern.finditer(text):
+        term = m.group().lower()
+        if len(term) > 1 and term not in STOPWORDS:
+            yield term, m.start()
+
+
+def find_offsets(text: str, value: str) -> List[int]:
+    """Return the offset of every occurrence of value in text."""
+    offsets = []
+    if not value:
+        return offsets
+    pos = text.find(value)
+    while pos != -1:
+        offsets.append(pos)
+        pos = text.find(value, pos + 1)
+    return offsets
+
+
+class FactIndexWriter:
+    """Collect postings from chunk records and write them as one index file."""
+
+    def __init__(self):
+        # Offsets per chunk: a list for terms (each found once), an ordered set
+        # (dict) for facts, whose keys can repeat offsets; sorted on write
+        self.postings: Dict[str, Dict[str, Dict[str, Any]]] = {field: {} for field in FIELDS}
+
+    def _add(self, field: str, key: str, chunk_id: str, offsets: List[int]) -> None:
+        self.postings[field].setdefault(key, {}).setdefault(chunk_id, {}).update(dict.fromkeys(offsets))
+
+    def add(self, data: Dict[str, Any]) -> None:
+        """Index one chunk's record (it must still carry its original_text)."""
+        chunk_id = data["chunk_id"]
+        text = data.get("original_text", "")
+        references = data.get("references", {})
+        for ref in references.get("us_code", []):
+            offsets = find_offsets(text, ref)
+            for key in us_code_keys(ref):
+                self._add("us_code", key, chunk_id, offsets)
+        for field in ("public_laws", "other_legislative_refs"):
+            for ref in references.get(field, []):
+                self._add(field, normalize(ref), chunk_id, find_offsets(text, ref))
+        for entity in data.get("programs_and_entities", []):
+            self._add("entities", normalize(entity), chunk_id, find_offsets(text, entity))
+
+        terms = self.postings["terms"]
+        for term, offset in iter_terms(text):
+            terms.setdefault(term, {}).setdefault(chunk_id, []).append(offset)
+
+    def write(self, directory: str) -> str:
+        """Write the index to <directory>/fact_index.bin and return its path."""
+        path = os.path.join(directory, INDEX_FILE)
+        records = sorted((f"{field}:{key}", postings)
+                         for field, keys in self.postings.items()
+                         for key, postings in keys.items())
+        with RecordWriter(path) as writer:
+            for record_key, postings in records:
+                postings = {chunk_id: sorted(offsets) for chunk_id, offsets in postings.items()}
+                writer.append(record_key, compact_json(postings).encode("utf-8"))
+        return path
+
+
+class FactIndex:
+    """Answer fact and term queries from an index written by FactIndexWriter."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.reader = RecordReader(os.path.join(directory, INDEX_FILE))
+        self.keys = self.reader.keys()  # sorted
+
+    def close(self) -> None:
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _postings(self, record_key: str) -> Dict[str, List[int]]:
+        if record_key not in self.reader.offsets:
+            return {}
+        return json.loads(self.reader.get(record_key))
+
+    def lookup(self, field: str, value: str) -> Dict[str, List[int]]:
+        """Return {chunk_id: offsets} for chunks whose facts include value."""
+        if field not in FACT_FIELDS:
+            raise ValueError(f"Unknown index field: {field}")
+        if field == "us_code":
+            for key in us_code_keys(value):
+                postings = self._postings(f"us_code:{key}")
+                if postings:
+                    return postings
+            return {}
+        return self._postings(f"{field}:{normalize(value)}")
+
+    def prefix(self, field: str, prefix: str) -> Dict[str, Dict[str, List[int]]]:
+        """Return {value: {chunk_id: offsets}} for every indexed value starting with prefix."""
+        record_prefix = f"{field}:{normalize(prefix)}"
+        start = bisect.bisect_left(self.keys, record_prefix)
+        matches = {}
+        for record_key in self.keys[start:]:
+            if not record_key.startswith(record_prefix):
+                break
+            matches[record_key[len(field) + 1:]] = self._postings(record_key)
+        return matches
+
+    def search(self, text: str) -> Dict[str, List[int]]:
+        """Return {chunk_id: offsets of the words} for chunks containing every word of text."""
+        words = [term for term, _ in iter_terms(text)]
+        if not words:
+            return {}
+        results = None
+        for word in dict.fromkeys(words):
+            postings = self._postings(f"terms:{word}")
+            if results is None:
+                results = {chunk_id: list(offsets) for chunk_id, offsets in postings.items()}
+            else:
+                results = {chunk_id: sorted(results[chunk_id] + postings[chunk_id])
+                           for chunk_id in results if chunk_id in postings}
+            if not results:
+                return {}
+        return results
+
+    def query(self, text: str, fields: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, List[int]]]:
+        """Look text up as a fact in each field, and as words in the chunk texts."""
+        results = {}
+        for field in fields or FIELDS:
+            found = self.search(text) if field == "terms" else self.lookup(field, text)
+            if found:
+                results[field] = found
+        return results
+
+
+def index_exists(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, INDEX_FILE + ".idx"))
+
+
+def snippet(text: str, offset: int, width: int = 60) -> str:
+    start = max(0, offset - width)
+    return " ".join(text[start:offset + width].split())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the fact index built during extraction.")
+    parser.add_argument("query", help='e.g. "42 U.S.C. 5121", "FEMA", "disaster relief"')
+    parser.add_argument("--field", choices=FIELDS, action="append",
+                        help="only search these fields (default: all)")
+    parser.add_argument("--dir", default=fact_store.DEFAULT_JSON_DIR,
+                        help="directory holding the extracted facts and their index")
+    parser.add_argument("--show", action="store_true", help="print the text around each match")
+    args = parser.parse_args()
+
+    if not index_exists(args.dir):
+        print(f"No fact index in '{args.dir}'. Run fact extraction with fact_index enabled first.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    with FactIndex(args.dir) as index:
+        results = index.query(args.query, args.field)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if not results:
+        print(f"No matches for '{args.query}' ({elapsed:.1f} ms)")
+        return
+    fmt = fact_store.detect_format(args.dir) if args.show else None
+    for field, postings in results.items():
+        print(f"\n{field}: {len(postings)} chunks")
+        for chunk_id in sorted(postings, key=fact_store.chunk_sort_key):
+            offsets = postings[chunk_id]
+            print(f"  {chunk_id}  offsets {offsets[:10]}{' ...' if len(offsets) > 10 else ''}")
+            if args.show and offsets:
+                text = fact_store.read_record(args.dir, chunk_id, fmt=fmt).get("original_text", "")
+                print(f"      ...{snippet(text, offsets[0])}...")
+    print(f"\n({elapsed:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
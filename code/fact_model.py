@@ -0,0 +1,103 @@
+import json
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Compact in-memory model for facts collected across a whole document.
+#
+# Values are dictionary-encoded in a ValuePool: each distinct value is kept
+# once and named by an integer id, so "unspecified", "not specified" or an
+# agency name repeated thousands of times costs one string. A FactTable holds
+# a list of facts as integer arrays: the shape (key tuple) of each fact and
+# the ids of its values, about 20 bytes for a funding fact instead of a dict
+# of its own strings. Facts come back out as ordinary dicts, one at a time.
+
+
+class ValuePool:
+    """Dictionary encoding of fact values: value <-> integer id."""
+
+    __slots__ = ("values", "ids", "encoded_ids")
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.ids: Dict[str, int] = {}  # strings, by value
+        self.encoded_ids: Dict[str, int] = {}  # anything else, by its JSON
+
+    def id(self, value: Any) -> int:
+        if type(value) is str:
+            table, key = self.ids, value
+        else:
+            # Lists and the like are kept as JSON text and decoded afresh on the
+            # way out, so no caller ever shares a mutable value
+            table, key = self.encoded_ids, json.dumps(value, ensure_ascii=False)
+        found = table.get(key)
+        if found is None:
+            found = table[key] = len(self.values)
+            self.values.append(key if table is self.ids else Encoded(key))
+        return found
+
+    def value(self, value_id: int) -> Any:
+        value = self.values[value_id]
+        return json.loads(value) if type(value) is Encoded else value
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class Encoded(str):
+    """JSON text of a non-string value held in a ValuePool."""
+
+    __slots__ = ()
+
+
+class FactTable:
+    """An append-only list of facts (dicts or plain values) stored as value ids.
+
+    Facts with the same keys share one shape; a row is its shape id followed
+    by one value id per key, in key order, so iterating gives back dicts equal
+    to, and ordered like, the ones appended.
+    """
+
+    __slots__ = ("pool", "shapes", "shape_ids", "row_shapes", "cells")
+
+    SCALAR = None  # shape of a fact that is a plain value, not a dict
+
+    def __init__(self, pool: ValuePool):
+        self.pool = pool
+        self.shapes: List[Optional[Tuple[str, ...]]] = []
+        self.shape_ids: Dict[Optional[Tuple[str, ...]], int] = {}
+        self.row_shapes = array("I")
+        self.cells = array("I")
+
+    def append(self, fact: Any) -> None:
+        if type(fact) is dict:
+            shape, values = tuple(fact), fact.values()
+        else:
+            shape, values = self.SCALAR, (fact,)
+        shape_id = self.shape_ids.get(shape)
+        if shape_id is None:
+            shape_id = self.shape_ids[shape] = len(self.shapes)
+            self.shapes.append(shape)
+        self.row_shapes.append(shape_id)
+        pool_id = self.pool.id
+        self.cells.extend([pool_id(value) for value in values])
+
+    def extend(self, facts: Iterable[Any]) -> None:
+        for fact in facts:
+            self.append(fact)
+
+    def __len__(self) -> int:
+        return len(self.row_shapes)
+
+    def __iter__(self) -> Iterator[Any]:
+        value = self.pool.value
+        cells = self.cells
+        start = 0
+        for shape_id in self.row_shapes:
+            shape = self.shapes[shape_id]
+            if shape is self.SCALAR:
+                yield value(cells[start])
+                start += 1
+            else:
+                yield {key: value(cell) for key, cell in zip(shape, cells[start:start + len(shape)])}
+                start += len(shape)
+
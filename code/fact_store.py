@@ -0,0 +1,434 @@
+import os
+import re
+import sys
+import json
+import struct
+from array import array
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import fact_db
+from chunk_spans import record_span, span_text
+
+# Output formats for extracted facts:
+# - "json":   one pretty-printed <chunk_id>.json per chunk (the original layout)
+# - "jsonl":  facts.jsonl and texts.jsonl, one compact record per line
+# - "binary": facts.bin and texts.bin of length-prefixed records, plus an
+#             offset index (<name>.bin.idx) for random access by chunk id
+# - "sqlite": facts.db, with every fact also in an indexed table (see fact_db)
+FORMATS = ("json", "jsonl", "binary", "sqlite")
+DEFAULT_FORMAT = "json"
+DEFAULT_JSON_DIR = "json_chunks"
+
+FACTS_NAME = "facts"
+TEXTS_NAME = "texts"
+RECORD_HEADER = struct.Struct("<I")  # little-endian uint32 payload length
+BUFFER_SIZE = 1024 * 1024
+
+
+# Files of each single-file store; writing one format removes the others, so
+# detect_format never finds the store of an earlier run in another format
+STORE_FILES = {
+    "jsonl": (FACTS_NAME + ".jsonl", TEXTS_NAME + ".jsonl"),
+    "binary": (FACTS_NAME + ".bin", FACTS_NAME + ".bin.idx", TEXTS_NAME + ".bin", TEXTS_NAME + ".bin.idx"),
+    "sqlite": (fact_db.DB_FILE, fact_db.DB_FILE + "-journal", fact_db.DB_FILE + "-wal", fact_db.DB_FILE + "-shm"),
+}
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class RecordWriter:
+    """Append length-prefixed records to a file and keep an offset index for them."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "wb", buffering=BUFFER_SIZE)
+        self.index: List[Tuple[str, int, int]] = []
+        self.offset = 0
+
+    def append(self, key: str, payload: bytes) -> None:
+        self.file.write(RECORD_HEADER.pack(len(payload)))
+        self.file.write(payload)
+        self.index.append((key, self.offset + RECORD_HEADER.size, len(payload)))
+        self.offset += RECORD_HEADER.size + len(payload)
+
+    def close(self) -> None:
+        self.file.close()
+        with open(self.path + ".idx", "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False)
+
+    def abort(self) -> None:
+        """Close the file without an index, removing any index of an earlier write."""
+        self.file.close()
+        if os.path.exists(self.path + ".idx"):
+            os.remove(self.path + ".idx")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class RecordReader:
+    """Read records written by RecordWriter, in order or by key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + ".idx", "r", encoding="utf-8") as f:
+            self.index = [tuple(entry) for entry in json.load(f)]
+        self.offsets = {key: (offset, length) for key, offset, length in self.index}
+        self.file = open(path, "rb", buffering=BUFFER_SIZE)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def keys(self) -> List[str]:
+        return [key for key, _, _ in self.index]
+
+    def get(self, key: str) -> bytes:
+        offset, length = self.offsets[key]
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def __iter__(self) -> Iterator[Tuple[str, bytes]]:
+        """Stream (key, payload) pairs from the start of the file."""
+        self.file.seek(0)
+        for key, _, length in self.index:
+            self.file.read(RECORD_HEADER.size)
+            yield key, self.file.read(length)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# Column files: integer columns (arrays of the array module) behind a JSON
+# header. Columns are stored little-endian and padded to 8 bytes, and the
+# header records each one's typecode, offset and length.
+COLUMN_HEADER = struct.Struct("<8sI")  # magic, header length
+
+
+def write_columns(path: str, magic: bytes, header: Dict[str, Any], columns: Dict[str, array]) -> None:
+    """Write header and columns to path, replacing it only once complete."""
+    layout = {}
+    blobs = []
+    offset = 0
+    for name, column in columns.items():
+        if sys.byteorder == "big":
+            column = array(column.typecode, column)
+            column.byteswap()
+        blob = column.tobytes()
+        layout[name] = [column.typecode, offset, len(column)]
+        blob += b"\0" * (-len(blob) % 8)
+        blobs.append(blob)
+        offset += len(blob)
+    header_bytes = json.dumps(dict(header, columns=layout), ensure_ascii=False).encode("utf-8")
+    header_bytes += b" " * (-(COLUMN_HEADER.size + len(header_bytes)) % 8)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(COLUMN_HEADER.pack(magic, len(header_bytes)))
+        f.write(header_bytes)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temp_path, path)
+
+
+def read_columns(path: str, magic: bytes) -> Tuple[Dict[str, Any], Dict[str, array]]:
+    """Return the header and columns of a file written by write_columns."""
+    with open(path, "rb") as f:
+        data = f.read()
+    found, header_size = COLUMN_HEADER.unpack_from(data) if len(data) >= COLUMN_HEADER.size else (b"", 0)
+    if found != magic:
+        raise ValueError(f"{path} is not a {magic.decode('ascii', 'replace')} file")
+    body = COLUMN_HEADER.size + header_size
+    header = json.loads(data[COLUMN_HEADER.size:body])
+    columns = {}
+    for name, (typecode, offset, length) in header.pop("columns").items():
+        column = array(typecode)
+        column.frombytes(data[body + offset:body + offset + length * column.itemsize])
+        if sys.byteorder == "big":
+            column.byteswap()
+        columns[name] = column
+    return header, columns
+
+
+def split_record(data: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """Split one chunk's data into its facts and its original text."""
+    facts = {k: v for k, v in data.items() if k != "original_text"}
+    return facts, data.get("original_text", "")
+
+
+def join_record(facts: Dict[str, Any], text: Optional[str]) -> Dict[str, Any]:
+    """Rebuild chunk data in the same key order as the per-chunk JSON files.
+
+    Records of span chunks carry no text of their own; theirs is read from the
+    cleaned file they point into.
+    """
+    if text is None:
+        return facts
+    if "source_span" in facts:
+        return with_text(facts)
+    record = {"chunk_id": facts["chunk_id"], "original_text": text}
+    record.update(facts)
+    return record
+
+
+def with_text(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the record with its original_text, reading it from its span if needed."""
+    if "original_text" in record or "source_span" not in record:
+        return record
+    text = span_text(record_span(record))
+    resolved = {"chunk_id": record["chunk_id"], "original_text": text}
+    resolved.update(record)
+    return resolved
+
+
+class FactStoreWriter:
+    """Write extracted chunk data to a directory in one of the compact formats."""
+
+    def __init__(self, directory: str, fmt: str):
+        if fmt not in ("jsonl", "binary", "sqlite"):
+            raise ValueError(f"Unsupported fact store format: {fmt}")
+        os.makedirs(directory, exist_ok=True)
+        remove_other_stores(directory, fmt)
+        self.fmt = fmt
+        if fmt == "sqlite":
+            self.db = fact_db.FactDBWriter(directory)
+        elif fmt == "jsonl":
+            self.facts_file = open(os.path.join(directory, FACTS_NAME + ".jsonl"), "w",
+                                   encoding="utf-8", buffering=BUFFER_SIZE)
+            self.texts_file = open(os.path.join(directory, TEXTS_NAME + ".jsonl"), "w",
+                                   encoding="utf-8", buffering=BUFFER_SIZE)
+        else:
+            self.facts_records = RecordWriter(os.path.join(directory, FACTS_NAME + ".bin"))
+            self.texts_records = RecordWriter(os.path.join(directory, TEXTS_NAME + ".bin"))
+
+    def write(self, data: Dict[str, Any]) -> None:
+        facts, text = split_record(data)
+        if self.fmt == "sqlite":
+            self.db.write(facts, text)
+        elif self.fmt == "jsonl":
+            self.facts_file.write(compact_json(facts) + "\n")
+            self.texts_file.write(compact_json({"chunk_id": facts["chunk_id"], "text": text}) + "\n")
+        else:
+            self.facts_records.append(facts["chunk_id"], compact_json(facts).encode("utf-8"))
+            self.texts_records.append(facts["chunk_id"], text.encode("utf-8"))
+
+    def close(self) -> None:
+        if self.fmt == "sqlite":
+            self.db.close()
+        elif self.fmt == "jsonl":
+            self.facts_file.close()
+            self.texts_file.close()
+        else:
+            self.facts_records.close()
+            self.texts_records.close()
+
+    def abort(self) -> None:
+        """Give up on the store: roll the database back, or close the files and leave no complete-looking store."""
+        if self.fmt == "sqlite":
+            self.db.abort()
+        elif self.fmt == "jsonl":
+            # Nothing marks a JSONL store complete, so the partial files go
+            for f in (self.facts_file, self.texts_file):
+                f.close()
+                os.remove(f.name)
+        else:
+            self.facts_records.abort()
+            self.texts_records.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def remove_other_stores(directory: str, fmt: str) -> None:
+    """Delete the files of stores in formats other than fmt left in directory by earlier runs."""
+    for other, names in STORE_FILES.items():
+        if other == fmt:
+            continue
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def get_chunk_num(filename: str) -> int:
+    """Return the leading chunk number of a chunk file name (0 if there is none)."""
+    base_name = os.path.splitext(filename)[0]
+    num_str = base_name.split('_')[0] if '_' in base_name else base_name
+    num_str = num_str.lstrip('0')
+    try:
+        return int(num_str) if num_str else 0
+    except ValueError:
+        return 0
+
+
+part_suffix = re.compile(r"_part(\d+)$")
+
+
+def chunk_sort_key(filename: str) -> Tuple[int, int, str]:
+    """Sort key putting chunk files (or ids) in document order: 99 < 100 < 1000, part2 < part10."""
+    base_name = os.path.splitext(filename)[0]
+    m = part_suffix.search(base_name)
+    return get_chunk_num(filename), int(m.group(1)) if m else 0, base_name
+
+
+def list_json_chunk_files(directory: str) -> List[str]:
+    """Return the per-chunk JSON files in chunk order."""
+    return sorted([f for f in os.listdir(directory) if f.endswith('.json')], key=chunk_sort_key)
+
+
+def store_exists(directory: str, fmt: str) -> bool:
+    """Return True if directory holds extracted facts in the given format."""
+    if fmt == "jsonl":
+        return os.path.exists(os.path.join(directory, FACTS_NAME + ".jsonl"))
+    if fmt == "binary":
+        return os.path.exists(os.path.join(directory, FACTS_NAME + ".bin.idx"))
+    if fmt == "sqlite":
+        return fact_db.db_exists(directory)
+    return os.path.isdir(directory)
+
+
+def detect_format(directory: str) -> str:
+    """Return the format of the facts stored in directory."""
+    for fmt in ("sqlite", "binary", "jsonl"):
+        if store_exists(directory, fmt):
+            return fmt
+    return "json"
+
+
+def count_records(directory: str, fmt: str) -> int:
+    """Return the number of chunks stored in directory."""
+    if fmt == "jsonl":
+        with open(os.path.join(directory, FACTS_NAME + ".jsonl"), "rb") as f:
+            return sum(1 for _ in f)
+    if fmt == "binary":
+        with RecordReader(os.path.join(directory, FACTS_NAME + ".bin")) as reader:
+            return len(reader)
+    if fmt == "sqlite":
+        return fact_db.count_records(directory)
+    return len(list_json_chunk_files(directory))
+
+
+def iter_records(directory: str, fmt: str, include_text: bool = True) -> Iterator[Dict[str, Any]]:
+    """Stream each chunk's data from the store, in chunk order.
+
+    With include_text=False the texts are never read, and records come back
+    without "original_text".
+    """
+    if fmt == "json":
+        for json_file in list_json_chunk_files(directory):
+            with open(os.path.join(directory, json_file), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not include_text:
+                data.pop("original_text", None)
+                yield data
+            else:
+                yield with_text(data)
+    elif fmt == "jsonl":
+        with open(os.path.join(directory, FACTS_NAME + ".jsonl"), "r", encoding="utf-8") as facts_file:
+            if not include_text:
+                for line in facts_file:
+                    yield json.loads(line)
+                return
+            with open(os.path.join(directory, TEXTS_NAME + ".jsonl"), "r", encoding="utf-8") as texts_file:
+                for facts_line, text_line in zip(facts_file, texts_file):
+                    yield join_record(json.loads(facts_line), json.loads(text_line)["text"])
+    elif fmt == "binary":
+        with RecordReader(os.path.join(directory, FACTS_NAME + ".bin")) as facts_reader:
+            if not include_text:
+                for _, payload in facts_reader:
+                    yield json.loads(payload)
+                return
+            with RecordReader(os.path.join(directory, TEXTS_NAME + ".bin")) as texts_reader:
+                for (_, facts_payload), (_, text_payload) in zip(facts_reader, texts_reader):
+                    yield join_record(json.loads(facts_payload), text_payload.decode("utf-8"))
+    elif fmt == "sqlite":
+        for facts, text in fact_db.iter_rows(directory, include_text):
+            yield join_record(facts, text)
+    else:
+        raise ValueError(f"Unsupported fact store format: {fmt}")
+
+
+def iter_fact_payloads(directory: str, fmt: str) -> Iterator[Tuple[str, Any]]:
+    """Stream (name, encoded facts) for each chunk of a jsonl, binary or sqlite store.
+
+    Nothing is decoded here, so the caller can json.loads each payload on its own
+    and report a corrupt record without losing the records after it.
+    """
+    if fmt == "jsonl":
+        facts_name = FACTS_NAME + ".jsonl"
+        with open(os.path.join(directory, facts_name), "r", encoding="utf-8") as facts_file:
+            for line_number, line in enumerate(facts_file, 1):
+                yield f"{facts_name} line {line_number}", line
+    elif fmt == "binary":
+        with RecordReader(os.path.join(directory, FACTS_NAME + ".bin")) as facts_reader:
+            yield from facts_reader
+    elif fmt == "sqlite":
+        yield from fact_db.iter_fact_payloads(directory)
+    else:
+        raise ValueError(f"Unsupported fact store format: {fmt}")
+
+
+def iter_texts(directory: str, fmt: str) -> Iterator[str]:
+    """Stream each chunk's original text from the store, in chunk order."""
+    if fmt == "jsonl":
+        with open(os.path.join(directory, TEXTS_NAME + ".jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)["text"]
+    elif fmt == "binary":
+        with RecordReader(os.path.join(directory, TEXTS_NAME + ".bin")) as reader:
+            for _, payload in reader:
+                yield payload.decode("utf-8")
+    elif fmt == "sqlite":
+        yield from fact_db.iter_texts(directory)
+    else:
+        for data in iter_records(directory, fmt):
+            if "original_text" in data:
+                yield data["original_text"]
+
+
+def read_record(directory: str, chunk_id: str, include_text: bool = True,
+                fmt: str = "binary") -> Dict[str, Any]:
+    """Read one chunk's data from the store.
+
+    Binary stores seek straight to the record, SQLite stores look it up and
+    JSON stores open its file; JSONL stores are scanned up to it.
+    """
+    if fmt == "json":
+        with open(os.path.join(directory, chunk_id + ".json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not include_text:
+            data.pop("original_text", None)
+            return data
+        return with_text(data)
+    if fmt == "jsonl":
+        for data in iter_records(directory, fmt, include_text):
+            if data["chunk_id"] == chunk_id:
+                return data
+        raise KeyError(chunk_id)
+    if fmt == "sqlite":
+        facts, text = fact_db.read_row(directory, chunk_id, include_text)
+        return join_record(facts, text)
+    with RecordReader(os.path.join(directory, FACTS_NAME + ".bin")) as facts_reader:
+        facts = json.loads(facts_reader.get(chunk_id))
+    if not include_text:
+        return facts
+    with RecordReader(os.path.join(directory, TEXTS_NAME + ".bin")) as texts_reader:
+        return join_record(facts, texts_reader.get(chunk_id).decode("utf-8"))
@@ -0,0 +1,285 @@
+import os
+import re
+import sys
+import heapq
+import bisect
+import argparse
+from array import array
+from typing import Dict, Any, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: the array module backs the columns without it
+    np = None
+
+from fact_db import one_line, parse_dollars
+from fact_store import read_columns, write_columns
+from structure_index import heading_node
+
+# Funding ledger: every funding fact of a bill as one row of fixed-width
+# columns, written next to the extracted facts at extraction time. Amounts are
+# parsed once into integer cents; chunk, division, title, section, agency,
+# purpose and availability are indexes into string tables. Rollups run over
+# whole columns (NumPy when installed, the array module otherwise) instead of
+# re-reading the JSON facts.
+# The file is a column file (see fact_store.write_columns) whose header holds
+# the row count and the string tables.
+LEDGER_FILE = "funding_ledger.bin"
+MAGIC = b"FLEDGER1"
+COLUMNS = (  # name, array typecode
+    ("cents", "q"),
+    ("fiscal_year", "h"),  # 0 when no fiscal year is stated
+    ("chunk", "i"),
+    ("division", "i"),
+    ("title", "i"),
+    ("section", "i"),
+    ("agency", "i"),
+    ("purpose", "i"),
+    ("availability", "i"),
+)
+STRING_COLUMNS = tuple(name for name, _ in COLUMNS[2:])
+GROUP_COLUMNS = ("division", "title", "section", "agency", "fiscal_year", "chunk", "purpose")
+
+# Heading lines naming the agency that the funding below them goes to
+agency_heading = re.compile(
+    r"^(?:DEPARTMENT OF\b.*|ADMINISTRATION (?:FOR|ON)\b.*|CORPS OF ENGINEERS\b.*|"
+    r".*\b(?:AGENCY|ADMINISTRATION|SERVICE|SURVEY|COMMISSION|CORPORATION|FOUNDATION|BUREAU))$")
+fiscal_year_pattern = re.compile(r"\b(?:fiscal years?|FY) ?(\d{4})\b")
+# "... for the fiscal year ending September 30, 2025, ..." sets the year of a whole division
+act_year_pattern = re.compile(r"fiscal year ending September 30, (\d{4})")
+
+
+class StringTable:
+    """Assign each distinct string a small integer, in order of first use."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def id(self, value: str) -> int:
+        if value not in self.ids:
+            self.ids[value] = len(self.values)
+            self.values.append(value)
+        return self.ids[value]
+
+
+class LedgerWriter:
+    """Collect the funding rows of chunk records, in document order, and write the ledger.
+
+    Division, title, section and agency come from the heading lines seen so
+    far, so chunks must be added in order and still carry their original_text.
+    """
+
+    def __init__(self):
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS}
+        self.strings = {name: StringTable() for name in STRING_COLUMNS}
+        for name in STRING_COLUMNS:
+            self.strings[name].id("")  # id 0: unknown
+        self.division = self.title = self.section = self.agency = ""
+        self.act_year = 0
+        self.previous_heading = ""  # an upper-case line an agency name may continue from
+
+    def _heading(self, line: str) -> None:
+        """Update the current division, title, section and agency from one line."""
+        found = heading_node(line)
+        if found is not None:
+            kind, label = found
+            label = label.lower()
+            if kind == "division":
+                self.division = f"division_{label}"
+                self.title = self.section = self.agency = ""
+                self.act_year = 0
+            elif kind == "title":
+                self.title = "/".join(filter(None, (self.division, f"title_{label}")))
+                self.section = self.agency = ""
+            else:
+                self.section = "/".join(filter(None, (self.title or self.division, f"sec_{label}")))
+            self.previous_heading = ""
+            return
+        if not line.isupper() or "$" in line:
+            self.previous_heading = ""
+            return
+        # A one-word line may finish the heading above it ("... HUMAN" / "SERVICES")
+        name = f"{self.previous_heading} {line}" if self.previous_heading and " " not in line else line
+        if agency_heading.match(name):
+            self.agency = name
+        self.previous_heading = line
+
+    def _append(self, item: Dict[str, Any], chunk_id: str, line: str) -> None:
+        m = fiscal_year_pattern.search(line)
+        values = {
+            "cents": (parse_dollars(item.get("amount")) or 0) * 100,
+            "fiscal_year": int(m.group(1)) if m else self.act_year,
+            "chunk": self.strings["chunk"].id(chunk_id),
+            "division": self.strings["division"].id(self.division),
+            "title": self.strings["title"].id(self.title),
+            "section": self.strings["section"].id(self.section),
+            "agency": self.strings["agency"].id(self.agency),
+            "purpose": self.strings["purpose"].id(item.get("purpose") or ""),
+            "availability": self.strings["availability"].id(item.get("availability") or ""),
+        }
+        for name, value in values.items():
+            self.columns[name].append(value)
+
+    def add(self, data: Dict[str, Any]) -> None:
+        """Add one chunk's funding facts, reading its text for the headings above each one."""
+        items = data.get("funding", [])
+        chunk_id = data["chunk_id"]
+        i = 0
+        for line in data.get("original_text", "").split("\n"):
+            stripped = line.strip()
+            if not stripped:
+                continue
+            self._heading(stripped)
+            if not self.act_year and "September 30" in stripped:
+                m = act_year_pattern.search(stripped)
+                if m:
+                    self.act_year = int(m.group(1))
+            # Funding facts come one per line, in line order
+            if i < len(items) and "$" in stripped and (items[i].get("amount") or "$") in stripped:
+                self._append(items[i], chunk_id, stripped)
+                i += 1
+        for item in items[i:]:
+            self._append(item, chunk_id, "")
+
+    def write(self, directory: str) -> str:
+        """Write the ledger to <directory>/funding_ledger.bin and return its path."""
+        path = os.path.join(directory, LEDGER_FILE)
+        write_columns(path, MAGIC, {"rows": len(self.columns["cents"]),
+                                    "strings": {name: table.values for name, table in self.strings.items()}},
+                      self.columns)
+        return path
+
+
+def ledger_exists(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, LEDGER_FILE))
+
+
+class FundingLedger:
+    """The columns of a ledger written by LedgerWriter, with rollups over them."""
+
+    def __init__(self, directory: str):
+        header, columns = read_columns(os.path.join(directory, LEDGER_FILE), MAGIC)
+        self.rows = header["rows"]
+        self.strings: Dict[str, List[str]] = header["strings"]
+        self.columns: Dict[str, Any] = columns
+        if np is not None:
+            self.columns = {name: np.frombuffer(column, dtype=column.typecode)
+                            for name, column in columns.items()}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def total_cents(self) -> int:
+        return int(self.columns["cents"].sum()) if np is not None else sum(self.columns["cents"])
+
+    def label(self, column: str, value: int) -> str:
+        if column == "fiscal_year":
+            return str(value) if value else ""
+        return self.strings[column][value]
+
+    def totals_by(self, column: str) -> List[Tuple[str, int, int]]:
+        """Return (label, total cents, items) for every value of column, largest total first."""
+        keys = self.columns[column]
+        cents = self.columns["cents"]
+        if column == "fiscal_year":
+            groups = (int(max(keys)) if len(keys) else 0) + 1
+        else:
+            groups = len(self.strings[column])
+        if np is not None:
+            totals = np.zeros(groups, dtype=np.int64)
+            np.add.at(totals, keys, cents)
+            counts = np.bincount(keys, minlength=groups)
+            totals, counts = totals.tolist(), counts.tolist()
+        else:
+            totals = [0] * groups
+            counts = [0] * groups
+            for key, amount in zip(keys, cents):
+                totals[key] += amount
+                counts[key] += 1
+        rows = [(self.label(column, key), totals[key], counts[key]) for key in range(groups) if counts[key]]
+        rows.sort(key=lambda row: -row[1])
+        return rows
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """Return line item i with its string columns resolved."""
+        item = {name: self.strings[name][self.columns[name][i]] for name in STRING_COLUMNS}
+        item["cents"] = int(self.columns["cents"][i])
+        item["fiscal_year"] = int(self.columns["fiscal_year"][i]) or None
+        return item
+
+    def top(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Return the n largest line items, in the order they appear among equals."""
+        cents = self.columns["cents"]
+        if np is not None:
+            order = np.argsort(-cents, kind="stable")[:n].tolist()
+        else:
+            order = heapq.nlargest(n, range(self.rows), key=cents.__getitem__)
+        return [self.row(i) for i in order]
+
+    def histogram(self) -> List[Tuple[int, int, int, int]]:
+        """Return (low dollars, high dollars, items, total cents) for each power-of-ten bucket."""
+        cents = self.columns["cents"]
+        if not self.rows:
+            return []
+        top = max(int(cents.max()) if np is not None else max(cents), 100)
+        edges = [0]
+        while edges[-1] <= top:
+            edges.append(100 * 10 ** (len(edges) - 1))
+        buckets = len(edges) - 1
+        if np is not None:
+            keys = np.searchsorted(np.array(edges[1:], dtype=np.int64), cents, side="right")
+            counts = np.bincount(keys, minlength=buckets).tolist()
+            totals = np.zeros(buckets, dtype=np.int64)
+            np.add.at(totals, keys, cents)
+            totals = totals.tolist()
+        else:
+            counts = [0] * buckets
+            totals = [0] * buckets
+            for amount in cents:
+                key = bisect.bisect_right(edges, amount, 1) - 1
+                counts[key] += 1
+                totals[key] += amount
+        return [(edges[k] // 100, edges[k + 1] // 100, counts[k], totals[k])
+                for k in range(buckets) if counts[k]]
+
+
+def dollars(cents: int) -> str:
+    return f"${cents // 100:,}" if cents % 100 == 0 else f"${cents / 100:,.2f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Funding rollups from the ledger built during fact extraction.")
+    parser.add_argument("report", nargs="?", default="summary",
+                        choices=("summary", "by", "top", "histogram"))
+    parser.add_argument("column", nargs="?", default="agency", choices=GROUP_COLUMNS,
+                        help="column to total by for the 'by' report")
+    parser.add_argument("--dir", default="json_chunks", help="directory holding funding_ledger.bin")
+    parser.add_argument("--limit", type=int, default=20, help="rows to print")
+    args = parser.parse_args()
+
+    if not ledger_exists(args.dir):
+        print(f"No funding ledger in '{args.dir}'. Run fact extraction with funding_ledger enabled first.")
+        sys.exit(1)
+    ledger = FundingLedger(args.dir)
+
+    if args.report == "summary":
+        print(f"Funding: {dollars(ledger.total_cents())} in {len(ledger)} items")
+        for column in ("division", "agency", "fiscal_year"):
+            print(f"\nBy {column}:")
+            for label, cents, items in ledger.totals_by(column)[:args.limit]:
+                print(f"  {dollars(cents):>20}  {items:>5} items  {one_line(label)[:70] or '(not stated)'}")
+    elif args.report == "by":
+        for label, cents, items in ledger.totals_by(args.column)[:args.limit]:
+            print(f"  {dollars(cents):>20}  {items:>5} items  {one_line(label)[:70] or '(not stated)'}")
+    elif args.report == "top":
+        for item in ledger.top(args.limit):
+            print(f"  {dollars(item['cents']):>20}  {item['section'] or item['title'] or item['division'] or item['chunk']:<28} "
+                  f"{one_line(item['purpose'])[:50]}")
+    else:
+        for low, high, items, cents in ledger.histogram():
+            print(f"  {dollars(low * 100):>18} - {dollars(high * 100):<18} {items:>5} items  {dollars(cents):>20}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import time
+import builtins
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Set
+
+# Optional run instrumentation: stage timings, per-pattern regex timings and
+# file I/O counts, written as a JSON report to the output directory.
+#
+# Nothing is patched unless a session is active: stage() is then a bare
+# context manager, and the stage modules keep their real compiled patterns.
+# Pattern and I/O figures cover the main process only; extraction worker
+# processes (extract_workers > 1) are not included.
+REPORT_PREFIX = "instrumentation"
+
+_original_open = builtins.open
+
+
+def new_io_counts() -> Dict[str, int]:
+    return {"files_read": 0, "bytes_read": 0, "files_written": 0, "bytes_written": 0}
+
+
+class TimedPattern:
+    """Stand-in for a compiled pattern that times every call and counts its matches."""
+
+    def __init__(self, pattern: re.Pattern, stats: Dict[str, Any]):
+        self._pattern = pattern
+        self._stats = stats
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pattern, name)
+
+    def _record(self, start: float, matches: int) -> None:
+        self._stats["calls"] += 1
+        self._stats["matches"] += matches
+        self._stats["seconds"] += time.perf_counter() - start
+
+    def match(self, *args, **kwargs):
+        start = time.perf_counter()
+        m = self._pattern.match(*args, **kwargs)
+        self._record(start, m is not None)
+        return m
+
+    def fullmatch(self, *args, **kwargs):
+        start = time.perf_counter()
+        m = self._pattern.fullmatch(*args, **kwargs)
+        self._record(start, m is not None)
+        return m
+
+    def search(self, *args, **kwargs):
+        start = time.perf_counter()
+        m = self._pattern.search(*args, **kwargs)
+        self._record(start, m is not None)
+        return m
+
+    def findall(self, *args, **kwargs):
+        start = time.perf_counter()
+        found = self._pattern.findall(*args, **kwargs)
+        self._record(start, len(found))
+        return found
+
+    def finditer(self, *args, **kwargs):
+        start = time.perf_counter()
+        iterator = self._pattern.finditer(*args, **kwargs)
+        self._record(start, 0)
+        return self._timed_iter(iterator)
+
+    def _timed_iter(self, iterator):
+        stats = self._stats
+        while True:
+            start = time.perf_counter()
+            m = next(iterator, None)
+            stats["seconds"] += time.perf_counter() - start
+            if m is None:
+                return
+            stats["matches"] += 1
+            yield m
+
+    def sub(self, repl, string, count=0):
+        return self.subn(repl, string, count)[0]
+
+    def subn(self, repl, string, count=0):
+        start = time.perf_counter()
+        result = self._pattern.subn(repl, string, count)
+        self._record(start, result[1])
+        return result
+
+    def split(self, *args, **kwargs):
+        start = time.perf_counter()
+        parts = self._pattern.split(*args, **kwargs)
+        self._record(start, len(parts) - 1)
+        return parts
+
+
+class Session:
+    """Measurements collected for one processor action."""
+
+    def __init__(self, action: str, output_dir: str):
+        self.action = action
+        self.output_dir = output_dir
+        self.started = datetime.now()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.stages: List[Dict[str, Any]] = []
+        self.patterns: Dict[str, Dict[str, Any]] = {}
+        self.patched: List[tuple] = []
+        # I/O counters of the session and of every stage currently running
+        self.io = new_io_counts()
+        self.written: Set[str] = set()
+        self.open_counters: List[tuple] = [(self.io, self.written)]
+
+    def record_open(self, file: Any, mode: str, f: Any) -> None:
+        if isinstance(file, int):
+            return
+        writing = any(c in mode for c in "wax+")
+        path = os.path.abspath(os.fsdecode(file))
+        size = 0 if writing else os.fstat(f.fileno()).st_size
+        for counts, written in self.open_counters:
+            if writing:
+                counts["files_written"] += 1
+                written.add(path)
+            else:
+                counts["files_read"] += 1
+                counts["bytes_read"] += size
+
+
+_session: Optional[Session] = None
+
+
+def active() -> bool:
+    return _session is not None
+
+
+def _counting_open(file, mode="r", *args, **kwargs):
+    f = _original_open(file, mode, *args, **kwargs)
+    if _session is not None:
+        _session.record_open(file, mode, f)
+    return f
+
+
+def written_bytes(paths: Set[str]) -> int:
+    """Total size of the files written, skipping temporary ones already removed."""
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def instrument_module(module: Any) -> None:
+    """Time the module's compiled patterns until the session ends (no-op without one)."""
+    if _session is None:
+        return
+    for name, value in list(vars(module).items()):
+        if isinstance(value, re.Pattern):
+            stats = _session.patterns.setdefault(f"{module.__name__}.{name}",
+                                                 {"calls": 0, "matches": 0, "seconds": 0.0})
+            _session.patched.append((module, name, value))
+            setattr(module, name, TimedPattern(value, stats))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record wall time, CPU time and file I/O of one pipeline stage."""
+    if _session is None:
+        yield
+        return
+    counts = new_io_counts()
+    written: Set[str] = set()
+    _session.open_counters.append((counts, written))
+    times = os.times()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        end_times = os.times()
+        counts["bytes_written"] = written_bytes(written)
+        _session.open_counters.pop()
+        record = {
+            "stage": name,
+            "wall_seconds": round(time.perf_counter() - wall_start, 4),
+            "cpu_seconds": round(time.process_time() - cpu_start, 4),
+            # Finished worker processes (extraction pool) are counted here
+            "child_cpu_seconds": round((end_times.children_user - times.children_user)
+                                       + (end_times.children_system - times.children_system), 4)
+        }
+        record.update(counts)
+        _session.stages.append(record)
+
+
+def build_report(session: Session) -> Dict[str, Any]:
+    session.io["bytes_written"] = written_bytes(session.written)
+    patterns = {
+        name: {"calls": s["calls"], "matches": s["matches"], "seconds": round(s["seconds"], 4)}
+        for name, s in sorted(session.patterns.items(), key=lambda item: -item[1]["seconds"])
+    }
+    return {
+        "action": session.action,
+        "started": session.started.isoformat(timespec="seconds"),
+        "wall_seconds": round(time.perf_counter() - session.wall_start, 4),
+        "cpu_seconds": round(time.process_time() - session.cpu_start, 4),
+        "stages": session.stages,
+        "io": session.io,
+        "patterns": patterns,
+        "scope": "main process; pattern and I/O counts exclude extraction worker processes"
+    }
+
+
+@contextmanager
+def session(action: str, output_dir: str, enabled: bool = True) -> Iterator[None]:
+    """Instrument everything run inside the block and write the report when it ends.
+
+    A session opened inside another one is merged into the outer one.
+    """
+    global _session
+    if not enabled or _session is not None:
+        yield
+        return
+
+    _session = Session(action, output_dir)
+    builtins.open = _counting_open
+    try:
+        yield
+    finally:
+        builtins.open = _original_open
+        current, _session = _session, None
+        for module, name, pattern in reversed(current.patched):
+            setattr(module, name, pattern)
+
+        report = build_report(current)
+        os.makedirs(output_dir, exist_ok=True)
+        stamp = current.started.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(output_dir, f"{REPORT_PREFIX}_{action}_{stamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Instrumentation report written to: {path}")
@@ -2,11 +2,23 @@ import os
 import sys
 import json
 import importlib.util
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, Iterator, List
+
+import chunk_archive
+import chunk_spans
+import combined_document
+import fact_db
+import fact_store
+import instrumentation
+import structure_index
 
 class LegislativeProcessor:
-    def __init__(self):
-        self.config = self.load_config()
+    def __init__(self, instrument: bool = False, config: Optional[Dict[str, Any]] = None):
+        # A config passed in (e.g. a batch workspace's) is used as is; config.json
+        # is then neither read nor rewritten
+        self.config = config if config is not None else self.load_config()
+        # --instrument turns instrumentation on for this session without saving it
+        self.instrument = instrument
         self.ensure_directories()
         
     def load_config(self) -> Dict[str, Any]:
@@ -19,7 +31,28 @@ class LegislativeProcessor:
             "json_chunks_dir": "json_chunks",
             "output_dir": "output",
             "max_chars": 20000,
-            "chunking_strategy": "size",  # Default strategy
+            "chunking_strategy": "size",  # Default strategy: size, structure or tokens
+            "max_tokens": 4000,  # Token budget per chunk for the tokens strategy
+            "token_estimator": "heuristic",  # heuristic, or tiktoken[:<encoding>] if tiktoken is installed
+            "token_cache_dir": ".token_cache",  # Per-line token counts, reused when re-chunking
+            "clean_workers": 1,  # Processes cleaning page shards of large inputs (0 = all cores)
+            "extract_workers": 1,  # Worker processes for extraction (0 = all cores)
+            "extract_cache": True,  # Reuse facts for chunks whose text hasn't changed
+            "extract_cache_dir": ".extract_cache",
+            "extract_cache_max_mb": 256,
+            "write_intermediate_files": True,  # Keep cleaned/chunk/JSON files from a full run
+            "fact_store_format": "json",  # json (file per chunk), jsonl, binary or sqlite
+            "chunk_storage": "files",  # files (one .txt per chunk), packed (chunks/chunks.bin) or spans (offsets into the cleaned file)
+            "fact_index": True,  # Build json_chunks/fact_index.bin for fact_index.py queries
+            "funding_ledger": True,  # Build json_chunks/funding_ledger.bin for funding_ledger.py rollups
+            "citation_graph": True,  # Build json_chunks/citation_graph.bin for citation_graph.py queries
+            "structure_index": True,  # Save chunks/structure.json and tag facts with their sections
+            "instrumentation": False,  # Write a timing/regex/I/O report to the output dir for each run
+            "versions_dir": "versions",  # Units and facts of each bill version for bill_versions.py
+            "service_host": "127.0.0.1",  # Address service.py listens on
+            "service_port": 8765,
+            "service_workers": 0,  # Extraction processes of service.py (0 = one per CPU core)
+            "service_timeout": 120,  # Seconds a service.py worker may spend on one task (0 = no limit)
             "script_paths": {
                 "clean": "cleanText.py",
                 "chunk": "chunk_legislation.py",
@@ -35,8 +68,9 @@ class LegislativeProcessor:
                 merged_config = default_config.copy()
                 merged_config.update(existing_config)
                 # Save the merged config back to ensure new options are persisted
-                with open(config_path, 'w') as f:
-                    json.dump(merged_config, f, indent=2)
+                if merged_config != existing_config:
+                    with open(config_path, 'w') as f:
+                        json.dump(merged_config, f, indent=2)
                 return merged_config
             except json.JSONDecodeError:
                 print("Error reading config file. Using defaults.")
@@ -60,7 +94,12 @@ class LegislativeProcessor:
         """Get user preferences for chunking strategy."""
         options = {
             "strategy": self.config["chunking_strategy"],
-            "max_chars": self.config["max_chars"]
+            "max_chars": self.config["max_chars"],
+            "max_tokens": self.config["max_tokens"],
+            "token_estimator": self.config["token_estimator"],
+            "token_cache_dir": self.config["token_cache_dir"],
+            "storage": self.config["chunk_storage"],
+            "structure_index": self.config["structure_index"]
         }
 
         print("\nCHUNKING STRATEGY OPTIONS")
@@ -70,22 +109,34 @@ class LegislativeProcessor:
         print("   - Splits by maximum character count")
         print("   - Tries to maintain structural integrity")
         print("2. Structure-based chunking")
-        print("   - Splits by DIVISION/TITLE markers")
-        print("   - May result in larger chunks")
+        print("   - Starts a chunk at every DIVISION/TITLE marker")
+        print("   - Packs whole sections (SEC.) into chunks up to the maximum size")
+        print("3. Token-budget chunking")
+        print("   - Packs whole lines into chunks up to a maximum token count")
+        print(f"   - Tokens estimated with the '{self.config['token_estimator']}' estimator")
 
-        choice = input("\nSelect chunking strategy (1-2) [1]: ").strip() or "1"
+        choice = input("\nSelect chunking strategy (1-3) [1]: ").strip() or "1"
 
-        if choice == "1":
+        if choice == "3":
+            options["strategy"] = "tokens"
+        elif choice == "2":
+            options["strategy"] = "structure"
+        elif choice == "1":
             options["strategy"] = "size"
+        if choice in ("1", "2"):
             size_choice = input(f"\nMax characters per chunk [{self.config['max_chars']}]: ").strip()
             if size_choice.isdigit():
                 options["max_chars"] = int(size_choice)
-        elif choice == "2":
-            options["strategy"] = "structure"
+        elif choice == "3":
+            size_choice = input(f"\nMax tokens per chunk [{self.config['max_tokens']}]: ").strip()
+            if size_choice.isdigit():
+                options["max_tokens"] = int(size_choice)
 
         print("\nSelected options:")
         print(f"- Chunking strategy: {options['strategy']}")
-        if options['strategy'] == 'size':
+        if options["strategy"] == "tokens":
+            print(f"- Max tokens: {options['max_tokens']}")
+        else:
             print(f"- Max characters: {options['max_chars']}")
 
         confirm = input("\nProceed with these options? [Y/n]: ").strip().lower() or 'y'
@@ -95,6 +146,7 @@ class LegislativeProcessor:
         # Update config with new options
         self.config["chunking_strategy"] = options["strategy"]
         self.config["max_chars"] = options["max_chars"]
+        self.config["max_tokens"] = options["max_tokens"]
         self.save_config()
 
         return options
@@ -104,42 +156,6 @@ class LegislativeProcessor:
         with open("config.json", 'w') as f:
             json.dump(self.config, f, indent=2)
 
-    def modify_config(self) -> None:
-        """Allow user to modify configuration settings."""
-        print("\nCurrent Configuration:")
-        # Filter out script_paths for simpler display
-        display_config = {k: v for k, v in self.config.items() if k != "script_paths"}
-        for key, value in display_config.items():
-            print(f"{key}: {value}")
-
-        print("\nWhich setting would you like to modify?")
-        print("Available options:", ", ".join(display_config.keys()))
-        setting = input("Enter setting name (or 'back' to return): ").strip()
-
-        if setting.lower() == 'back':
-            return
-
-        if setting in display_config:
-            new_value = input(f"Enter new value for {setting}: ").strip()
-            # Handle numeric values
-            if isinstance(self.config[setting], int):
-                try:
-                    new_value = int(new_value)
-                except ValueError:
-                    print("Invalid numeric value. Setting not updated.")
-                    return
-
-            self.config[setting] = new_value
-            self.save_config()
-            print(f"Updated {setting} to: {new_value}")
-        else:
-            print("Invalid setting name")
-
-    def save_config(self) -> None:
-        """Save current configuration to file."""
-        with open("config.json", 'w') as f:
-            json.dump(self.config, f, indent=2)
-
     def modify_config(self) -> None:
         """Allow user to modify configuration settings."""
         print("\nCurrent Configuration:")
@@ -157,8 +173,15 @@ class LegislativeProcessor:
             
         if setting in display_config:
             new_value = input(f"Enter new value for {setting}: ").strip()
+            # Handle on/off values (bool is a subclass of int, so check it first)
+            if isinstance(self.config[setting], bool):
+                answer = new_value.lower()
+                if answer not in ("true", "false", "yes", "no", "y", "n", "on", "off", "1", "0"):
+                    print("Invalid value: enter true or false. Setting not updated.")
+                    return
+                new_value = answer in ("true", "yes", "y", "on", "1")
             # Handle numeric values
-            if isinstance(self.config[setting], int):
+            elif isinstance(self.config[setting], int):
                 try:
                     new_value = int(new_value)
                 except ValueError:
@@ -170,35 +193,70 @@ class LegislativeProcessor:
         else:
             print("Invalid setting name")
 
-    def run_script(self, script_name: str, options: Dict[str, Any] = None) -> None:
-        """Run a Python script by importing it as a module."""
+    def load_script(self, script_name: str) -> Optional[Any]:
+        """Import a stage script as a module, or return None if it can't be loaded."""
         script_path = self.config["script_paths"][script_name]
         if not os.path.exists(script_path):
             print(f"Error: Script {script_path} not found!")
-            return
-            
+            return None
+
+        # Register the module under its file name so that worker processes
+        # can import it again when pickling functions for a process pool
+        module_name = os.path.splitext(os.path.basename(script_path))[0]
+        spec = importlib.util.spec_from_file_location(module_name, script_path)
+        if spec is None or spec.loader is None:
+            print(f"Error: Could not load {script_path}")
+            return None
+
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        instrumentation.instrument_module(module)
+        return module
+
+    def run_script(self, script_name: str, options: Dict[str, Any] = None) -> None:
+        """Run a Python script by importing it as a module."""
+        script_path = self.config["script_paths"][script_name]
         try:
-            spec = importlib.util.spec_from_file_location(script_name, script_path)
-            if spec is None or spec.loader is None:
-                print(f"Error: Could not load {script_path}")
+            module = self.load_script(script_name)
+            if module is None:
                 return
-                
-            module = importlib.util.module_from_spec(spec)
-            sys.modules[script_name] = module
-            spec.loader.exec_module(module)
             
-            # If this is the chunking script, pass the strategy options
-            if script_name == "chunk" and options:
+            # Pass the stage options (chunking strategy, extraction workers...)
+            if options:
                 if hasattr(module, 'process_with_options'):
-                    module.process_with_options(options)
+                    with instrumentation.stage(script_name):
+                        module.process_with_options(options)
                 else:
-                    print("Warning: Chunking script doesn't support strategy options")
-                    module  # Run default behavior
+                    print(f"Warning: {script_path} doesn't support options")
             
             print(f"Successfully ran {script_path}")
         except Exception as e:
             print(f"Error running {script_path}: {str(e)}")
 
+    def get_cleaning_options(self) -> Dict[str, Any]:
+        """Get options for the cleaning step from the configuration."""
+        return {
+            "input_file": self.config["input_file"],
+            "output_file": self.config["cleaned_file"],
+            "workers": self.config["clean_workers"]
+        }
+
+    def get_extraction_options(self) -> Dict[str, Any]:
+        """Get options for the fact extraction step from the configuration."""
+        return {
+            "workers": self.config["extract_workers"],
+            "cache": self.config["extract_cache"],
+            "cache_dir": self.config["extract_cache_dir"],
+            "cache_max_bytes": self.config["extract_cache_max_mb"] * 1024 * 1024,
+            "output_format": self.config["fact_store_format"],
+            "chunk_storage": self.config["chunk_storage"],
+            "index": self.config["fact_index"],
+            "ledger": self.config["funding_ledger"],
+            "citation_graph": self.config["citation_graph"],
+            "structure_index": self.config["structure_index"]
+        }
+
     def get_reconstruction_options(self) -> Dict[str, bool]:
         """Get user preferences for document reconstruction."""
         options = {
@@ -242,151 +300,131 @@ class LegislativeProcessor:
         
         return options
 
-    def combine_json_data(self, json_files: List[str], json_dir: str, options: Dict[str, bool]) -> Dict:
-        """Combine all JSON chunks into a single structured document."""
-        combined_data = {
-            "document_metadata": {
-                "total_chunks": len(json_files),
-                "chunking_strategy": self.config["chunking_strategy"]
-            },
-            "aggregated_data": {
-                "references": {
-                    "us_code": [],
-                    "public_laws": [],
-                    "other_legislative_refs": []
-                },
-                "funding": [],
-                "deadlines": [],
-                "duties_and_requirements": [],
-                "programs_and_entities": [],
-                "dates": [],
-                "other_facts": []
-            }
-        }
-        
-        # Only add these fields if requested
-        if options["include_original_text"]:
-            combined_data["full_text"] = ""
-            full_text_parts = []
-            
-        if options["include_chunks"]:
-            combined_data["chunks"] = []
-        
-        # Process each chunk
+    def iter_json_chunks(self, json_files: List[str], json_dir: str) -> Iterator[Dict]:
+        """Load chunk JSON files one at a time, skipping any that can't be read."""
         for json_file in json_files:
             filepath = os.path.join(json_dir, json_file)
             try:
                 with open(filepath, 'r', encoding='utf-8') as f:
-                    chunk_data = json.load(f)
-                    
-                # Handle text if needed
-                if options["include_original_text"] and "original_text" in chunk_data:
-                    full_text_parts.append(chunk_data["original_text"])
-                    
-                # Store chunk data if requested
-                if options["include_chunks"]:
-                    if not options["include_original_text"]:
-                        # Remove original text to save space if not needed
-                        chunk_data.pop("original_text", None)
-                    combined_data["chunks"].append(chunk_data)
-                
-                # Aggregate references
-                for ref_type in ["us_code", "public_laws", "other_legislative_refs"]:
-                    combined_data["aggregated_data"]["references"][ref_type].extend(
-                        chunk_data.get("references", {}).get(ref_type, [])
-                    )
-                
-                # Aggregate other data types
-                for data_type in ["funding", "deadlines", "duties_and_requirements", 
-                                "dates", "other_facts"]:
-                    combined_data["aggregated_data"][data_type].extend(
-                        chunk_data.get(data_type, [])
-                    )
-                
-                # Special handling for programs and entities - keep unique values
-                if "programs_and_entities" in chunk_data:
-                    current_entities = set(combined_data["aggregated_data"]
-                        .get("programs_and_entities", []))
-                    current_entities.update(chunk_data["programs_and_entities"])
-                    combined_data["aggregated_data"]["programs_and_entities"] = \
-                        list(current_entities)
-                        
+                    yield json.load(f)
             except Exception as e:
                 print(f"Error processing {json_file}: {str(e)}")
-                continue
-        
-        # Remove duplicates from reference lists while preserving order
-        for ref_type in combined_data["aggregated_data"]["references"]:
-            combined_data["aggregated_data"]["references"][ref_type] = list(dict.fromkeys(
-                combined_data["aggregated_data"]["references"][ref_type]
-            ))
-        
-        # Add full text if requested
-        if options["include_original_text"]:
-            combined_data["full_text"] = "\n".join(full_text_parts)
-        
-        return combined_data
 
     def reconstruct_document(self, output_file: str = "reconstructed_document.txt", 
-                           json_output: str = "combined_document.json") -> None:
-        """Reconstruct documents based on user preferences."""
+                           json_output: str = "combined_document.json",
+                           chunk_data: Optional[List[Dict]] = None,
+                           options: Optional[Dict[str, bool]] = None) -> None:
+        """Reconstruct documents based on user preferences.
+
+        chunk_data holds extracted chunks already in memory (from process_all);
+        without it the chunks are read back from the JSON chunks directory.
+        options skips the prompts (see get_reconstruction_options for its keys).
+        """
         json_dir = self.config["json_chunks_dir"]
-        if not os.path.exists(json_dir):
+        store_format = self.config["fact_store_format"]
+        if chunk_data is None and not fact_store.store_exists(json_dir, store_format):
             print("Error: JSON chunks directory not found!")
             return
 
         # Get user preferences for reconstruction
-        options = self.get_reconstruction_options()
-
-        def get_chunk_num(filename):
-            base_name = os.path.splitext(filename)[0]
-            num_str = base_name.split('_')[0] if '_' in base_name else base_name
-            num_str = num_str.lstrip('0')
-            try:
-                return int(num_str) if num_str else 0
-            except ValueError:
-                return 0
-
-        json_files = sorted([f for f in os.listdir(json_dir) if f.endswith('.json')],
-                           key=get_chunk_num)
+        if options is None:
+            options = self.get_reconstruction_options()
+
+        json_files = []
+        if chunk_data is not None:
+            total_chunks = len(chunk_data)
+        elif store_format == "json":
+            json_files = fact_store.list_json_chunk_files(json_dir)
+            total_chunks = len(json_files)
+        else:
+            total_chunks = fact_store.count_records(json_dir, store_format)
         
-        if not json_files:
+        if not total_chunks:
             print("No JSON files found to reconstruct!")
             return
 
-        # Always process JSON data for text reconstruction
-        print("Processing chunks...")
-        combined_data = self.combine_json_data(json_files, json_dir, options)
-        
-        # Create requested output files
+        json_path = None
         if options["create_json"]:
             json_path = os.path.join(self.config["output_dir"], json_output)
-            try:
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(combined_data, f, indent=2, ensure_ascii=False)
-                print(f"Successfully wrote combined JSON to: {json_path}")
-            except Exception as e:
-                print(f"Error writing combined JSON: {str(e)}")
-        
+        text_path = None
+        source = None
         if options["create_text"]:
             text_path = os.path.join(self.config["output_dir"], output_file)
+            # Span chunks are byte ranges of the cleaned file, so their
+            # document is that file: it is copied once instead of rebuilt
             try:
-                with open(text_path, 'w', encoding='utf-8') as f:
-                    if options["include_original_text"]:
-                        f.write(combined_data["full_text"])
-                    else:
-                        # If we didn't keep full text in JSON, read it again
-                        text_parts = []
-                        for json_file in json_files:
-                            filepath = os.path.join(json_dir, json_file)
-                            with open(filepath, 'r', encoding='utf-8') as jf:
-                                chunk_data = json.load(jf)
-                                if "original_text" in chunk_data:
-                                    text_parts.append(chunk_data["original_text"])
-                        f.write("\n".join(text_parts))
-                print(f"Successfully wrote reconstructed text to: {text_path}")
+                source = self.span_source(chunk_data)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+
+        with instrumentation.stage("reconstruct"):
+            # One pass over the chunks builds both outputs
+            print("Processing chunks...")
+            if chunk_data is not None:
+                chunks = chunk_data
+            elif store_format == "json":
+                chunks = self.iter_json_chunks(json_files, json_dir)
+            else:
+                # Compact stores keep texts apart from facts, so texts are only
+                # read when an output needs them
+                needs_text = options["include_original_text"] or (text_path is not None and source is None)
+                chunks = fact_store.iter_records(json_dir, store_format, include_text=needs_text)
+
+            # A SQLite store aggregates with queries, so chunks are only read
+            # for the outputs that contain them
+            aggregator = None
+            if chunk_data is None and store_format == "sqlite":
+                aggregator = fact_db.DatabaseAggregator(json_dir)
+                in_json = options["include_chunks"] or options["include_original_text"]
+                if not (json_path and in_json) and (text_path is None or source):
+                    chunks = []
+
+            metadata = {
+                "total_chunks": total_chunks,
+                "chunking_strategy": self.config["chunking_strategy"]
+            }
+            try:
+                with combined_document.CombinedDocumentWriter(
+                        json_path, None if source else text_path, metadata,
+                        options["include_chunks"], options["include_original_text"],
+                        aggregator) as writer:
+                    for chunk in chunks:
+                        try:
+                            writer.add(chunk)
+                        except Exception as e:
+                            print(f"Error processing {chunk.get('chunk_id', 'chunk')}: {str(e)}")
             except Exception as e:
-                print(f"Error writing reconstructed text: {str(e)}")
+                print(f"Error writing reconstructed document: {str(e)}")
+                return
+
+            if json_path:
+                print(f"Successfully wrote combined JSON to: {json_path}")
+            if text_path:
+                if source:
+                    try:
+                        chunk_spans.copy_source(source, text_path)
+                    except Exception as e:
+                        print(f"Error writing reconstructed text: {str(e)}")
+                        return
+                print(f"Successfully wrote reconstructed text to: {text_path}")
+
+    def span_source(self, chunk_data: Optional[List[Dict]] = None) -> Optional[str]:
+        """Return the cleaned file the chunks are spans of, or None for chunk files."""
+        if chunk_data is not None:
+            if chunk_data and "source_span" in chunk_data[0]:
+                return chunk_spans.record_span(chunk_data[0]).source
+            return None
+        chunks_dir = self.config["chunks_dir"]
+        if self.config["chunk_storage"] == "spans" and chunk_spans.spans_exist(chunks_dir):
+            spans = chunk_spans.read_spans(chunks_dir)
+            return spans[0].source if spans else None
+        return None
+
+    def instrumented(self, action: str):
+        """Instrument the enclosed action when instrumentation is on."""
+        enabled = self.instrument or self.config["instrumentation"]
+        return instrumentation.session(action, self.config["output_dir"], enabled)
 
     def check_input_file(self) -> bool:
         """Check if input file exists."""
@@ -396,23 +434,101 @@ class LegislativeProcessor:
         return True
 
     def process_all(self) -> None:
-        """Run all processing steps in sequence."""
+        """Run all processing steps in sequence, passing results between stages in memory."""
         if not self.check_input_file():
             return
 
         # Get chunking options first
         chunking_options = self.get_chunking_options()
-            
+        self.run_pipeline(chunking_options)
+
+    def run_pipeline(self, chunking_options: Dict[str, Any],
+                     reconstruction_options: Optional[Dict[str, bool]] = None) -> Optional[int]:
+        """Run every stage on the configured input file and return the number of chunks.
+
+        Prompts only for reconstruction options, and not at all if they are given.
+        """
+        modules = {}
+        for step in ["clean", "chunk", "extract"]:
+            modules[step] = self.load_script(step)
+            if modules[step] is None:
+                return None
+
+        required = {"clean": "iter_cleaned_lines", "chunk": "chunk", "extract": "extract_chunks"}
+        if not all(hasattr(modules[step], name) for step, name in required.items()):
+            print("Warning: Scripts don't provide the in-memory API, running each script in turn")
+            self.process_all_from_files(chunking_options, reconstruction_options)
+            return None
+
+        write_files = self.config["write_intermediate_files"]
+
+        print("\nRunning clean step...")
+        with instrumentation.stage("clean"):
+            if self.config["clean_workers"] != 1 and hasattr(modules["clean"], "iter_cleaned_shards"):
+                shards = modules["clean"].iter_cleaned_shards(self.config["input_file"],
+                                                              self.config["clean_workers"])
+                cleaned_text = "\n".join(filter(None, shards))
+            else:
+                with open(self.config["input_file"], "r", encoding="utf-8") as f:
+                    cleaned_text = "\n".join(modules["clean"].iter_cleaned_lines(f))
+            if write_files:
+                with open(self.config["cleaned_file"], "w", encoding="utf-8") as f:
+                    f.write(cleaned_text)
+
+        print("\nRunning chunk step...")
+        with instrumentation.stage("chunk"):
+            if self.config["chunk_storage"] == "spans":
+                # Spans point into the cleaned file, so it is always written, and
+                # their boundaries are found in its memory map
+                if not write_files:
+                    with open(self.config["cleaned_file"], "w", encoding="utf-8") as f:
+                        f.write(cleaned_text)
+                chunks = list(modules["chunk"].chunk_file_spans(self.config["cleaned_file"], chunking_options))
+                chunk_spans.write_spans(chunks, self.config["chunks_dir"])
+            else:
+                chunks = list(modules["chunk"].chunk(cleaned_text, chunking_options))
+                if write_files and self.config["chunk_storage"] == "packed":
+                    chunk_archive.write_archive(chunks, self.config["chunks_dir"])
+                elif write_files:
+                    modules["chunk"].write_chunks(chunks, self.config["chunks_dir"])
+
+            structure = None
+            if self.config["structure_index"]:
+                # Offsets are bytes of the cleaned file, or of the text if it isn't written
+                if write_files or self.config["chunk_storage"] == "spans":
+                    structure = structure_index.index_file(self.config["cleaned_file"])
+                    structure_index.save_index(structure, self.config["chunks_dir"])
+                else:
+                    structure = structure_index.index_text(cleaned_text)
+            del cleaned_text
+        print(f"Created {len(chunks)} chunks")
+
+        print("\nRunning extract step...")
+        json_dir = self.config["json_chunks_dir"] if write_files else None
+        extraction_options = self.get_extraction_options()
+        extraction_options["structure"] = structure
+        with instrumentation.stage("extract"):
+            chunk_data = list(modules["extract"].extract_chunks(chunks, extraction_options, json_dir))
+
+        print("\nReconstructing final document...")
+        self.reconstruct_document(chunk_data=chunk_data, options=reconstruction_options)
+        return len(chunk_data)
+
+    def process_all_from_files(self, chunking_options: Dict[str, Any],
+                               reconstruction_options: Optional[Dict[str, bool]] = None) -> None:
+        """Run each stage script in turn, passing results between them on disk."""
         steps = ["clean", "chunk", "extract"]
         for step in steps:
             print(f"\nRunning {step} step...")
             if step == "chunk":
                 self.run_script(step, chunking_options)
+            elif step == "extract":
+                self.run_script(step, self.get_extraction_options())
             else:
-                self.run_script(step)
+                self.run_script(step, self.get_cleaning_options())
 
         print("\nReconstructing final document...")
-        self.reconstruct_document()
+        self.reconstruct_document(options=reconstruction_options)
 
     def edit_scripts(self) -> None:
         """Allow user to edit the script files."""
@@ -465,23 +581,28 @@ class LegislativeProcessor:
             choice = input("\nEnter your choice (1-9): ").strip()
             
             if choice == '1':
-                self.process_all()
+                with self.instrumented("process_all"):
+                    self.process_all()
             elif choice == '2':
                 if self.check_input_file():
-                    self.run_script("clean")
+                    with self.instrumented("clean"):
+                        self.run_script("clean", self.get_cleaning_options())
             elif choice == '3':
                 if os.path.exists(self.config["cleaned_file"]):
                     chunking_options = self.get_chunking_options()
-                    self.run_script("chunk", chunking_options)
+                    with self.instrumented("chunk"):
+                        self.run_script("chunk", chunking_options)
                 else:
                     print("Error: Cleaned file not found. Run cleaning step first.")
             elif choice == '4':
                 if os.path.exists(self.config["chunks_dir"]):
-                    self.run_script("extract")
+                    with self.instrumented("extract"):
+                        self.run_script("extract", self.get_extraction_options())
                 else:
                     print("Error: Chunks directory not found. Run chunking step first.")
             elif choice == '5':
-                self.reconstruct_document()
+                with self.instrumented("reconstruct"):
+                    self.reconstruct_document()
             elif choice == '6':
                 self.modify_config()
             elif choice == '7':
@@ -496,7 +617,7 @@ class LegislativeProcessor:
                 print("Invalid choice. Please try again.")
 
 def main():
-    processor = LegislativeProcessor()
+    processor = LegislativeProcessor(instrument="--instrument" in sys.argv[1:])
     processor.show_menu()
 
 if __name__ == "__main__":
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import signal
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from cleanText import clean
+from chunk_legislation import chunk, DEFAULT_MAX_CHARS, DEFAULT_MAX_TOKENS
+from combined_document import FactAggregator
+from extract_legislative_facts import extract_facts, extractor_fingerprint
+from legislative_processor import LegislativeProcessor
+
+# Local extraction service. The stage modules are imported (and their
+# patterns compiled) once, here and in each worker process, and requests are
+# answered over HTTP on a TCP port or a Unix socket:
+#
+#   GET  /health    service status
+#   POST /extract   one chunk's text -> its facts
+#   POST /bill      a whole bill -> cleaned, chunked, extracted and aggregated
+#
+# Bodies are either plain text (options in the query string) or a JSON object
+# with "text" and the options. Connections are kept alive between requests.
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# Chunk limits a /bill request may ask for; larger values are capped
+MAX_CHUNK_CHARS = 1000000
+MAX_CHUNK_TOKENS = 250000
+DEFAULT_TIMEOUT = 120  # seconds a worker may spend on one task (0 = no limit)
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class RequestError(Exception):
+    """A request the service can't answer; reported to the client with its status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def warm_up() -> None:
+    """Run every pattern once in a new worker, so the first request pays no setup."""
+    extract_facts("SEC. 1. $1,000 for fiscal year 2025, 42 U.S.C. 5121, Public Law 118–83.", "warmup")
+
+
+def extract_chunk(chunk_id: str, text: str, include_text: bool) -> Dict[str, Any]:
+    data = extract_facts(text, chunk_id)
+    if not include_text:
+        data.pop("original_text", None)
+    return data
+
+
+def split_bill(text: str, options: Dict[str, Any]) -> List[Tuple[str, str]]:
+    if options["clean"]:
+        text = clean(text)
+    return list(chunk(text, options))
+
+
+def parse_body(body: bytes, content_type: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Return the request's text and options, from a JSON object or plain text plus query string."""
+    try:
+        if content_type.split(";")[0].strip() == "application/json":
+            request = json.loads(body)
+            if not isinstance(request, dict) or not isinstance(request.get("text"), str):
+                raise RequestError(400, 'JSON body must be an object with a "text" string')
+            return request
+        request: Dict[str, Any] = {key: values[-1] for key, values in query.items()}
+        request["text"] = body.decode("utf-8")
+        return request
+    except (ValueError, UnicodeDecodeError) as e:
+        raise RequestError(400, f"Could not read request body: {e}")
+
+
+def chunk_limit(request: Dict[str, Any], key: str, default: int, cap: int) -> int:
+    """Return a positive chunk limit from the request (or the default), capped at cap."""
+    value = request.get(key)
+    if value is None or value == "":
+        value = default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise RequestError(400, f"{key} must be an integer")
+    if value <= 0:
+        raise RequestError(400, f"{key} must be greater than 0")
+    return min(value, cap)
+
+
+def flag(value: Any, default: bool) -> bool:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ("1", "true", "yes", "y")
+
+
+class ExtractionService:
+    """Answer extraction requests from a pool of warm worker processes."""
+
+    def __init__(self, config: Dict[str, Any], workers: int, timeout: float = DEFAULT_TIMEOUT):
+        self.config = config
+        self.workers = workers
+        self.timeout = timeout or None
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+        self.requests = 0
+        self.fingerprint = extractor_fingerprint()
+
+    async def run(self, func, *args) -> Any:
+        """Run func in a worker; a task still running after the timeout gets a 503."""
+        future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.restart_workers()
+            raise RequestError(503, f"Request took longer than {self.timeout:g}s and was stopped")
+
+    def restart_workers(self) -> None:
+        """Replace the pool, ending its processes: a task can't be cancelled once a worker runs it.
+
+        Other requests running in the old pool fail with an error.
+        """
+        old = self.executor
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+        for process in list((old._processes or {}).values()):
+            process.terminate()
+        old.shutdown(wait=False, cancel_futures=True)
+        print(f"A task timed out after {self.timeout:g}s; worker processes restarted")
+
+    async def extract(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        chunk_id = str(request.get("chunk_id") or "chunk")
+        return await self.run(extract_chunk, chunk_id, request["text"],
+                              flag(request.get("include_text"), False))
+
+    async def bill(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Clean and chunk the bill in one worker, then extract its chunks across the pool."""
+        options = {
+            "clean": flag(request.get("clean"), True),
+            "strategy": request.get("strategy") or self.config["chunking_strategy"],
+            "max_chars": chunk_limit(request, "max_chars", self.config.get("max_chars", DEFAULT_MAX_CHARS),
+                                     MAX_CHUNK_CHARS),
+            "max_tokens": chunk_limit(request, "max_tokens", self.config.get("max_tokens", DEFAULT_MAX_TOKENS),
+                                      MAX_CHUNK_TOKENS),
+            "token_estimator": self.config.get("token_estimator", "heuristic"),
+            "token_cache_dir": None  # counts stay in the worker's memory
+        }
+        if options["strategy"] not in ("size", "structure", "tokens"):
+            raise RequestError(400, 'strategy must be "size", "structure" or "tokens"')
+        include_text = flag(request.get("include_text"), False)
+
+        chunks = await self.run(split_bill, request["text"], options)
+        results = await asyncio.gather(*(self.run(extract_chunk, chunk_id, text, include_text)
+                                         for chunk_id, text in chunks))
+        aggregator = FactAggregator()
+        for data in results:
+            aggregator.add(data)
+        return {
+            "document_metadata": {
+                "total_chunks": len(results),
+                "chunking_strategy": options["strategy"]
+            },
+            "aggregated_data": aggregator.aggregated_data(),
+            "chunks": results
+        }
+
+    async def respond(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        url = urlsplit(target)
+        routes = {"/health": "GET", "/extract": "POST", "/bill": "POST"}
+        if url.path not in routes:
+            raise RequestError(404, f"No such endpoint: {url.path}")
+        if method != routes[url.path]:
+            raise RequestError(405, f"{url.path} expects {routes[url.path]}")
+        if url.path == "/health":
+            return {"status": "ok", "workers": self.workers, "requests": self.requests,
+                    "extractor": self.fingerprint}
+
+        request = parse_body(body, headers.get("content-type", ""), parse_qs(url.query))
+        if url.path == "/extract":
+            return await self.extract(request)
+        return await self.bill(request)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                keep_alive = True
+                try:
+                    try:
+                        method, target, version = request_line.decode("latin-1").split()
+                    except ValueError:
+                        raise RequestError(400, "Malformed request line")
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    keep_alive = (headers.get("connection", "").lower() != "close"
+                                  and version != "HTTP/1.0")
+                    try:
+                        length = int(headers.get("content-length", "0"))
+                    except ValueError:
+                        length = -1
+                    if length < 0:
+                        # The body can't be framed, so the connection can't be reused
+                        keep_alive = False
+                        raise RequestError(400, "Invalid Content-Length")
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise RequestError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    self.requests += 1
+                    status, payload = 200, await self.respond(method, target, headers, body)
+                except RequestError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                content = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                elapsed = (time.perf_counter() - start) * 1000
+                head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                        "Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(content)}\r\n"
+                        f"X-Elapsed-Ms: {elapsed:.2f}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+                writer.write(head.encode("latin-1") + content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, unix_path: Optional[str] = None) -> None:
+        # Start every worker before accepting requests
+        await asyncio.gather(*(self.run(warm_up) for _ in range(self.workers)))
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+            print(f"Serving on unix socket {unix_path} with {self.workers} workers")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Serving on http://{host}:{port} with {self.workers} workers")
+        # Stop on Ctrl+C or SIGTERM
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, AttributeError):
+                pass  # no signal handlers on this platform; Ctrl+C still works
+        async with server:
+            await stop.wait()
+        print("\nShutting down.")
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+
+def main() -> None:
+    config = LegislativeProcessor().config
+    parser = argparse.ArgumentParser(description="Serve fact extraction over HTTP with warm worker processes.")
+    parser.add_argument("--host", default=config["service_host"])
+    parser.add_argument("--port", type=int, default=config["service_port"])
+    parser.add_argument("--unix", help="listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--workers", type=int, default=config["service_workers"],
+                        help="worker processes (0 = one per CPU core)")
+    parser.add_argument("--timeout", type=float, default=config["service_timeout"],
+                        help="seconds a worker may spend on one task before it is restarted (0 = no limit)")
+    args = parser.parse_args()
+
+    workers = args.workers if args.workers and args.workers > 0 else (os.cpu_count() or 1)
+    service = ExtractionService(config, workers, args.timeout)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        service.close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+
+if __name__ == "__main__":
+    main()
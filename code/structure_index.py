@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import bisect
+import argparse
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+from chunk_legislation import (division_pattern, title_pattern, section_pattern,
+                               marker_candidate, text_end)
+from chunk_spans import ChunkSpan, locate_offsets, open_source
+
+# Structure index: the DIVISION -> TITLE -> SEC. tree of a cleaned document,
+# built in one scan and saved next to the chunks as structure.json. Nodes hold
+# the byte range of the cleaned file they cover, running from their heading
+# line to the next heading of the same or a higher level.
+#
+# Nodes are kept in document (pre-)order, where a node's start is never before
+# its parent's, so the deepest node containing an offset is the last one that
+# starts at or before it: one bisect.
+STRUCTURE_FILE = "structure.json"
+KINDS = ("division", "title", "section")
+LEVEL = {kind: level for level, kind in enumerate(KINDS)}
+
+
+class StructureNode:
+    """One DIVISION, TITLE or SEC. of the document."""
+
+    __slots__ = ("kind", "label", "heading", "start", "end", "parent", "children", "path")
+
+    def __init__(self, kind: str, label: str, heading: str, start: int,
+                 parent: Optional["StructureNode"] = None):
+        self.kind = kind
+        self.label = label
+        self.heading = heading
+        self.start = start
+        self.end = start
+        self.parent = parent
+        self.children: List["StructureNode"] = []
+        part = f"{'sec' if kind == 'section' else kind}_{label.lower()}"
+        self.path = f"{parent.path}/{part}" if parent else part
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "label": self.label, "heading": self.heading,
+                "start": self.start, "end": self.end,
+                "children": [child.to_dict() for child in self.children]}
+
+
+def heading_node(line: str) -> Optional[Tuple[str, str]]:
+    """Return (kind, label) if line is a DIVISION, TITLE or SEC. heading."""
+    m = division_pattern.match(line)
+    if m:
+        return "division", m.group(1)
+    m = title_pattern.match(line)
+    if m:
+        return "title", m.group(1)
+    m = section_pattern.match(line)
+    if m:
+        return "section", m.group(1)
+    return None
+
+
+class StructureIndex:
+    """The structure tree of one cleaned document, with offset lookups."""
+
+    def __init__(self, roots: List[StructureNode], size: int, source: Optional[str] = None,
+                 data: Optional[bytes] = None):
+        self.roots = roots
+        self.size = size
+        self.source = source
+        self.data = data  # the document itself when it was indexed from memory
+        self.nodes: List[StructureNode] = []
+        stack = list(reversed(roots))
+        while stack:
+            node = stack.pop()
+            self.nodes.append(node)
+            stack.extend(reversed(node.children))
+        self.starts = [node.start for node in self.nodes]
+
+    def find(self, offset: int) -> Optional[StructureNode]:
+        """Return the deepest node containing the byte offset (None before the first heading)."""
+        i = bisect.bisect_right(self.starts, offset) - 1
+        if i < 0 or offset >= self.nodes[i].end:
+            return None
+        return self.nodes[i]
+
+    def path(self, offset: int) -> Optional[str]:
+        """Return the section path at the byte offset, e.g. "division_b/title_i/sec_2101"."""
+        node = self.find(offset)
+        return node.path if node else None
+
+    def paths_between(self, start: int, end: int) -> List[str]:
+        """Return the path at start and of every node starting before end."""
+        first = bisect.bisect_right(self.starts, start) - 1
+        last = bisect.bisect_left(self.starts, end)
+        paths = [] if first < 0 or start >= self.nodes[first].end else [self.nodes[first].path]
+        paths.extend(node.path for node in self.nodes[first + 1:last])
+        return paths
+
+    def buffer(self) -> Any:
+        """Return the indexed document's bytes (a memory map for a file)."""
+        if self.data is not None:
+            return self.data
+        return open_source(self.source)
+
+    def chunk_starts(self, chunks: Iterable[Union[Tuple[str, str], ChunkSpan]]) -> List[int]:
+        """Return the byte offset where each chunk starts in the indexed document."""
+        chunks = list(chunks)
+        if all(isinstance(c, ChunkSpan) for c in chunks):
+            return [c.start for c in chunks]
+        return [start for _, start, _ in locate_offsets(chunks, self.buffer(), self.source or "the document")]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"source": self.source, "size": self.size,
+                "tree": [root.to_dict() for root in self.roots]}
+
+
+def build_index(data: Any, source: Optional[str] = None) -> StructureIndex:
+    """Scan a cleaned document (bytes or a memory map) for its headings and build its tree."""
+    end = text_end(data)
+    roots: List[StructureNode] = []
+    open_nodes: List[StructureNode] = []  # the current division, title and section, outermost first
+
+    for match in marker_candidate.finditer(data, 0, end):
+        line_start = match.start()
+        line_end = data.find(b"\n", line_start, end)
+        line = str(data[line_start:end if line_end == -1 else line_end], "utf-8")
+        found = heading_node(line)
+        if found is None:
+            continue
+        kind, label = found
+        # Close the open nodes at this level and below
+        while open_nodes and LEVEL[open_nodes[-1].kind] >= LEVEL[kind]:
+            open_nodes.pop().end = line_start
+        parent = open_nodes[-1] if open_nodes else None
+        node = StructureNode(kind, label, line.strip(), line_start, parent)
+        (parent.children if parent else roots).append(node)
+        open_nodes.append(node)
+
+    for node in open_nodes:
+        node.end = end
+    return StructureIndex(roots, end, source, None if source else data)
+
+
+def index_file(source: str) -> StructureIndex:
+    if os.path.getsize(source) == 0:
+        return StructureIndex([], 0, source)
+    return build_index(open_source(source), source)
+
+
+def index_text(text: str) -> StructureIndex:
+    return build_index(text.encode("utf-8"))
+
+
+def save_index(index: StructureIndex, directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, STRUCTURE_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, ensure_ascii=False)
+    return path
+
+
+def index_exists(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, STRUCTURE_FILE))
+
+
+def load_index(directory: str) -> StructureIndex:
+    with open(os.path.join(directory, STRUCTURE_FILE), "r", encoding="utf-8") as f:
+        saved = json.load(f)
+
+    def build(entry: Dict[str, Any], parent: Optional[StructureNode]) -> StructureNode:
+        node = StructureNode(entry["kind"], entry["label"], entry["heading"], entry["start"], parent)
+        node.end = entry["end"]
+        node.children = [build(child, node) for child in entry["children"]]
+        return node
+
+    return StructureIndex([build(entry, None) for entry in saved["tree"]], saved["size"], saved["source"])
+
+
+# Tagging extracted facts
+
+def fact_anchors(data: Dict[str, Any]) -> Iterator[Tuple[str, Optional[str], List[Optional[str]]]]:
+    """Yield (field, reference type, anchors) with the text to look for for each fact.
+
+    Funding, deadlines and duties come one per line in text order, so they are
+    searched for from where the previous one was found; the other facts are
+    listed by first occurrence.
+    """
+    yield "funding", None, [item.get("amount") for item in data.get("funding", [])]
+    yield "deadlines", None, [item.get("date") for item in data.get("deadlines", [])]
+    yield "duties_and_requirements", None, [item.get("action") for item in data.get("duties_and_requirements", [])]
+    yield "dates", None, list(data.get("dates", []))
+    yield "programs_and_entities", None, list(data.get("programs_and_entities", []))
+    for ref_type, refs in data.get("references", {}).items():
+        yield "references", ref_type, list(refs)
+
+
+IN_TEXT_ORDER = ("funding", "deadlines", "duties_and_requirements")
+
+
+def tag_facts(data: Dict[str, Any], index: StructureIndex, chunk_start: int) -> None:
+    """Add data["sections"]: the section path of the chunk and of each of its facts.
+
+    Paths are listed in the same order as the facts they belong to; a fact
+    that can't be found in the chunk text gets the path where the chunk starts.
+    """
+    text = data.get("original_text", "")
+    found: List[Tuple[str, Optional[str], List[int]]] = []
+    for field, ref_type, anchors in fact_anchors(data):
+        offsets = []
+        cursor = 0
+        for anchor in anchors:
+            pos = text.find(anchor, cursor) if anchor else -1
+            if pos == -1:
+                offsets.append(0)
+                continue
+            offsets.append(pos)
+            if field in IN_TEXT_ORDER:
+                line_end = text.find("\n", pos)
+                cursor = len(text) if line_end == -1 else line_end + 1
+        found.append((field, ref_type, offsets))
+
+    # Character offsets in the chunk -> byte offsets in the document
+    byte_offsets = {}
+    char_pos = byte_pos = 0
+    for offset in sorted({o for _, _, offsets in found for o in offsets}):
+        byte_pos += len(text[char_pos:offset].encode("utf-8"))
+        char_pos = offset
+        byte_offsets[offset] = chunk_start + byte_pos
+    chunk_end = chunk_start + byte_pos + len(text[char_pos:].encode("utf-8"))
+
+    sections: Dict[str, Any] = {"chunk": index.paths_between(chunk_start, chunk_end)}
+    for field, ref_type, offsets in found:
+        paths = [index.path(byte_offsets[o]) for o in offsets]
+        if ref_type is None:
+            sections[field] = paths
+        else:
+            sections.setdefault("references", {})[ref_type] = paths
+    data["sections"] = sections
+
+
+def print_tree(nodes: List[StructureNode], depth: int = 0, max_depth: int = 3) -> None:
+    for node in nodes:
+        print(f"{'  ' * depth}{node.heading[:70]}  [{node.start}-{node.end}]")
+        if depth + 1 < max_depth:
+            print_tree(node.children, depth + 1, max_depth)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show the structure index saved with the chunks.")
+    parser.add_argument("offset", nargs="*", type=int, help="byte offsets of the cleaned file to look up")
+    parser.add_argument("--dir", default="chunks", help="directory holding structure.json")
+    parser.add_argument("--depth", type=int, default=2, help="tree levels to print (1-3)")
+    args = parser.parse_args()
+
+    if not index_exists(args.dir):
+        print(f"No structure index in '{args.dir}'. Run the chunk step with structure_index enabled first.")
+        sys.exit(1)
+    index = load_index(args.dir)
+    if not args.offset:
+        print(f"{index.source}: {len(index.nodes)} nodes")
+        print_tree(index.roots, max_depth=args.depth)
+        return
+    for offset in args.offset:
+        start = time.perf_counter()
+        node = index.find(offset)
+        elapsed = (time.perf_counter() - start) * 1e6
+        if node is None:
+            print(f"{offset}: before the first heading ({elapsed:.1f} µs)")
+        else:
+            print(f"{offset}: {node.path}  \"{node.heading[:60]}\" [{node.start}-{node.end}] ({elapsed:.1f} µs)")
+
+
+if __name__ == "__main__":
+    main()
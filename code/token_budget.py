@@ -0,0 +1,173 @@
+import os
+import re
+import hashlib
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional: the heuristic estimator needs nothing
+    tiktoken = None
+
+# Token budgets for chunking. A token estimator counts the tokens of a piece
+# of text; the count of every line of a document is computed once and cached
+# (in memory and in <cache_dir>/<key>.bin), so chunking the same document with
+# another budget only re-packs the lines.
+DEFAULT_MAX_TOKENS = 4000
+DEFAULT_ESTIMATOR = "heuristic"
+DEFAULT_CACHE_DIR = ".token_cache"
+
+# Words, digit runs and single punctuation marks
+word_pattern = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+sentence_break = re.compile(r"(?<=[.;:?!])\s+")
+word_break = re.compile(r"\s+")
+
+
+class HeuristicEstimator:
+    """Estimate tokens from words and punctuation, no tokenizer needed.
+
+    Subword tokenizers keep short words whole, split long words every few
+    letters and numbers every three digits, and give most punctuation marks a
+    token of their own; this follows the same rules.
+    """
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        tokens = 0
+        for word in word_pattern.findall(text):
+            size = len(word)
+            if word.isdigit():
+                tokens += (size + 2) // 3
+            else:
+                tokens += 1 if size <= 6 else (size + 3) // 4
+        return tokens
+
+
+class TiktokenEstimator:
+    """Count tokens exactly with a tiktoken encoding."""
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        if tiktoken is None:
+            raise ValueError("the tiktoken estimator needs the tiktoken package (pip install tiktoken)")
+        self.name = f"tiktoken:{encoding}"
+        self.encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+def get_estimator(spec: str = DEFAULT_ESTIMATOR):
+    """Return the estimator named by spec: "heuristic", "tiktoken" or "tiktoken:<encoding>"."""
+    name, _, argument = spec.partition(":")
+    if name == "heuristic":
+        return HeuristicEstimator()
+    if name == "tiktoken":
+        return TiktokenEstimator(argument or "cl100k_base")
+    raise ValueError(f"unknown token estimator '{spec}'")
+
+
+MEMO_DOCUMENTS = 8  # documents whose line counts stay in memory
+_counts_memo: Dict[str, array] = {}
+
+
+def line_token_counts(lines: List[str], estimator, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> array:
+    """Return the token count of every line, computing them only once per document and estimator."""
+    digest = hashlib.sha256(estimator.name.encode("utf-8"))
+    for line in lines:
+        digest.update(line.encode("utf-8"))
+        digest.update(b"\n")
+    key = digest.hexdigest()
+    if key in _counts_memo:
+        return _counts_memo[key]
+
+    path = os.path.join(cache_dir, key + ".bin") if cache_dir else None
+    counts = array("I")
+    if path and os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                counts.frombytes(f.read())
+        except (OSError, ValueError):
+            # Truncated or unreadable cache file: recompute and rewrite it below
+            counts = array("I")
+    if len(counts) != len(lines):
+        counts = array("I", (estimator.count(line) for line in lines))
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                counts.tofile(f)
+            os.replace(temp_path, path)
+    if len(_counts_memo) >= MEMO_DOCUMENTS:
+        del _counts_memo[next(iter(_counts_memo))]
+    _counts_memo[key] = counts
+    return counts
+
+
+def segments(text: str, pattern: re.Pattern) -> List[Tuple[int, int]]:
+    """Return the (start, end) ranges of text between the matches of pattern."""
+    ranges = []
+    start = 0
+    for match in pattern.finditer(text):
+        if match.start() > start:
+            ranges.append((start, match.start()))
+        start = match.end()
+    if start < len(text):
+        ranges.append((start, len(text)))
+    return ranges
+
+
+def split_text(text: str, max_tokens: int, estimator, pattern: re.Pattern = sentence_break) -> Iterator[str]:
+    """Yield pieces of a line too long for the budget, cut between sentences where possible.
+
+    A sentence that is still too long is cut between words; a single word over
+    the budget is kept whole rather than cut in the middle.
+    """
+    piece_start = piece_end = None
+    piece_tokens = 0
+    for start, end in segments(text, pattern):
+        tokens = estimator.count(text[start:end])
+        if piece_start is not None and piece_tokens + tokens > max_tokens:
+            yield text[piece_start:piece_end]
+            piece_start = None
+        if tokens > max_tokens and pattern is sentence_break:
+            yield from split_text(text[start:end], max_tokens, estimator, word_break)
+            continue
+        if piece_start is None:
+            piece_start, piece_tokens = start, 0
+        piece_end = end
+        piece_tokens += tokens
+    if piece_start is not None:
+        yield text[piece_start:piece_end]
+
+
+def iter_chunks_by_tokens(lines: List[str], max_tokens: int = DEFAULT_MAX_TOKENS, estimator=None,
+                          cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Iterator[Tuple[str, str]]:
+    """Yield (chunk_id, content) chunks of whole lines holding at most max_tokens tokens.
+
+    A line over the budget on its own becomes a chunk split into parts
+    ("NNN_partK") between sentences, or between words if it must.
+    """
+    estimator = estimator or HeuristicEstimator()
+    counts = line_token_counts(lines, estimator, cache_dir)
+    current_chunk_lines: List[str] = []
+    current_tokens = 0
+    chunk_count = 0
+
+    for line, tokens in zip(lines, counts):
+        if current_chunk_lines and current_tokens + tokens > max_tokens:
+            chunk_count += 1
+            yield f"{chunk_count:03d}", "\n".join(current_chunk_lines)
+            current_chunk_lines = []
+            current_tokens = 0
+        if tokens > max_tokens:
+            chunk_count += 1
+            for part_number, piece in enumerate(split_text(line, max_tokens, estimator), 1):
+                yield f"{chunk_count:03d}_part{part_number}", piece
+            continue
+        current_chunk_lines.append(line)
+        current_tokens += tokens
+
+    if current_chunk_lines:
+        chunk_count += 1
+        yield f"{chunk_count:03d}", "\n".join(current_chunk_lines)